@@ -0,0 +1,231 @@
+# Pluggable model backends - Gemini for real work, a local mock for offline load testing
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Protocol
+
+class BackendError(Exception):
+    """Base class for errors raised by a backend call."""
+
+class RateLimitError(BackendError):
+    """The backend rejected the call because the quota was exceeded (HTTP 429)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class SentimentBackend(Protocol):
+    """What analyze_sentiment needs from a model: prompt text in, raw response text out."""
+
+    name: str
+    model_name: str  # Part of the result cache key, so different backends never share answers
+
+    def generate(self, prompt_text, analysis_mode="lenient"):
+        ...
+
+    async def generate_async(self, prompt_text, analysis_mode="lenient"):
+        ...
+
+class GeminiBackend:
+    """Google Gemini via google-generativeai, with one shared model client per (mode, config)."""
+
+    name = "gemini"
+
+    def __init__(self, model_name, generation_config, api_key=None):
+        import google.generativeai as genai
+
+        self._genai = genai
+        self._genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self._models = {}
+        self._models_lock = threading.Lock()
+
+    def create_model(self, generation_config=None):
+        """Set up a new AI model with low temperature for consistent results."""
+        return self._genai.GenerativeModel(
+            model_name=self.model_name,
+            generation_config=generation_config or self.generation_config,
+        )
+
+    def get_model(self, analysis_mode="lenient", generation_config=None):
+        """Return the shared model client for this (mode, config), creating it once.
+
+        Model objects are safe to share between threads, so every request reuses the
+        same client instead of rebuilding one per review.
+        """
+        # The default config gets a fixed key so the common path skips building one
+        config_key = json.dumps(generation_config, sort_keys=True) if generation_config else None
+        registry_key = (analysis_mode, config_key)
+
+        model = self._models.get(registry_key)
+        if model is None:
+            with self._models_lock:
+                model = self._models.get(registry_key)
+                if model is None:
+                    model = self.create_model(generation_config)
+                    self._models[registry_key] = model
+        return model
+
+    def generate(self, prompt_text, analysis_mode="lenient"):
+        response = self.get_model(analysis_mode).generate_content(prompt_text)
+        return response.text or ""
+
+    async def generate_async(self, prompt_text, analysis_mode="lenient"):
+        response = await self.get_model(analysis_mode).generate_content_async(prompt_text)
+        return response.text or ""
+
+# Words the mock backend uses to pick believable, repeatable labels
+_MOCK_POSITIVE_WORDS = {
+    "amazing", "brilliant", "excellent", "fantastic", "great", "incredible", "loved",
+    "masterpiece", "superb", "wonderful", "breathtaking", "outstanding", "beautiful",
+}
+_MOCK_NEGATIVE_WORDS = {
+    "awful", "boring", "disappointing", "hated", "horrible", "terrible", "waste",
+    "worst", "bad", "poor", "dull", "mess", "unbearable",
+}
+
+class MockBackend:
+    """Offline stand-in for Gemini with realistic latency and failure behavior.
+
+    Labels are derived deterministically from the review text, so repeated runs give
+    the same answers. Latency follows a lognormal (or uniform/fixed) distribution,
+    and a configurable share of calls fail with a 429, a generic error, or return
+    malformed JSON - enough to exercise the batch pipeline at scale without quota.
+    """
+
+    name = "mock"
+    model_name = "mock"
+
+    def __init__(self, latency_ms=800.0, latency_sigma=0.5, latency_distribution="lognormal",
+                 error_rate=0.0, rate_limit_rate=0.0, malformed_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def _sample_latency(self):
+        """Seconds this call should take, drawn from the configured distribution."""
+        median = self.latency_ms / 1000.0
+        with self._random_lock:
+            if self.latency_distribution == "fixed":
+                return median
+            if self.latency_distribution == "uniform":
+                return self._random.uniform(0.0, 2.0 * median)
+            # Lognormal: most calls near the median, with a long tail like a real API
+            return median * self._random.lognormvariate(0.0, self.latency_sigma)
+
+    def _roll_outcome(self):
+        """Decide up front whether this call fails, and how."""
+        with self._random_lock:
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return "rate_limited"
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            return "error"
+        roll -= self.error_rate
+        if roll < self.malformed_rate:
+            return "malformed"
+        return "ok"
+
+    def generate(self, prompt_text, analysis_mode="lenient"):
+        time.sleep(self._sample_latency())
+        return self._respond(prompt_text, analysis_mode)
+
+    async def generate_async(self, prompt_text, analysis_mode="lenient"):
+        await asyncio.sleep(self._sample_latency())
+        return self._respond(prompt_text, analysis_mode)
+
+    def _respond(self, prompt_text, analysis_mode):
+        outcome = self._roll_outcome()
+        if outcome == "rate_limited":
+            raise RateLimitError("429 Resource has been exhausted (mock quota)", retry_after=1.0)
+        if outcome == "error":
+            raise BackendError("503 Service unavailable (mock)")
+
+        response_text = self._build_response(prompt_text, analysis_mode)
+        if outcome == "malformed":
+            # Chop the answer off mid-way, like a truncated model response
+            return response_text[: max(1, len(response_text) // 2)]
+        return response_text
+
+    def _build_response(self, prompt_text, analysis_mode):
+        # Packed prompts list "[index] review" lines after a "Movie Reviews:" header
+        if "\nMovie Reviews:\n" in prompt_text:
+            review_block = prompt_text.rsplit("\nMovie Reviews:\n", 1)[1]
+            items = re.findall(r"^\[(\d+)\] (.*)$", review_block, re.MULTILINE)
+            fields = [key for key in ("label", "confidence", "explanation", "evidence_phrases")
+                      if f'"{key}"' in prompt_text]
+            return json.dumps([
+                dict({key: value for key, value in self.classify(review, analysis_mode).items() if key in fields},
+                     index=int(index))
+                for index, review in items
+            ])
+
+        review_text = prompt_text.rsplit("\nMovie Review:\n", 1)[-1]
+        # Combined prompts want a strict and a lenient verdict side by side
+        modes = ["strict", "lenient"] if '"strict": {' in prompt_text else [analysis_mode]
+        verdicts = {}
+        for mode in modes:
+            verdict = self.classify(review_text, mode)
+            # Compact output profiles only ask for the label (and maybe the confidence)
+            if '"explanation"' not in prompt_text:
+                verdict = {key: verdict[key] for key in ("label", "confidence") if f'"{key}"' in prompt_text}
+            verdicts[mode] = verdict
+        return json.dumps(verdicts if len(modes) > 1 else verdicts[analysis_mode])
+
+    def classify(self, review_text, analysis_mode="lenient"):
+        """Deterministic verdict for a review based on a tiny keyword lexicon."""
+        words = re.findall(r"[a-z']+", review_text.lower())
+        positive_hits = [word for word in words if word in _MOCK_POSITIVE_WORDS]
+        negative_hits = [word for word in words if word in _MOCK_NEGATIVE_WORDS]
+        score = len(positive_hits) - len(negative_hits)
+
+        # Strict mode needs a clearer margin before leaving Neutral
+        margin = 2 if analysis_mode == "strict" else 1
+        if score >= margin:
+            label = "Positive"
+        elif score <= -margin:
+            label = "Negative"
+        else:
+            label = "Neutral"
+
+        # Stable pseudo-random confidence per review text
+        digest = hashlib.sha256(review_text.strip().encode("utf-8")).digest()
+        confidence = round(0.55 + (digest[0] / 255.0) * 0.4, 2)
+
+        return {
+            "label": label,
+            "confidence": confidence,
+            "explanation": f"Mock verdict from {len(positive_hits)} positive and {len(negative_hits)} negative cue words.",
+            "evidence_phrases": (positive_hits + negative_hits)[:6],
+        }
+
+def create_backend(name, model_name, generation_config, api_key=None):
+    """Build a backend by name ("gemini" or "mock"); mock settings come from SENTIMENT_MOCK_* env vars."""
+    if name == "gemini":
+        return GeminiBackend(model_name, generation_config, api_key=api_key)
+
+    if name == "mock":
+        seed = os.getenv("SENTIMENT_MOCK_SEED")
+        return MockBackend(
+            latency_ms=float(os.getenv("SENTIMENT_MOCK_LATENCY_MS", "800")),
+            latency_sigma=float(os.getenv("SENTIMENT_MOCK_LATENCY_SIGMA", "0.5")),
+            latency_distribution=os.getenv("SENTIMENT_MOCK_LATENCY_DISTRIBUTION", "lognormal"),
+            error_rate=float(os.getenv("SENTIMENT_MOCK_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("SENTIMENT_MOCK_429_RATE", "0")),
+            malformed_rate=float(os.getenv("SENTIMENT_MOCK_MALFORMED_RATE", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+    raise ValueError(f"Unknown backend '{name}' - expected 'gemini' or 'mock'")
@@ -1,118 +1,277 @@
 
 # Command-line tool for processing lots of reviews at once
 import argparse
+import asyncio
+import contextlib
 import csv
+import itertools
 import json
 import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional
 
 import pandas as pd
 from tqdm import tqdm  # Progress bars for long operations
 
-from sentiment_llm import analyze_sentiment
+from backends import create_backend
+from cascade import LocalSentimentClassifier, merge_cascade_results
+from checkpoint import CheckpointJournal
+from columnar_output import COLUMNAR_FORMATS, COMPRESSIONS, DEFAULT_ROW_GROUP_SIZE, ColumnarResultWriter
+from eval_metrics import (
+    DEFAULT_BOOTSTRAP_RESAMPLES,
+    SENTIMENT_LABELS,
+    OnlineAgreement,
+    OnlineMetrics,
+    stratified_order,
+    widest_interval_half_width,
+)
+from prompts import COMBINED_MODE, COMBINED_MODES, OUTPUT_PROFILES
+from sentiment_llm import (
+    API_KEY,
+    BACKEND_NAME,
+    GENERATION_CONFIG,
+    MODEL_NAME,
+    DEFAULT_MAX_WORKERS,
+    analyze_reviews_async,
+    get_latency_percentiles,
+    get_near_duplicate_index,
+    get_rate_limiter,
+    get_result_cache,
+    get_run_stats,
+    is_failed_result,
+    process_batch_reviews,
+    reset_run_stats,
+    set_backend,
+    set_circuit_fallback,
+    set_near_duplicate_threshold,
+)
 
-def load_reviews_from_file(file_path):
-    """Read reviews from a CSV file and make sure it has the right format."""
+# Rows read, analyzed and written at a time - memory stays flat however big the input is
+DEFAULT_CHUNK_SIZE = 1000
+
+# File extensions read and written as JSON Lines (one record per line) rather than CSV
+JSONL_SUFFIXES = ('.jsonl', '.ndjson')
+# ...and as typed columnar files
+COLUMNAR_SUFFIXES = {'.parquet': 'parquet', '.pq': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+
+def read_review_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, sample=None, keep_columns=None,
+                       input_format='csv'):
+    """Stream reviews from a CSV file in chunks, after checking it has the right format.
+    
+    Only the header is read up front. With `keep_columns`, every other column
+    (besides 'review' and 'true_sentiment') is skipped while parsing.
+    """
+    if input_format == 'jsonl':
+        return read_jsonl_chunks(file_path, chunk_size, sample, keep_columns)
+    
     try:
-        dataframe = pd.read_csv(file_path)
+        columns = list(pd.read_csv(file_path, nrows=0).columns)
         
         # Check that the CSV has the expected structure
-        if 'review' not in dataframe.columns:
+        if 'review' not in columns:
             raise ValueError("The CSV file must have a 'review' column containing the movie reviews.")
         
-        return dataframe
+        usecols = None
+        if keep_columns is not None:
+            wanted = {'review', 'true_sentiment', *keep_columns}
+            usecols = [column for column in columns if column in wanted]
+        
+        return pd.read_csv(file_path, usecols=usecols, chunksize=chunk_size, nrows=sample)
         
     except Exception as error:
         print(f"Error reading CSV file: {error}")
         sys.exit(1)
 
-def calculate_performance_metrics(dataframe):
-    """Calculate how accurate our predictions were (if we have ground truth labels)."""
-    # If there's no ground truth data, we can't measure accuracy
-    if 'true_sentiment' not in dataframe.columns:
-        return {"message": "No ground truth labels found - skipping accuracy calculation"}
-    
-    # Clean up the labels to make sure they match properly
-    dataframe['true_clean'] = dataframe['true_sentiment'].str.strip().str.title()
-    dataframe['predicted_clean'] = dataframe['predicted_sentiment'].str.strip().str.title()
-    
-    # Only look at rows with valid sentiment labels
-    valid_labels = {'Positive', 'Negative', 'Neutral'}
-    valid_mask = (
-        dataframe['true_clean'].isin(valid_labels) & 
-        dataframe['predicted_clean'].isin(valid_labels)
+def read_jsonl_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, sample=None, keep_columns=None):
+    """Stream JSONL records ('-' for stdin) as DataFrame chunks, like read_review_chunks() does for CSV.
+    
+    Lines that aren't JSON objects are reported and skipped. Records don't all
+    have the same fields, so the columns are fixed by the first chunk (plus any
+    `keep_columns` it lacks) and every chunk is laid out with exactly those.
+    """
+    input_stream = sys.stdin if file_path == '-' else open(file_path, encoding='utf-8')
+    records = iter_jsonl_records(input_stream, id_field=None)
+    if sample:
+        records = itertools.islice(records, sample)
+    
+    rows = []
+    columns = None
+    try:
+        for row, _, fields, error in records:
+            if error:
+                print(f"⚠️  Skipping input record {row + 1}: {error}")
+                continue
+            if keep_columns is not None:
+                wanted = {'review', 'true_sentiment', *keep_columns}
+                fields = {column: value for column, value in fields.items() if column in wanted}
+            rows.append(fields)
+            if len(rows) >= chunk_size:
+                chunk_df, columns = review_frame(rows, columns, keep_columns)
+                yield chunk_df
+                rows = []
+        if rows:
+            yield review_frame(rows, columns, keep_columns)[0]
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+
+def review_frame(rows, columns=None, keep_columns=None):
+    """DataFrame of parsed JSONL records with the given columns, and those columns.
+    
+    Without `columns` (the first chunk), they're taken from the records and
+    checked for a 'review' field.
+    """
+    chunk_df = pd.DataFrame(rows)
+    if columns is None:
+        if 'review' not in chunk_df.columns:
+            print("Error reading JSONL input: records must have a 'review' field containing the movie review.")
+            sys.exit(1)
+        columns = list(chunk_df.columns) + [
+            column for column in keep_columns or () if column not in chunk_df.columns
+        ]
+    return chunk_df.reindex(columns=columns), columns
+
+def stratified_review_chunks(file_path, chunk_size, keep_columns=None, input_format='csv', seed=0, sample=None):
+    """Load a labeled file and hand it out in chunks, in a stratified random order.
+    
+    Returns (chunks, number of rows). The order needs every label up front, so the
+    whole file is loaded. Each row keeps its position in the file as 'input_row'.
+    With `sample`, only the first rows of that order are used - a stratified sample.
+    """
+    reviews_df = pd.concat(
+        list(read_review_chunks(file_path, DEFAULT_CHUNK_SIZE, None, keep_columns, input_format)) or [pd.DataFrame()],
+        ignore_index=True,
     )
-    valid_data = dataframe[valid_mask].copy()
-    
-    if len(valid_data) == 0:
-        return {"error": "No valid label pairs found for evaluation"}
-    
-    # Calculate overall accuracy - how many did we get right?
-    correct_predictions = (valid_data['true_clean'] == valid_data['predicted_clean']).sum()
-    total_predictions = len(valid_data)
-    overall_accuracy = correct_predictions / total_predictions
-    
-    # Calculate detailed metrics for each sentiment class
-    class_metrics = {}
-    for label in valid_labels:
-        # Count true positives, false positives, false negatives
-        true_positives = ((valid_data['true_clean'] == label) & 
-                         (valid_data['predicted_clean'] == label)).sum()
-        false_positives = ((valid_data['true_clean'] != label) & 
-                          (valid_data['predicted_clean'] == label)).sum()
-        false_negatives = ((valid_data['true_clean'] == label) & 
-                          (valid_data['predicted_clean'] != label)).sum()
-        
-        # Calculate precision, recall, and F1 score
-        precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
-        recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
-        f1_score = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0
-        
-        class_metrics[label] = {
-            'precision': precision,
-            'recall': recall,
-            'f1_score': f1_score,
-            'support': (valid_data['true_clean'] == label).sum()
-        }
+    if 'true_sentiment' not in reviews_df.columns:
+        print("Error: early stopping needs a 'true_sentiment' column to evaluate against")
+        sys.exit(1)
+    
+    order = stratified_order(reviews_df['true_sentiment'], seed)
+    reviews_df = reviews_df.iloc[order[:sample]].rename_axis('input_row').reset_index()
+    chunks = (reviews_df.iloc[start:start + chunk_size] for start in range(0, len(reviews_df), chunk_size))
+    return chunks, len(reviews_df)
+
+def print_early_stop_report(early_stop):
+    """Say where the sequential evaluation stopped and how many API calls that saved."""
+    if early_stop['stopped_early']:
+        print(f"🛑 Early stop: every interval within ±{early_stop['target_half_width']:.1%} after "
+              f"{early_stop['evaluated_reviews']:,} of {early_stop['total_reviews']:,} reviews "
+              f"({early_stop['evaluated_reviews'] / early_stop['total_reviews']:.1%}) - "
+              f"~{early_stop['estimated_api_calls_saved']:,} API calls saved vs a full run")
+    else:
+        widest = early_stop['widest_half_width']
+        widest_text = f" (widest interval ±{widest:.1%})" if widest is not None else ""
+        print(f"🏁 Target ±{early_stop['target_half_width']:.1%} not reached - all "
+              f"{early_stop['total_reviews']:,} reviews scored{widest_text}")
+
+def calculate_performance_metrics(dataframe, bootstrap_resamples=DEFAULT_BOOTSTRAP_RESAMPLES):
+    """Calculate how accurate our predictions were (if we have ground truth labels).
+    
+    The dataframe is only read, never modified.
+    """
+    metrics = OnlineMetrics(bootstrap_resamples)
+    metrics.update(dataframe)
+    return metrics.summary()
+
+def parse_thresholds(threshold_text):
+    """Turn "0.6,0.7,0.8" into [0.6, 0.7, 0.8]."""
+    if not threshold_text:
+        return []
+    return [float(value) for value in threshold_text.split(',') if value.strip()]
+
+def load_local_classifier(training_file=None):
+    """Local first-stage classifier: trained on a labeled CSV if given, else the built-in lexicon."""
+    if training_file:
+        print(f"🧠 Training local classifier on: {training_file}")
+        return LocalSentimentClassifier.from_csv(training_file)
+    return LocalSentimentClassifier.from_lexicon()
+
+class CascadeTradeoff:
+    """Accuracy and LLM escalation rate for each confidence threshold of the cascade.
     
-    # Build confusion matrix - shows which labels got confused with which
-    confusion_matrix = {}
-    for true_label in valid_labels:
-        confusion_matrix[true_label] = {}
-        for predicted_label in valid_labels:
-            count = ((valid_data['true_clean'] == true_label) & 
-                    (valid_data['predicted_clean'] == predicted_label)).sum()
-            confusion_matrix[true_label][predicted_label] = int(count)
-    
-    # Check if confidence scores correlate with accuracy
-    valid_data['is_correct'] = valid_data['true_clean'] == valid_data['predicted_clean']
-    avg_confidence_correct = valid_data[valid_data['is_correct']]['confidence'].mean()
-    avg_confidence_wrong = valid_data[~valid_data['is_correct']]['confidence'].mean()
-    
-    return {
-        'accuracy': overall_accuracy,
-        'total_samples': total_predictions,
-        'correct_predictions': int(correct_predictions),
-        'class_metrics': class_metrics,
-        'confusion_matrix': confusion_matrix,
-        'avg_confidence_correct': avg_confidence_correct,
-        'avg_confidence_wrong': avg_confidence_wrong,
-        'evaluated_samples': len(valid_data),
-        'skipped_samples': len(dataframe) - len(valid_data)
-    }
-
-def save_results_to_files(dataframe, output_path, metrics):
-    """Save the analysis results and performance stats to files."""
-    # Save the main results as CSV
-    dataframe.to_csv(output_path, index=False)
-    print(f"✅ Analysis results saved to: {output_path}")
-    
-    # If we have performance metrics, save those too
+    Fed one chunk at a time. The LLM results of a chunk must cover every review
+    escalated at the highest threshold, so each lower threshold can be scored
+    from the same run. Each threshold is scored on what the pipeline would have
+    answered (see merge_cascade_results), so a failed escalation counts with its
+    local answer and not as escalated.
+    """
+    
+    def __init__(self, thresholds):
+        self.thresholds = list(thresholds)
+        self.reviews = 0
+        self.correct = {threshold: 0 for threshold in self.thresholds}
+        self.escalated = {threshold: 0 for threshold in self.thresholds}
+    
+    def update(self, true_labels, local_results, llm_results):
+        """Score a chunk; the result dicts are keyed by position within `true_labels`."""
+        true_clean = pd.Series(true_labels).astype(str).str.strip().str.title().tolist()
+        self.reviews += len(local_results)
+        for threshold in self.thresholds:
+            for position, result in merge_cascade_results(local_results, llm_results, threshold).items():
+                self.escalated[threshold] += result['decided_by'] == 'llm'
+                self.correct[threshold] += result['label'] == true_clean[position]
+    
+    def summary(self):
+        if not self.reviews:
+            return []
+        return [{
+            'threshold': threshold,
+            'accuracy': self.correct[threshold] / self.reviews,
+            'escalation_rate': self.escalated[threshold] / self.reviews,
+            'escalated_reviews': self.escalated[threshold],
+        } for threshold in self.thresholds]
+
+def print_cascade_report(tradeoff, chosen_threshold):
+    """Show how accuracy and LLM usage change with the cascade threshold."""
+    if not tradeoff:
+        return
+    
+    print(f"\n⚡ Cascade Threshold Trade-off:")
+    print(f"   {'Threshold':>9}  {'Accuracy':>8}  {'Escalated':>9}")
+    for row in tradeoff:
+        marker = "  ← used" if row['threshold'] == chosen_threshold else ""
+        print(f"   {row['threshold']:>9.2f}  {row['accuracy']:>8.1%}  {row['escalation_rate']:>9.1%}{marker}")
+
+class ResultWriter:
+    """Appends finished chunks to the output CSV, flushing each so a crash keeps the work done so far."""
+    
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.rows_written = 0
+        self._file = open(output_path, 'w', newline='', encoding='utf-8')
+    
+    def write(self, dataframe):
+        # CSV has no list type, so the evidence phrases become one comma-separated cell
+        dataframe = dataframe.assign(**{
+            column: dataframe[column].str.join(', ')
+            for column in dataframe.columns if column.startswith('evidence_phrases')
+        })
+        dataframe.to_csv(self._file, index=False, header=self.rows_written == 0)
+        self._file.flush()
+        self.rows_written += len(dataframe)
+    
+    def close(self):
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def metrics_path_for(output_path):
+    """Where the metrics JSON for an output file goes: next to it, as <name>_metrics.json."""
+    output_path = Path(output_path)
+    return str(output_path.with_name(f"{output_path.stem}_metrics.json"))
+
+def save_metrics_to_file(output_path, metrics):
+    """Save the performance stats next to the results file."""
     if metrics and 'error' not in metrics and 'message' not in metrics:
-        metrics_path = output_path.replace('.csv', '_metrics.json')
+        metrics_path = metrics_path_for(output_path)
         
         with open(metrics_path, 'w') as file:
             json.dump(metrics, file, indent=2, default=str)
@@ -137,8 +296,14 @@ def print_summary_report(metrics):
     print("📊 ANALYSIS RESULTS SUMMARY")
     print("="*65)
     
-    # Show the key performance numbers
-    print(f"🎯 Overall Accuracy: {metrics['accuracy']:.1%}")
+    # Show the key performance numbers, with bootstrap intervals when we have them
+    intervals = metrics.get('confidence_intervals')
+    if intervals:
+        low, high = intervals['accuracy']
+        print(f"🎯 Overall Accuracy: {metrics['accuracy']:.1%} "
+              f"({intervals['confidence_level']:.0%} CI {low:.1%} - {high:.1%})")
+    else:
+        print(f"🎯 Overall Accuracy: {metrics['accuracy']:.1%}")
     print(f"📝 Total Reviews Analyzed: {metrics['total_samples']}")
     print(f"✅ Correct Predictions: {metrics['correct_predictions']}")
     
@@ -146,10 +311,11 @@ def print_summary_report(metrics):
     if metrics.get('skipped_samples', 0) > 0:
         print(f"⚠️  Reviews Skipped: {metrics['skipped_samples']} (invalid labels)")
     
-    # Show confidence score patterns
-    print(f"\n📈 Average Confidence Scores:")
-    print(f"   Correct predictions: {metrics.get('avg_confidence_correct', 0):.1%}")
-    print(f"   Incorrect predictions: {metrics.get('avg_confidence_wrong', 0):.1%}")
+    # Show confidence score patterns (label-only runs have no confidence scores)
+    if pd.notna(metrics.get('avg_confidence_correct')) or pd.notna(metrics.get('avg_confidence_wrong')):
+        print(f"\n📈 Average Confidence Scores:")
+        print(f"   Correct predictions: {metrics.get('avg_confidence_correct', 0):.1%}")
+        print(f"   Incorrect predictions: {metrics.get('avg_confidence_wrong', 0):.1%}")
     
     # Break down performance by each sentiment class
     print(f"\n📋 Performance by Sentiment:")
@@ -157,7 +323,11 @@ def print_summary_report(metrics):
         print(f"\n   {sentiment}:")
         print(f"      Precision: {stats['precision']:.3f}")
         print(f"      Recall: {stats['recall']:.3f}")
-        print(f"      F1-Score: {stats['f1_score']:.3f}")
+        if intervals:
+            low, high = intervals['f1_score'][sentiment]
+            print(f"      F1-Score: {stats['f1_score']:.3f} (CI {low:.3f} - {high:.3f})")
+        else:
+            print(f"      F1-Score: {stats['f1_score']:.3f}")
         print(f"      Number of samples: {stats['support']}")
     
     # Display confusion matrix in a readable format
@@ -175,151 +345,898 @@ def print_summary_report(metrics):
             print(f"{count:>8}", end="")
         print()
 
-def main():
-    """The main command-line interface for batch processing reviews."""
-    # Set up command-line argument parsing
-    parser = argparse.ArgumentParser(
-        description="Batch sentiment analysis for movie reviews",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
-Examples:
-  python batch_eval.py reviews.csv
-  python batch_eval.py reviews.csv --output results.csv
-  python batch_eval.py reviews.csv --sample 100 --verbose
-        """
+def parse_column_list(column_text):
+    """Turn "movie_title,id" into ['movie_title', 'id'] (None if not given)."""
+    if column_text is None:
+        return None
+    return [column.strip() for column in column_text.split(',') if column.strip()]
+
+def is_fallback_result(result):
+    """Whether a result was given by the local classifier while the circuit breaker kept the LLM out."""
+    return result.get('decided_by') == 'local_fallback'
+
+class ProgressDisplay:
+    """Advances the progress bar and shows live throughput, latency and retries next to it."""
+
+    def __init__(self, progress_bar, refresh_interval=0.5):
+        self.progress_bar = progress_bar
+        self.refresh_interval = refresh_interval
+        self.start_time = time.time()
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()  # Comparison runs update it from one thread per pass
+
+    def update(self, count=1):
+        with self._lock:
+            self.progress_bar.update(count)
+            now = time.time()
+            if now - self._last_refresh < self.refresh_interval:
+                return
+            self._last_refresh = now
+
+        run_stats = get_run_stats()
+        latency = get_latency_percentiles((50, 95))
+        postfix = {'calls/s': f"{run_stats.get('api_calls', 0) / max(now - self.start_time, 1e-9):.1f}"}
+        if latency:
+            postfix['p50'] = f"{latency[50]:.2f}s"
+            postfix['p95'] = f"{latency[95]:.2f}s"
+        postfix['retries'] = run_stats.get('retries', 0)
+        with self._lock:
+            self.progress_bar.set_postfix(postfix, refresh=False)
+
+def analyze_review_chunk(reviews, args, progress, row_offset=0, local_classifier=None,
+                         escalation_threshold=None, journal=None, rate_limiter=None,
+                         analysis_mode=None, backend=None, max_workers=None):
+    """Analyze one chunk of reviews with the options chosen on the command line.
+
+    Returns (results, local_results, llm_results, failed_analyses); the result
+    dicts are keyed by position within the chunk. LLM answers are written to
+    `journal` as they arrive, and answers already in it are reused.
+    `analysis_mode`, `backend` and `max_workers` override --mode, the active
+    backend and --workers for one pass of a comparison run.
+    """
+    # Empty or invalid reviews get a default result and never reach a classifier
+    review_texts = [str(review).strip() for review in reviews]
+    analysis_results = [None] * len(review_texts)
+    llm_positions = []
+    for position, review_text in enumerate(review_texts):
+        if not review_text or review_text.lower() in ['nan', 'none', '']:
+            analysis_results[position] = {
+                'label': 'Neutral',
+                'confidence': 0.0,
+                'explanation': 'Empty or missing review text',
+                'evidence_phrases': []
+            }
+        else:
+            llm_positions.append(position)
+
+    # Cascade: score locally first, escalate only the unsure reviews
+    local_results = {}
+    if local_classifier is not None:
+        local_predictions = local_classifier.classify_batch([review_texts[i] for i in llm_positions])
+        local_results = dict(zip(llm_positions, local_predictions))
+        llm_positions = [i for i in llm_positions if local_results[i]['confidence'] < escalation_threshold]
+
+    # Resuming: reviews an earlier run already got an answer for don't go to the LLM again
+    llm_results = {}
+    if journal is not None:
+        for position in llm_positions:
+            journaled_result = journal.lookup(row_offset + position, review_texts[position])
+            if journaled_result is not None:
+                llm_results[position] = journaled_result
+        llm_positions = [i for i in llm_positions if i not in llm_results]
+
+    progress.update(len(review_texts) - len(llm_positions))
+
+    def on_result(index, result):
+        position = llm_positions[index]
+        # Failed and fallback answers stay out of the journal so a resumed run asks the LLM again
+        if journal is not None and not is_failed_result(result) and not is_fallback_result(result):
+            journal.record(row_offset + position, review_texts[position], result)
+
+        # Show detailed progress if requested
+        if args.verbose:
+            if is_failed_result(result):
+                tqdm.write(f"Analysis failed for review {row_offset+position+1}: {result['explanation']}")
+            elif result['confidence'] is None:
+                tqdm.write(f"Review {row_offset+position+1}: {result['label']}")
+            else:
+                tqdm.write(f"Review {row_offset+position+1}: {result['label']} ({result['confidence']:.2f})")
+
+    # Analyze the rest concurrently within the quota - results come back in input order
+    batch_results = process_batch_reviews(
+        [review_texts[i] for i in llm_positions],
+        analysis_mode=analysis_mode or args.mode,
+        progress_callback=lambda completed, total: progress.update(1),
+        result_callback=on_result,
+        max_workers=max_workers or args.workers,
+        rate_limiter=rate_limiter,
+        use_cache=not args.no_cache,
+        refresh_cache=args.refresh_cache,
+        packed=args.packed,
+        pack_token_budget=args.pack_token_budget,
+        output_profile=args.profile,
+        deduplicate=not args.no_dedup,
+        backend=backend,
     )
+    llm_results.update(zip(llm_positions, batch_results))
+
+    # Combine the stages: local answers above the threshold, LLM answers for the rest
+    if local_classifier is None:
+        final_results = llm_results
+    else:
+        final_results = merge_cascade_results(local_results, llm_results, args.cascade_threshold)
+    for position, result in final_results.items():
+        analysis_results[position] = result
+    failed_analyses = sum(1 for position in llm_positions if is_failed_result(analysis_results[position]))
     
-    # Define what command-line arguments we accept
-    parser.add_argument("input_file", help="CSV file containing movie reviews (must have 'review' column)")
-    parser.add_argument("--output", "-o", help="Output CSV file path (default: adds '_results' to input name)")
-    parser.add_argument("--sample", "-s", type=int, help="Only process first N reviews (useful for testing)")
-    parser.add_argument("--verbose", "-v", action="store_true", help="Show detailed progress information")
+    return analysis_results, local_results, llm_results, failed_analyses
+
+def create_model_backend(backend_name, model_name):
+    """A backend of its own for one of the models being compared."""
+    backend = create_backend(backend_name, model_name, GENERATION_CONFIG, api_key=API_KEY)
+    if backend_name == 'mock':
+        # The mock has a single built-in model - name each copy so their cache entries stay apart
+        backend.model_name = f"mock:{model_name}"
+    return backend
+
+def plan_analysis_passes(args):
+    """Split a run over args.modes x args.models into analysis passes.
+
+    Each pass is one request per review: a dict with its 'name', the 'mode' and
+    'model' it asks with, the 'backend' to use (None for the active one) and its
+    'variants' - output name -> the verdict it provides (a mode inside a combined
+    answer, or None for a plain answer). With --combined, each model answers
+    both modes in a single pass; otherwise every (model, mode) pair is a pass.
+    """
+    def variant_name(model, mode):
+        if len(args.models) == 1:
+            return mode
+        return model if len(args.modes) == 1 else f"{model}_{mode}"
     
-    args = parser.parse_args()
+    passes = []
+    for model in args.models:
+        backend = create_model_backend(args.backend, model) if len(args.models) > 1 else None
+        if args.combined:
+            passes.append({
+                'name': model if len(args.models) > 1 else COMBINED_MODE,
+                'mode': COMBINED_MODE, 'model': model, 'backend': backend,
+                'variants': {variant_name(model, mode): mode for mode in args.modes},
+            })
+        else:
+            for mode in args.modes:
+                passes.append({
+                    'name': variant_name(model, mode), 'mode': mode, 'model': model, 'backend': backend,
+                    'variants': {variant_name(model, mode): None},
+                })
+    return passes
+
+def variant_result(result, verdict_mode=None):
+    """One mode's verdict out of a combined result (failed calls have none, so they stand for every mode)."""
+    verdict = result.get('verdicts', {}).get(verdict_mode) if verdict_mode else None
+    if verdict is None:
+        return result
+    if 'near_duplicate_similarity' in result:
+        verdict = dict(verdict, near_duplicate_similarity=result['near_duplicate_similarity'])
+    return verdict
+
+def add_result_columns(chunk_df, analysis_results, suffix='', near_duplicate_column=False):
+    """Add the prediction columns (named with `suffix` in comparison runs) for one chunk's results."""
+    chunk_df[f'predicted_sentiment{suffix}'] = [r['label'] for r in analysis_results]
+    # None (label-only answers) becomes NaN so the column stays numeric
+    chunk_df[f'confidence{suffix}'] = pd.to_numeric([r['confidence'] for r in analysis_results], errors='coerce')
+    chunk_df[f'explanation{suffix}'] = [r['explanation'] for r in analysis_results]
+    chunk_df[f'evidence_phrases{suffix}'] = [list(r['evidence_phrases']) for r in analysis_results]
+    if near_duplicate_column:
+        # Similarity of the stored review an answer was borrowed from (empty for real answers)
+        chunk_df[f'near_duplicate_similarity{suffix}'] = pd.to_numeric(
+            [r.get('near_duplicate_similarity') for r in analysis_results], errors='coerce'
+        )
+
+def metric_frame(chunk_df, suffix=''):
+    """The columns OnlineMetrics reads, for the predictions named with `suffix`."""
+    columns = {f'predicted_sentiment{suffix}': 'predicted_sentiment', f'confidence{suffix}': 'confidence'}
+    if 'true_sentiment' in chunk_df.columns:
+        columns['true_sentiment'] = 'true_sentiment'
+    return chunk_df[list(columns)].rename(columns=columns)
+
+def resolve_format(path, requested_format=None):
+    """The format a path is read/written in, from its extension - 'jsonl' for '-' (stdin/stdout),
+    'parquet'/'feather' for columnar files, otherwise 'csv' - unless a format was given."""
+    if requested_format:
+        return requested_format
+    suffix = Path(path).suffix.lower()
+    if path == '-' or suffix in JSONL_SUFFIXES:
+        return 'jsonl'
+    return COLUMNAR_SUFFIXES.get(suffix, 'csv')
+
+def iter_jsonl_records(stream, id_field='id'):
+    """Yield (record id, review, fields, error) for each line of a JSONL stream, one line at a time.
     
-    # Check that the API key is available before starting
-    if not os.getenv("GEMINI_API_KEY"):
-        print("❌ Error: GEMINI_API_KEY environment variable is required")
-        print("Obtain your free API key from: https://makersuite.google.com/app/apikey")
-        print("Configure it with: export GEMINI_API_KEY='your_key_here'")
-        sys.exit(1)
+    Lines are handed out as soon as they arrive, so this works on a pipe that is
+    still being written. The id is the record's `id_field`, or its position in the
+    stream if it has none. A line that isn't a JSON object comes back with an error
+    message instead of a review, so it still gets an output line in its place.
+    """
+    row = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+            if not isinstance(fields, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as error:
+            yield row, None, {}, f"Invalid JSON record: {error}"
+        else:
+            yield fields.get(id_field, row) if id_field else row, fields.get('review'), fields, None
+        row += 1
+
+def iter_csv_records(review_chunks, id_field='id'):
+    """Same as iter_jsonl_records(), for the chunks of a CSV file."""
+    row = 0
+    for chunk_df in review_chunks:
+        for fields in chunk_df.to_dict('records'):
+            # Empty CSV cells are NaN, which isn't valid JSON
+            fields = {column: None if pd.isna(value) else value for column, value in fields.items()}
+            yield fields.get(id_field, row), fields.get('review'), fields, None
+            row += 1
+
+async def pull_in_thread(iterator):
+    """Iterate a blocking iterator from the event loop, fetching each item on a worker thread."""
+    loop = asyncio.get_running_loop()
+    finished = object()
+    while True:
+        item = await loop.run_in_executor(None, next, iterator, finished)
+        if item is finished:
+            return
+        yield item
+
+def build_output_record(id_field, record_id, fields, result, keep_columns=None):
+    """The JSON line for one review: its id, any columns asked for, and the analysis result."""
+    output_record = {id_field: record_id}
+    for column in keep_columns or ():
+        if column in fields and column != id_field:
+            output_record[column] = fields[column]
+    output_record.update({
+        'predicted_sentiment': result['label'],
+        'confidence': result['confidence'],
+        'explanation': result['explanation'],
+        'evidence_phrases': result['evidence_phrases'],
+    })
+    if 'near_duplicate_similarity' in result:
+        output_record['near_duplicate_similarity'] = result['near_duplicate_similarity']
+    return output_record
+
+class JsonlResultWriter:
+    """Writes one flushed JSON line per review as soon as its result is ready.
     
-    # Figure out where to save the results
-    if args.output:
-        output_file = args.output
-    else:
-        input_path = Path(args.input_file)
-        output_file = input_path.parent / f"{input_path.stem}_results.csv"
+    With `ordered`, a line that finishes early waits until every line before it
+    is out, so the output lines up with the input; otherwise lines go out in
+    completion order and a slow review never holds back the others.
+    """
     
-    # Show what we're about to do
-    print("🎬 Movie Review Sentiment Analysis - Batch Processing")
-    print(f"📁 Input file: {args.input_file}")
-    print(f"💾 Output file: {output_file}")
+    def __init__(self, output_stream, ordered=True):
+        self.output_stream = output_stream
+        self.ordered = ordered
+        self.rows_written = 0
+        self._waiting = {}  # stream position -> line held back for ordering
+        self._next_position = 0
     
-    # Load the input file and check its format
-    print("\n📖 Loading reviews from file...")
-    reviews_df = load_reviews_from_file(args.input_file)
+    def write(self, position, output_record):
+        line = json.dumps(output_record, ensure_ascii=False, default=str) + "\n"
+        if not self.ordered:
+            self._emit(line)
+            return
+        self._waiting[position] = line
+        while self._next_position in self._waiting:
+            self._emit(self._waiting.pop(self._next_position))
+            self._next_position += 1
     
-    # If user requested a sample, take just the first N reviews
-    if args.sample:
-        reviews_df = reviews_df.head(args.sample)
-        print(f"📝 Processing first {len(reviews_df)} reviews (sample mode)")
+    def _emit(self, line):
+        self.output_stream.write(line)
+        self.output_stream.flush()
+        self.rows_written += 1
+
+def print_api_usage(args):
+    """Show how many API calls the run made and how much the dedup, caches and index saved."""
+    run_stats = get_run_stats()
+    if run_stats.get('api_calls'):
+        print(f"📡 API calls: {run_stats['api_calls']} "
+              f"(~{run_stats.get('estimated_input_tokens', 0):,} input tokens)")
+        if run_stats.get('salvaged_responses') or run_stats.get('errors_parse'):
+            print(f"   Malformed JSON answers: {run_stats.get('salvaged_responses', 0)} salvaged locally, "
+                  f"{run_stats.get('errors_parse', 0)} needed a retry")
+        if run_stats.get('retries'):
+            error_counts = ", ".join(
+                f"{name[len('errors_'):]}: {count}"
+                for name, count in sorted(run_stats.items()) if name.startswith('errors_')
+            )
+            print(f"   Retries: {run_stats['retries']} ({error_counts})")
+        if run_stats.get('circuit_open_skips'):
+            print(f"   ⚠️  Circuit breaker open: {run_stats['circuit_open_skips']} requests skipped or sent to the fallback")
+        if run_stats.get('packed_calls'):
+            print(f"   Packed requests: {run_stats['packed_calls']}, "
+                  f"per-review fallbacks: {run_stats.get('packed_fallbacks', 0)}")
+    
+    # Show how many reviews were copies of another one in the same run
+    if run_stats.get('dedup_reviews') and not args.no_dedup:
+        duplicates = run_stats.get('duplicate_reviews', 0)
+        # Packed requests share calls anyway, so there a duplicate only saves a slot in a pack
+        saved = f"{duplicates:,} pack slots saved" if args.packed else f"{duplicates:,} API calls saved"
+        print(f"🔁 Deduplication: {run_stats['dedup_reviews']:,} reviews, "
+              f"{run_stats.get('distinct_reviews', 0):,} distinct "
+              f"({duplicates / run_stats['dedup_reviews']:.1%} duplicates, {saved})")
+    
+    # Show how much work the result cache saved
+    cache = get_result_cache()
+    if cache is not None and not args.no_cache:
+        cache_stats = cache.stats()
+        print(f"💾 Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+              f"({cache_stats['hit_rate']:.1%} hit rate, {cache_stats['entries']} entries stored)")
+    
+    # Show how many answers were borrowed from near-identical reviews
+    near_duplicate_index = get_near_duplicate_index()
+    if near_duplicate_index is not None and not args.no_cache:
+        index_stats = near_duplicate_index.stats()
+        print(f"≈  Near-duplicates: {index_stats['hits']} approximate hits at similarity ≥ {index_stats['threshold']:g} "
+              f"({index_stats['entries']} reviews indexed)")
+
+def report_metrics(metrics, output_file, cascade_tradeoff=None, cascade_threshold=None, early_stop=None):
+    """Save and show the accuracy metrics, the sentiment distribution and the average confidence."""
+    print("\n📊 Calculating performance metrics...")
+    performance_metrics = metrics.summary()
+    if cascade_tradeoff is not None and metrics.has_ground_truth:
+        performance_metrics['cascade'] = cascade_tradeoff.summary()
+    if early_stop is not None:
+        performance_metrics['early_stop'] = early_stop
+    
+    # Results on stdout leave nowhere to put the metrics file - the report below still shows them
+    if output_file != '-':
+        save_metrics_to_file(output_file, performance_metrics)
+    
+    print_summary_report(performance_metrics)
+    if 'cascade' in performance_metrics:
+        print_cascade_report(performance_metrics['cascade'], cascade_threshold)
+    
+    # Show the overall sentiment breakdown
+    total_reviews = metrics.total_rows
+    print(f"\n📈 Sentiment Distribution:")
+    for sentiment, count in sorted(metrics.predicted_counts.items(), key=lambda item: -item[1]):
+        percentage = count / max(total_reviews, 1) * 100
+        print(f"   {sentiment}: {count} reviews ({percentage:.1f}%)")
+    
+    # Show average confidence
+    avg_confidence = metrics.average_confidence()
+    if pd.notna(avg_confidence):
+        print(f"\n🎯 Average Confidence Score: {avg_confidence:.1%}")
+
+def report_comparison(variant_metrics, agreements, output_file, early_stop=None):
+    """Save and show the metrics of every mode/model side by side, and how often each pair agrees."""
+    print("\n📊 Calculating performance metrics...")
+    comparison = {'variants': {}, 'agreement': {}}
+    for variant, metrics in variant_metrics.items():
+        comparison['variants'][variant] = dict(
+            metrics.summary(),
+            predicted_counts=metrics.predicted_counts,
+            average_confidence=metrics.average_confidence(),
+            total_reviews=metrics.total_rows,
+        )
+    for (first, second), agreement in agreements.items():
+        comparison['agreement'][f"{first} vs {second}"] = agreement.summary()
+    if early_stop is not None:
+        comparison['early_stop'] = early_stop
+    save_metrics_to_file(output_file, comparison)
+    
+    # One row per variant: accuracy (with its interval), macro F1, confidence and label mix
+    name_width = max(len(variant) for variant in variant_metrics) + 2
+    print("\n" + "="*65)
+    print("📊 COMPARISON SUMMARY")
+    print("="*65)
+    print(f"{'':<{name_width}}{'Accuracy':>24}{'Macro F1':>10}{'Avg conf':>10}"
+          + "".join(f"{label[:8]:>10}" for label in SENTIMENT_LABELS))
+    for variant, summary in comparison['variants'].items():
+        accuracy = macro_f1 = '-'
+        if 'accuracy' in summary:
+            accuracy = f"{summary['accuracy']:.1%}"
+            intervals = summary.get('confidence_intervals')
+            if intervals:
+                low, high = intervals['accuracy']
+                accuracy += f" ({low:.1%}-{high:.1%})"
+            f1_scores = [stats['f1_score'] for stats in summary['class_metrics'].values()]
+            macro_f1 = f"{sum(f1_scores) / len(f1_scores):.3f}"
+        avg_confidence = summary['average_confidence']
+        confidence = f"{avg_confidence:.1%}" if pd.notna(avg_confidence) else '-'
+        shares = "".join(
+            f"{summary['predicted_counts'].get(label, 0) / max(summary['total_reviews'], 1):>10.1%}"
+            for label in SENTIMENT_LABELS
+        )
+        print(f"{variant:<{name_width}}{accuracy:>24}{macro_f1:>10}{confidence:>10}{shares}")
+    
+    # Agreement matrix for every pair: rows are the first variant's labels, columns the second's
+    print(f"\n🤝 Agreement:")
+    for pair, summary in comparison['agreement'].items():
+        if 'error' in summary:
+            print(f"   {pair}: {summary['error']}")
+            continue
+        print(f"   {pair}: {summary['agreement']:.1%} same label, Cohen's kappa {summary['cohens_kappa']:.3f} "
+              f"({summary['compared_samples']} reviews)")
+        print("          ", end="")
+        for label in SENTIMENT_LABELS:
+            print(f"{label[:6]:>8}", end="")
+        print()
+        for first_label, row in summary['crosstab'].items():
+            print(f"   {first_label[:6]:>6} ", end="")
+            for second_label in SENTIMENT_LABELS:
+                print(f"{row[second_label]:>8}", end="")
+            print()
+
+def run_batch(args, input_format, output_file, output_format='csv'):
+    """Chunked mode: analyze the input a chunk at a time and append each chunk to the output file.
+    
+    Comparing several modes/models reads the input once: each chunk goes through
+    every analysis pass at the same time, and the passes share the rate limiter
+    and split --workers between them.
+    """
+    passes = plan_analysis_passes(args)
+    variants = [variant for analysis_pass in passes for variant in analysis_pass['variants']]
+    
+    # Every LLM answer is journaled as it arrives, so an interrupted run can be resumed - one journal per pass
+    journals = []
+    for analysis_pass in passes:
+        journal_suffix = f"_{analysis_pass['name']}" if len(passes) > 1 else ''
+        journal_file = str(Path(output_file).with_name(f"{Path(output_file).stem}_journal{journal_suffix}.jsonl"))
+        journal_options = {'backend': args.backend, 'model': analysis_pass['model'],
+                           'mode': analysis_pass['mode'], 'profile': args.profile}
+        try:
+            journals.append(CheckpointJournal(journal_file, journal_options, resume=args.resume))
+        except ValueError as error:
+            print(f"❌ Error: {error}")
+            sys.exit(1)
+        if args.resume:
+            print(f"♻️  Resuming: {len(journals[-1])} answers found in {journal_file}")
+    
+    # Open the input file as a stream of chunks
+    print("\n📖 Streaming reviews from file...")
+    keep_columns = parse_column_list(args.keep_columns)
+    total_rows = args.sample
+    if args.early_stop:
+        # Sequential evaluation: labeled rows in stratified random order, checked every few rows
+        review_chunks, total_rows = stratified_review_chunks(
+            args.input_file, args.check_every, keep_columns, input_format, args.seed, args.sample
+        )
+        print(f"🎲 Early stopping: {total_rows:,} labeled reviews in stratified random order (seed {args.seed}), "
+              f"stopping once every interval is within ±{args.early_stop:.1%}")
     else:
-        print(f"📝 Processing {len(reviews_df)} reviews")
+        review_chunks = read_review_chunks(args.input_file, args.chunk_size, args.sample, keep_columns, input_format)
+    if args.sample:
+        print(f"📝 Processing first {args.sample} reviews (sample mode)")
     
     # Start the main analysis process
     print(f"\n🤖 Analyzing sentiment...")
     start_time = time.time()
     
     # Track results and failures
-    analysis_results = []
     failed_analyses = 0
+    reset_run_stats()
+    variant_metrics = {variant: OnlineMetrics(args.bootstrap) for variant in variants}
+    agreements = {pair: OnlineAgreement() for pair in itertools.combinations(variants, 2)}
+    # One limiter for the whole run, so the quota holds across chunks
+    rate_limiter = get_rate_limiter(
+        requests_per_minute=args.rps * 60 if args.rps else None,
+        tokens_per_minute=args.tpm,
+    )
+    
+    stopped_early = False
+    
+    # Cascade: the local classifier answers confident reviews, only the rest go to the LLM
+    local_classifier = None
+    cascade_tradeoff = None
+    escalation_threshold = None
+    locally_scored = escalated_reviews = failed_escalations = 0
+    if args.cascade:
+        cascade_thresholds = sorted(set([args.cascade_threshold] + parse_thresholds(args.cascade_sweep)))
+        local_classifier = load_local_classifier(args.cascade_train)
+        cascade_tradeoff = CascadeTradeoff(cascade_thresholds)
+        # Escalate for the highest threshold we report on, so every threshold can be scored
+        escalation_threshold = max(cascade_thresholds)
+        
+        # If the LLM goes down mid-run, let the local classifier answer instead of failing rows
+        set_circuit_fallback(
+            lambda text, mode: dict(local_classifier.classify_batch([text])[0], decided_by='local_fallback')
+        )
+    
+    # CSV is appended a chunk at a time; Parquet/Feather a row group at a time
+    column_suffixes = {variant: f"_{variant}" if len(variants) > 1 else '' for variant in variants}
+    if output_format in COLUMNAR_FORMATS:
+        try:
+            writer = ColumnarResultWriter(output_file, output_format, args.compression, args.row_group_size,
+                                          column_suffixes=list(column_suffixes.values()))
+        except (ImportError, ValueError) as error:
+            print(f"❌ Error: {error}")
+            sys.exit(1)
+    else:
+        writer = ResultWriter(output_file)
     
-    # Process each review with a progress bar
-    with tqdm(total=len(reviews_df), desc="Processing reviews") as progress_bar:
-        for index, row in reviews_df.iterrows():
-            review_text = str(row['review']).strip()
+    # Analyze one chunk at a time and append it to the output as soon as it's done
+    near_duplicate_column = get_near_duplicate_index() is not None and not args.no_cache
+    pass_workers = max(1, args.workers // len(passes))
+    with contextlib.ExitStack() as stack:
+        for journal in journals:
+            stack.enter_context(journal)
+        stack.enter_context(writer)
+        pass_executor = stack.enter_context(ThreadPoolExecutor(max_workers=len(passes)))
+        progress_bar = stack.enter_context(tqdm(
+            total=total_rows * len(passes) if total_rows else None,
+            desc="Processing reviews" if len(passes) == 1 else f"Processing reviews x {len(passes)} passes",
+            unit="review",
+        ))
+        progress = ProgressDisplay(progress_bar)
+        for chunk_df in review_chunks:
+            chunk_df = chunk_df.reset_index(drop=True)
+            chunk_futures = [
+                pass_executor.submit(
+                    analyze_review_chunk, chunk_df['review'], args, progress, writer.rows_written,
+                    local_classifier, escalation_threshold, journal, rate_limiter,
+                    analysis_pass['mode'], analysis_pass['backend'], pass_workers,
+                )
+                for analysis_pass, journal in zip(passes, journals)
+            ]
             
-            # Handle empty or invalid reviews
-            if not review_text or review_text.lower() in ['nan', 'none', '']:
-                result = {
-                    'label': 'Neutral',
-                    'confidence': 0.0,
-                    'explanation': 'Empty or missing review text',
-                    'evidence_phrases': []
-                }
-            # Try to analyze the review
-            else:
-                try:
-                    result = analyze_sentiment(review_text)
-                    
-                    # Show detailed progress if requested
-                    if args.verbose:
-                        sentiment = result['label']
-                        confidence = result['confidence']
-                        tqdm.write(f"Review {index+1}: {sentiment} ({confidence:.2f})")
-                        
-                # Handle analysis failures gracefully
-                except Exception as error:
-                    if args.verbose:
-                        tqdm.write(f"Analysis failed for review {index+1}: {error}")
-                    
-                    failed_analyses += 1
-                    result = {
-                        'label': 'Neutral',
-                        'confidence': 0.0,
-                        'explanation': f'Analysis failed: {str(error)}',
-                        'evidence_phrases': []
-                    }
+            for analysis_pass, chunk_future in zip(passes, chunk_futures):
+                analysis_results, local_results, llm_results, chunk_failures = chunk_future.result()
+                failed_analyses += chunk_failures
+                
+                # Add the analysis results to this chunk - one set of columns per mode/model
+                for variant, verdict_mode in analysis_pass['variants'].items():
+                    add_result_columns(chunk_df, [variant_result(r, verdict_mode) for r in analysis_results],
+                                       column_suffixes[variant], near_duplicate_column)
+                if args.cascade:
+                    chunk_df['decided_by'] = [r.get('decided_by', 'none') for r in analysis_results]
+                    locally_scored += len(local_results)
+                    escalated_reviews += len(llm_results)
+                    failed_escalations += sum(r.get('decided_by') == 'local_escalation_failed'
+                                              for r in analysis_results)
+            
+            # If we have ground truth labels, mark which predictions were correct
+            if 'true_sentiment' in chunk_df.columns:
+                # A chunk with no labels at all is read as floats - cast, and leave unlabeled rows empty
+                true_labels = chunk_df['true_sentiment'].astype('string').str.strip().str.title()
+                labeled = true_labels.fillna('') != ''
+                for suffix in column_suffixes.values():
+                    matches = true_labels == chunk_df[f'predicted_sentiment{suffix}']
+                    chunk_df[f'correct{suffix}'] = matches.astype('boolean').where(labeled)
+                if cascade_tradeoff is not None:
+                    cascade_tradeoff.update(chunk_df['true_sentiment'], local_results, llm_results)
             
-            analysis_results.append(result)
-            progress_bar.update(1)
+            writer.write(chunk_df)
+            for journal in journals:
+                journal.sync()
+            for variant, metrics in variant_metrics.items():
+                metrics.update(metric_frame(chunk_df, column_suffixes[variant]))
+            for (first, second), agreement in agreements.items():
+                agreement.update(chunk_df[f'predicted_sentiment{column_suffixes[first]}'],
+                                 chunk_df[f'predicted_sentiment{column_suffixes[second]}'])
+            
+            # Stop as soon as the estimates are precise enough - for every mode/model being compared
+            if args.early_stop and writer.rows_written >= args.early_stop_min:
+                intervals = [metrics.confidence_intervals() for metrics in variant_metrics.values()]
+                if None not in intervals and max(map(widest_interval_half_width, intervals)) <= args.early_stop:
+                    stopped_early = True
+                    break
     
     # Calculate how long the whole process took
     total_time = time.time() - start_time
-    
-    # Add the analysis results to our dataframe
-    reviews_df['predicted_sentiment'] = [r['label'] for r in analysis_results]
-    reviews_df['confidence'] = [r['confidence'] for r in analysis_results]
-    reviews_df['explanation'] = [r['explanation'] for r in analysis_results]
-    reviews_df['evidence_phrases'] = [', '.join(r['evidence_phrases']) for r in analysis_results]
-    
-    # If we have ground truth labels, mark which predictions were correct
-    if 'true_sentiment' in reviews_df.columns:
-        reviews_df['correct'] = (
-            reviews_df['true_sentiment'].str.strip().str.title() == 
-            reviews_df['predicted_sentiment']
-        )
+    total_reviews = writer.rows_written
     
     # Report completion and timing
     print(f"\n✅ Analysis completed successfully!")
-    print(f"⏱️  Total processing time: {total_time:.1f} seconds ({total_time/len(reviews_df):.1f}s per review)")
+    print(f"⏱️  Total processing time: {total_time:.1f} seconds ({total_time/max(total_reviews, 1):.1f}s per review)")
+    print(f"✅ Analysis results saved to: {output_file}")
+    reused_answers = sum(journal.reused for journal in journals)
+    if reused_answers:
+        print(f"♻️  {reused_answers} answers reused from the journal instead of calling the LLM again")
+    if args.cascade:
+        print(f"⚡ Local classifier scored {locally_scored} reviews, "
+              f"escalated {escalated_reviews} to the LLM")
+        if failed_escalations:
+            print(f"⚠️  {failed_escalations} escalations failed and kept the local classifier's answer")
     
     # Report any failures
     if failed_analyses > 0:
         print(f"⚠️  {failed_analyses} reviews failed analysis and were assigned default values")
     
-    # Calculate performance metrics and save everything
-    print("\n📊 Calculating performance metrics...")
-    performance_metrics = calculate_performance_metrics(reviews_df)
+    print_api_usage(args)
     
-    save_results_to_files(reviews_df, output_file, performance_metrics)
+    # Compare with scoring every row: the rows left out would have cost as much per review
+    early_stop = None
+    if args.early_stop:
+        intervals = [metrics.confidence_intervals() for metrics in variant_metrics.values()]
+        api_calls = get_run_stats().get('api_calls', 0)
+        early_stop = {
+            'target_half_width': args.early_stop,
+            'stopped_early': stopped_early,
+            'evaluated_reviews': total_reviews,
+            'total_reviews': total_rows,
+            'widest_half_width': max(map(widest_interval_half_width, intervals)) if None not in intervals else None,
+            'api_calls': api_calls,
+            'estimated_api_calls_saved': round(api_calls / max(total_reviews, 1) * (total_rows - total_reviews)),
+            'seed': args.seed,
+        }
+        print_early_stop_report(early_stop)
     
-    print_summary_report(performance_metrics)
+    # Performance metrics were accumulated chunk by chunk - save and show them
+    if len(variants) > 1:
+        report_comparison(variant_metrics, agreements, output_file, early_stop)
+    else:
+        report_metrics(variant_metrics[variants[0]], output_file, cascade_tradeoff, args.cascade_threshold, early_stop)
+
+def run_streaming(args, input_format, output_file, output_stream):
+    """Pipeline mode: analyze records as they're read and write a JSON line for each as soon as it's done.
     
-    # Show the overall sentiment breakdown
-    sentiment_distribution = reviews_df['predicted_sentiment'].value_counts()
-    print(f"\n📈 Sentiment Distribution:")
-    for sentiment, count in sentiment_distribution.items():
-        percentage = count / len(reviews_df) * 100
-        print(f"   {sentiment}: {count} reviews ({percentage:.1f}%)")
+    A record is only read once a request slot is free, so memory stays bounded on
+    an endless stream and the first line comes out after a single request.
+    """
+    keep_columns = parse_column_list(args.keep_columns)
+    if input_format == 'jsonl':
+        input_stream = sys.stdin if args.input_file == '-' else open(args.input_file, encoding='utf-8')
+        records = iter_jsonl_records(input_stream, args.id_field)
+    else:
+        review_chunks = read_review_chunks(args.input_file, args.chunk_size, args.sample, keep_columns)
+        records = iter_csv_records(review_chunks, args.id_field)
+    if args.sample:
+        records = itertools.islice(records, args.sample)
+    
+    print(f"\n🤖 Analyzing sentiment as records arrive ({'completion' if args.unordered else 'input'} order)...")
+    start_time = time.time()
+    first_result_time = None
+    failed_analyses = invalid_records = 0
+    reset_run_stats()
+    metrics = OnlineMetrics(args.bootstrap)
+    metric_rows = []  # Fed to the metrics a chunk at a time
+    in_flight = {}  # stream position -> (record id, fields, error)
+    
+    async def review_stream():
+        # Reading happens on a worker thread, so a slow producer never stalls requests already in flight
+        position = 0
+        async for record_id, review, fields, error in pull_in_thread(records):
+            in_flight[position] = (record_id, fields, error)
+            position += 1
+            # Invalid records go through as empty reviews, which are answered without a request
+            yield None if error else review
+    
+    async def analyze_stream(writer, progress):
+        nonlocal first_result_time, failed_analyses, invalid_records
+        async for position, result in analyze_reviews_async(
+            review_stream(),
+            analysis_mode=args.mode,
+            max_concurrency=args.workers,
+            requests_per_minute=args.rps * 60 if args.rps else None,
+            tokens_per_minute=args.tpm,
+            use_cache=not args.no_cache,
+            refresh_cache=args.refresh_cache,
+            output_profile=args.profile,
+        ):
+            record_id, fields, error = in_flight.pop(position)
+            if error:
+                invalid_records += 1
+                writer.write(position, {args.id_field: record_id, 'error': error})
+            else:
+                writer.write(position, build_output_record(args.id_field, record_id, fields, result, keep_columns))
+                failed_analyses += is_failed_result(result)
+                metric_row = {'predicted_sentiment': result['label'], 'confidence': result['confidence']}
+                if 'true_sentiment' in fields:
+                    metric_row['true_sentiment'] = fields['true_sentiment']
+                metric_rows.append(metric_row)
+                if len(metric_rows) >= args.chunk_size:
+                    metrics.update(pd.DataFrame(metric_rows))
+                    metric_rows.clear()
+            
+            if first_result_time is None:
+                first_result_time = time.time() - start_time
+            progress.update(1)
+            if args.verbose:
+                tqdm.write(f"Record {record_id}: {result['label']}")
+    
+    writer = JsonlResultWriter(output_stream, ordered=not args.unordered)
+    try:
+        with tqdm(total=args.sample, desc="Processing reviews", unit="review") as progress_bar:
+            asyncio.run(analyze_stream(writer, ProgressDisplay(progress_bar)))
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into `head`) - stop quietly, as other Unix tools do
+        os.dup2(os.open(os.devnull, os.O_WRONLY), output_stream.fileno())
+        print("⚠️  Output closed by the reader - stopping early")
+    finally:
+        if output_file != '-':
+            output_stream.close()
+    if metric_rows:
+        metrics.update(pd.DataFrame(metric_rows))
+    
+    # Report completion and timing
+    total_time = time.time() - start_time
+    print(f"\n✅ Analysis completed successfully!")
+    print(f"⏱️  Total processing time: {total_time:.1f} seconds for {writer.rows_written} records")
+    if first_result_time is not None:
+        print(f"⚡ First result after {first_result_time:.2f} seconds")
+    if output_file != '-':
+        print(f"✅ Analysis results saved to: {output_file}")
+    if invalid_records:
+        print(f"⚠️  {invalid_records} input lines weren't valid JSON records and got an error line instead")
+    if failed_analyses > 0:
+        print(f"⚠️  {failed_analyses} reviews failed analysis and were assigned default values")
+    
+    print_api_usage(args)
+    report_metrics(metrics, output_file)
+
+def main():
+    """The main command-line interface for batch processing reviews."""
+    # Set up command-line argument parsing
+    parser = argparse.ArgumentParser(
+        description="Batch sentiment analysis for movie reviews",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python batch_eval.py reviews.csv
+  python batch_eval.py reviews.csv --output results.csv
+  python batch_eval.py reviews.csv --sample 100 --verbose
+  python batch_eval.py reviews.csv --mode strict --workers 16 --rps 5 --tpm 1000000
+  python batch_eval.py huge_dump.csv --chunk-size 5000 --keep-columns movie_title
+  python batch_eval.py huge_dump.csv --resume
+  python batch_eval.py reviews.csv --refresh-cache
+  python batch_eval.py reviews.csv --near-dup 0.9
+  python batch_eval.py reviews.csv --packed --pack-token-budget 8000
+  python batch_eval.py reviews.csv --profile label_only
+  python batch_eval.py reviews.csv --backend mock
+  python batch_eval.py reviews.csv --cascade --cascade-train labeled.csv --cascade-sweep 0.6,0.7,0.8,0.9
+  python batch_eval.py labeled.csv --early-stop 0.02 --mode strict
+  python batch_eval.py labeled.csv --modes strict,lenient --combined
+  python batch_eval.py labeled.csv --models gemini-1.5-flash,gemini-1.5-pro --modes strict,lenient
+  kafka_dump | python batch_eval.py - --unordered > results.jsonl
+  python batch_eval.py reviews.jsonl --output results.jsonl
+        """
+    )
     
-    # Show average confidence and wrap up
-    avg_confidence = reviews_df['confidence'].mean()
-    print(f"\n🎯 Average Confidence Score: {avg_confidence:.1%}")
+    # Define what command-line arguments we accept
+    parser.add_argument("input_file", help="CSV or JSONL file of movie reviews (a 'review' column/field), or '-' for JSONL on stdin")
+    parser.add_argument("--output", "-o",
+                        help="Output file, or '-' for JSONL on stdout (default: adds '_results' to the input name; stdout for stdin input)")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"],
+                        help="Input format (default: jsonl for '-' and .jsonl/.ndjson files, otherwise csv)")
+    parser.add_argument("--output-format", choices=["csv", "jsonl", *COLUMNAR_FORMATS],
+                        help="Output format - jsonl writes each record as soon as it is done, parquet/feather "
+                             "write typed columns (default: from the output name)")
+    parser.add_argument("--compression", choices=sorted(set(sum(COMPRESSIONS.values(), ()))),
+                        help="Parquet/Feather compression (default: zstd for Parquet, none for Feather so it can be memory-mapped)")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help=f"Rows per Parquet row group / Feather record batch (default: {DEFAULT_ROW_GROUP_SIZE})")
+    parser.add_argument("--unordered", action="store_true",
+                        help="JSONL output: write records in completion order instead of input order")
+    parser.add_argument("--id-field", default="id",
+                        help="Field/column tagging each JSONL output record (default: 'id', falling back to the input position)")
+    parser.add_argument("--sample", "-s", type=int, help="Only process first N reviews (useful for testing)")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Show detailed progress information")
+    parser.add_argument("--mode", choices=["lenient", "strict"], default="lenient",
+                        help="Analysis mode - 'strict' needs strong evidence before leaving Neutral (default: lenient)")
+    parser.add_argument("--modes", help="Comma-separated modes to compare in one pass over the input, e.g. strict,lenient "
+                                        "(side-by-side columns, per-mode metrics and an agreement matrix)")
+    parser.add_argument("--models", help=f"Comma-separated models to compare the same way (default: {MODEL_NAME})")
+    parser.add_argument("--combined", action="store_true",
+                        help="With --modes strict,lenient: get both verdicts from one request per review (half the calls)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f"Concurrent requests (default: {DEFAULT_MAX_WORKERS}, or GEMINI_MAX_WORKERS)")
+    parser.add_argument("--rps", type=float, help="Max requests per second (default: GEMINI_RPM / 60)")
+    parser.add_argument("--tpm", type=int, help="Max tokens per minute (default: GEMINI_TPM)")
+    parser.add_argument("--bootstrap", type=int, default=DEFAULT_BOOTSTRAP_RESAMPLES,
+                        help=f"Bootstrap resamples for the accuracy/F1 confidence intervals, 0 to skip (default: {DEFAULT_BOOTSTRAP_RESAMPLES})")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Reviews read, analyzed and written per chunk (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--keep-columns", help="Comma-separated extra columns to copy to the output (default: all columns for CSV, none for JSONL)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run: reuse the answers in its journal (<output>_journal.jsonl, "
+                             "or one per mode/model when comparing)")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Analyze every copy of a repeated review instead of once per distinct text")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the local result cache")
+    parser.add_argument("--refresh-cache", action="store_true", help="Re-analyze every review and overwrite cached results")
+    parser.add_argument("--near-dup", type=float, metavar="THRESHOLD",
+                        help="Reuse the answer of an already analyzed review at least this similar (0-1, e.g. 0.9; default: off)")
+    parser.add_argument("--backend", choices=["gemini", "mock"], default=BACKEND_NAME,
+                        help="Model backend - 'mock' runs offline for load testing (see SENTIMENT_MOCK_* settings)")
+    parser.add_argument("--packed", action="store_true", help="Classify many reviews per API call (fewer calls and input tokens)")
+    parser.add_argument("--pack-token-budget", type=int, help="Max estimated tokens per packed request (default: 6000)")
+    parser.add_argument("--profile", choices=list(OUTPUT_PROFILES), default="full",
+                        help="How much each answer contains - 'label_confidence' and 'label_only' skip the explanation for faster, cheaper calls")
+    parser.add_argument("--cascade", action="store_true", help="Let a fast local classifier answer confident reviews; escalate the rest to the LLM")
+    parser.add_argument("--cascade-train", help="Labeled CSV (review, true_sentiment) to train the local classifier on (default: built-in lexicon)")
+    parser.add_argument("--cascade-threshold", type=float, default=0.8, help="Local confidence needed to skip the LLM (default: 0.8)")
+    parser.add_argument("--cascade-sweep", help="Comma-separated thresholds to report accuracy/escalation rate for, e.g. 0.6,0.7,0.8,0.9")
+    parser.add_argument("--early-stop", type=float, metavar="HALF_WIDTH",
+                        help="Evaluate labeled rows in stratified random order and stop once the accuracy and per-class F1 "
+                             "intervals are all within ± this much, e.g. 0.02")
+    parser.add_argument("--early-stop-min", type=int, default=100,
+                        help="Reviews to score before early stopping may kick in (default: 100)")
+    parser.add_argument("--check-every", type=int, default=50,
+                        help="Early stopping: reviews analyzed between interval checks (default: 50)")
+    parser.add_argument("--seed", type=int, default=0, help="Early stopping: seed for the random review order (default: 0)")
     
-    print(f"\n📋 Results saved successfully!")
+    args = parser.parse_args()
+    if args.near_dup is not None and not 0 < args.near_dup <= 1:
+        parser.error("--near-dup must be between 0 and 1")
+    
+    # Figure out where to save the results, and in which format
+    input_format = resolve_format(args.input_file, args.input_format)
+    if args.output:
+        output_file = args.output
+    elif args.input_file == '-':
+        output_file = '-'
+    else:
+        input_path = Path(args.input_file)
+        output_file = str(input_path.parent / f"{input_path.stem}_results.{args.output_format or input_format}")
+    output_format = resolve_format(output_file, args.output_format)
+    if output_format != 'jsonl' and output_file == '-':
+        parser.error("only JSONL output can go to stdout")
+    if args.compression and args.compression not in COMPRESSIONS.get(output_format, ()):
+        parser.error(f"--compression {args.compression} isn't available for {output_format} output")
+    if output_format == 'jsonl' and (args.packed or args.cascade or args.resume or args.early_stop):
+        parser.error("--packed, --cascade, --resume and --early-stop need CSV, Parquet or Feather output "
+                     "(JSONL output streams one review at a time)")
+    if args.early_stop is not None and (not 0 < args.early_stop < 1 or args.bootstrap <= 0):
+        parser.error("--early-stop needs a half-width between 0 and 1 and --bootstrap above 0")
+    
+    # Comparison runs: every (model, mode) pair gets its own set of columns and metrics
+    args.modes = list(dict.fromkeys(parse_column_list(args.modes) or [args.mode]))
+    args.models = list(dict.fromkeys(parse_column_list(args.models) or [MODEL_NAME]))
+    if not set(args.modes) <= set(COMBINED_MODES):
+        parser.error(f"--modes takes {' and/or '.join(COMBINED_MODES)}")
+    args.mode = args.modes[0]  # What a single-mode run uses
+    if args.combined and (set(args.modes) != set(COMBINED_MODES) or args.packed):
+        parser.error("--combined needs --modes strict,lenient and doesn't work with --packed")
+    if len(args.modes) * len(args.models) > 1 and (args.cascade or output_format == 'jsonl'):
+        parser.error("comparing several modes or models needs CSV, Parquet or Feather output and no --cascade")
+    
+    # With results on stdout, every message goes to stderr so the stream stays clean JSONL
+    output_stream = sys.stdout
+    report_stream = contextlib.redirect_stdout(sys.stderr) if output_file == '-' else contextlib.nullcontext()
+    with report_stream:
+        # Check that the API key is available before starting (the mock backend runs offline)
+        if args.backend == "gemini" and not os.getenv("GEMINI_API_KEY"):
+            print("❌ Error: GEMINI_API_KEY environment variable is required")
+            print("Obtain your free API key from: https://makersuite.google.com/app/apikey")
+            print("Configure it with: export GEMINI_API_KEY='your_key_here'")
+            sys.exit(1)
+        
+        # A single --models entry replaces the default model; several get a backend per pass
+        active_model = args.models[0] if len(args.models) == 1 else MODEL_NAME
+        if active_model == MODEL_NAME:
+            set_backend(create_backend(args.backend, MODEL_NAME, GENERATION_CONFIG, api_key=API_KEY))
+        else:
+            set_backend(create_model_backend(args.backend, active_model))
+        if args.near_dup is not None:
+            set_near_duplicate_threshold(args.near_dup)
+        
+        # Show what we're about to do
+        print("🎬 Movie Review Sentiment Analysis - Batch Processing")
+        print(f"📁 Input file: {'stdin' if args.input_file == '-' else args.input_file}")
+        print(f"💾 Output file: {'stdout' if output_file == '-' else output_file}")
+        if args.backend != "gemini":
+            print(f"🧪 Backend: {args.backend} (offline)")
+        if len(args.modes) * len(args.models) > 1:
+            models = f" x models {', '.join(args.models)}" if len(args.models) > 1 else ""
+            combined = " (both verdicts per request)" if args.combined else ""
+            print(f"⚖️  Comparing modes {', '.join(args.modes)}{models}{combined}, {args.workers} workers shared")
+        else:
+            print(f"⚙️  Mode: {args.modes[0]}, model: {active_model}, {args.workers} workers")
+        if args.profile != "full":
+            print(f"✂️  Output profile: {args.profile}")
+        
+        if output_format == 'jsonl':
+            if output_file != '-':
+                output_stream = open(output_file, 'w', encoding='utf-8')
+            run_streaming(args, input_format, output_file, output_stream)
+        else:
+            run_batch(args, input_format, output_file, output_format)
+        
+        print(f"\n📋 Results saved successfully!")
 
 # Run the main function when this script is executed directly
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
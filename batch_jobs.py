@@ -0,0 +1,138 @@
+# Background batch jobs for the web app - they keep running across reruns and can be cancelled and resumed
+import threading
+import time
+import uuid
+
+from sentiment_llm import process_batch_reviews
+
+# How many finished jobs (with their results) are kept around for sessions to come back to
+MAX_FINISHED_JOBS = 20
+
+class BatchJob:
+    """One batch of reviews analyzed on a background thread.
+
+    Each result is stored as soon as it arrives, so `snapshot()` gives the partial
+    results at any time (None for reviews not analyzed yet). Cancelling stops new
+    requests from starting; resuming only analyzes the reviews that are still
+    missing, so nothing already paid for is sent again.
+    """
+
+    def __init__(self, job_id, reviews, analysis_mode="lenient", metadata=None, options=None):
+        self.job_id = job_id
+        self.reviews = list(reviews)
+        self.analysis_mode = analysis_mode
+        self.metadata = metadata or {}  # Whatever the caller needs to show the job later
+        self.options = options or {}  # Extra process_batch_reviews() arguments
+        self.results = [None] * len(self.reviews)
+        self.status = "queued"  # queued -> running -> completed / cancelled / failed
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def total(self):
+        return len(self.reviews)
+
+    @property
+    def completed(self):
+        with self._lock:
+            return sum(result is not None for result in self.results)
+
+    @property
+    def progress(self):
+        return self.completed / self.total if self.total else 1.0
+
+    def is_active(self):
+        return self.status in ("queued", "running")
+
+    def snapshot(self):
+        """A copy of the results so far, in review order."""
+        with self._lock:
+            return list(self.results)
+
+    def start(self):
+        """Run (or resume) the job on a background thread; does nothing while it's already running."""
+        with self._lock:
+            if self.is_active() and self._thread is not None:
+                return
+            self.status = "queued"
+            self.error = None
+            self._cancel_event = threading.Event()
+            self._thread = threading.Thread(target=self._run, name=f"batch-job-{self.job_id}", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Stop starting new requests; the ones in flight still finish and keep their results."""
+        self._cancel_event.set()
+
+    def _store(self, index, result):
+        with self._lock:
+            self.results[index] = result
+
+    def _run(self):
+        pending = [index for index, result in enumerate(self.snapshot()) if result is None]
+        self.status = "running"
+        try:
+            process_batch_reviews(
+                [self.reviews[index] for index in pending],
+                analysis_mode=self.analysis_mode,
+                result_callback=lambda position, result: self._store(pending[position], result),
+                cancel_event=self._cancel_event,
+                **self.options,
+            )
+            self.status = "completed" if self.completed == self.total else "cancelled"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+        self.finished_at = time.time()
+
+class BatchJobManager:
+    """Process-wide registry of batch jobs, shared by every session and rerun of the app.
+
+    Jobs belong to the manager rather than to a script run, so a rerun or a closed
+    browser tab doesn't stop them; a session finds its job again by id.
+    """
+
+    def __init__(self, max_finished_jobs=MAX_FINISHED_JOBS):
+        self.max_finished_jobs = max_finished_jobs
+        self._jobs = {}  # job id -> BatchJob, oldest first
+        self._lock = threading.Lock()
+
+    def submit(self, reviews, analysis_mode="lenient", metadata=None, **options):
+        """Create a job for `reviews` and start it right away."""
+        job = BatchJob(uuid.uuid4().hex[:12], reviews, analysis_mode, metadata, options)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        job.start()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def resume(self, job_id):
+        """Restart a cancelled or failed job for the reviews it hasn't analyzed yet."""
+        job = self.get(job_id)
+        if job is not None and job.status in ("cancelled", "failed"):
+            job.start()
+        return job
+
+    def _prune(self):
+        # Drop the oldest finished jobs (and their results) past the limit; running jobs always stay
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_active()]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
@@ -0,0 +1,60 @@
+# Microbenchmark: per-call overhead of preparing a request, before and after model reuse
+#
+# Measures only the local work done before the network call (building the prompt and
+# getting a model client), so it runs offline and needs no API key.
+#
+#   python benchmarks/bench_model_reuse.py
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai
+
+from backends import GeminiBackend
+from prompts import PROMPT_PREFIXES
+from sentiment_llm import GENERATION_CONFIG, MODEL_NAME, build_prompt
+
+BACKEND = GeminiBackend(MODEL_NAME, GENERATION_CONFIG)
+
+SAMPLE_REVIEW = "The cinematography was breathtaking and the story kept me engaged throughout!"
+
+def legacy_prepare(review_text, analysis_mode):
+    """What analyze_sentiment used to do per call: format the whole prompt and build a new model."""
+    prompt_text = f"""{PROMPT_PREFIXES.get(analysis_mode, PROMPT_PREFIXES["lenient"])}{review_text.strip()}
+"""
+    model = genai.GenerativeModel(
+        model_name=MODEL_NAME,
+        generation_config={
+            "temperature": 0.1,
+            "response_mime_type": "application/json",
+        },
+    )
+    return prompt_text, model
+
+def current_prepare(review_text, analysis_mode):
+    """What analyze_sentiment does now: splice onto the precompiled prefix and reuse the model."""
+    return build_prompt(review_text, analysis_mode), BACKEND.get_model(analysis_mode)
+
+def time_per_call(function, iterations):
+    total = timeit.timeit(lambda: function(SAMPLE_REVIEW, "strict"), number=iterations)
+    return total / iterations * 1e6  # microseconds
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    # Warm up both paths (and fill the model registry) before timing
+    legacy_prepare(SAMPLE_REVIEW, "strict")
+    current_prepare(SAMPLE_REVIEW, "strict")
+
+    legacy_us = time_per_call(legacy_prepare, iterations)
+    current_us = time_per_call(current_prepare, iterations)
+
+    print(f"Per-call request preparation ({iterations} iterations, generation_config={GENERATION_CONFIG})")
+    print(f"   New model + formatted prompt : {legacy_us:8.2f} µs")
+    print(f"   Shared model + prefix splice : {current_us:8.2f} µs")
+    print(f"   Speedup                      : {legacy_us / current_us:8.1f}x")
+
+if __name__ == "__main__":
+    main()
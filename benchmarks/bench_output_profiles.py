@@ -0,0 +1,122 @@
+# Benchmark: prompt/answer size and latency of each output profile
+#
+# Offline (default) it only prints ESTIMATES: prompt and answer tokens of every
+# profile at ~4 characters per token, nothing is measured. With --live it sends the
+# same reviews to Gemini once per profile and reports the real token counts from
+# usage_metadata, the per-call wall-clock latency, and the savings against "full".
+#
+#   python benchmarks/bench_output_profiles.py
+#   python benchmarks/bench_output_profiles.py --live --reviews 20
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from backends import MockBackend
+from prompts import OUTPUT_PROFILES
+from rate_limiter import estimate_tokens
+from sentiment_llm import (
+    API_KEY,
+    GENERATION_CONFIG,
+    MODEL_NAME,
+    build_prompt,
+    parse_result_json,
+    validate_and_clean_result,
+)
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_dataset.csv")
+
+def load_sample_reviews(count):
+    return pd.read_csv(DATASET_PATH, usecols=["review"])["review"].astype(str).head(count).tolist()
+
+def estimate_profile(reviews, analysis_mode, output_profile):
+    """Estimated (prompt tokens, answer tokens) per review, answering with the mock backend."""
+    mock = MockBackend(latency_ms=0, latency_distribution="fixed")
+    prompt_tokens = []
+    answer_tokens = []
+    for review in reviews:
+        prompt_text = build_prompt(review, analysis_mode, output_profile)
+        verdict = validate_and_clean_result(mock.classify(review, analysis_mode), output_profile)
+        # Answer in the shape the profile asks for, with a full-length explanation for "full"
+        if output_profile == "full":
+            verdict["explanation"] = "x" * 240
+        else:
+            verdict = {key: verdict[key] for key in ("label", "confidence") if verdict.get(key) is not None}
+        prompt_tokens.append(estimate_tokens(prompt_text))
+        answer_tokens.append(estimate_tokens(json.dumps(verdict)))
+    return statistics.mean(prompt_tokens), statistics.mean(answer_tokens)
+
+def measure_profile(backend, reviews, analysis_mode, output_profile):
+    """Real (prompt tokens, answer tokens, latencies) per review from live Gemini calls."""
+    model = backend.get_model(analysis_mode)
+    prompt_tokens = []
+    answer_tokens = []
+    latencies = []
+    for review in reviews:
+        prompt_text = build_prompt(review, analysis_mode, output_profile)
+        started = time.perf_counter()
+        response = model.generate_content(prompt_text)
+        latencies.append(time.perf_counter() - started)
+
+        usage = response.usage_metadata
+        prompt_tokens.append(usage.prompt_token_count)
+        answer_tokens.append(usage.candidates_token_count)
+        parse_result_json(response.text)  # Make sure the compact answers still parse
+    return statistics.mean(prompt_tokens), statistics.mean(answer_tokens), latencies
+
+def relative_change(value, baseline):
+    """Change of `value` against `baseline`, as text like "-87%"."""
+    return f"{(value - baseline) / baseline:+.0%}" if baseline else "-"
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the cost and latency of the output profiles")
+    parser.add_argument("--live", action="store_true", help="Call Gemini (needs GEMINI_API_KEY) instead of estimating")
+    parser.add_argument("--reviews", type=int, default=10, help="Number of reviews from test_dataset.csv (default: 10)")
+    parser.add_argument("--mode", choices=["strict", "lenient"], default="lenient")
+    args = parser.parse_args()
+
+    reviews = load_sample_reviews(args.reviews)
+
+    if not args.live:
+        print(f"ESTIMATED tokens per review - not measured ({len(reviews)} reviews, {args.mode} mode, "
+              f"~4 chars per token, a 240-character explanation assumed for full)")
+        print(f"   {'profile':<18}{'prompt':>8}{'answer':>8}{'vs full':>9}")
+        estimates = {profile: estimate_profile(reviews, args.mode, profile) for profile in OUTPUT_PROFILES}
+        full_answer_tokens = estimates["full"][1]
+        for output_profile, (prompt_tokens, answer_tokens) in estimates.items():
+            print(f"   {output_profile:<18}{prompt_tokens:8.0f}{answer_tokens:8.0f}"
+                  f"{relative_change(answer_tokens, full_answer_tokens):>9}")
+        print("\nThese are estimates only, with no latency - run with --live to measure real tokens and latency.")
+        return
+
+    if not API_KEY:
+        print("❌ GEMINI_API_KEY is required for --live")
+        sys.exit(1)
+
+    from backends import GeminiBackend
+
+    backend = GeminiBackend(MODEL_NAME, GENERATION_CONFIG, api_key=API_KEY)
+    print(f"Measured per review ({len(reviews)} reviews, {args.mode} mode, {MODEL_NAME}, "
+          f"token counts from usage_metadata, wall-clock latency)")
+    print(f"   {'profile':<18}{'prompt':>8}{'answer':>8}{'vs full':>9}{'p50 s':>8}{'p95 s':>8}{'vs full':>9}")
+    measured = {profile: measure_profile(backend, reviews, args.mode, profile) for profile in OUTPUT_PROFILES}
+    full_answer_tokens = measured["full"][1]
+    full_p50 = percentile(measured["full"][2], 0.5)
+    for output_profile, (prompt_tokens, answer_tokens, latencies) in measured.items():
+        p50 = percentile(latencies, 0.5)
+        print(f"   {output_profile:<18}{prompt_tokens:8.0f}{answer_tokens:8.0f}"
+              f"{relative_change(answer_tokens, full_answer_tokens):>9}"
+              f"{p50:8.2f}{percentile(latencies, 0.95):8.2f}{relative_change(p50, full_p50):>9}")
+
+if __name__ == "__main__":
+    main()
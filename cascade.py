@@ -0,0 +1,262 @@
+# Fast local first stage for the cascade: score whole batches offline, escalate only the unsure ones
+import json
+import re
+
+import numpy as np
+
+LABELS = ["Positive", "Negative", "Neutral"]
+
+# Starter lexicon used until the classifier is trained on labeled reviews
+_DEFAULT_POSITIVE_WORDS = [
+    "amazing", "brilliant", "excellent", "fantastic", "great", "incredible", "loved", "love",
+    "masterpiece", "superb", "wonderful", "breathtaking", "outstanding", "beautiful", "stunning",
+    "perfect", "best", "enjoyed", "delightful", "phenomenal", "captivating", "highly_recommend",
+]
+_DEFAULT_NEGATIVE_WORDS = [
+    "awful", "boring", "disappointing", "disappointed", "hated", "horrible", "terrible", "waste",
+    "worst", "poor", "dull", "mess", "unbearable", "pointless", "predictable", "bad", "stupid",
+    "not_good", "not_worth", "walked_out",
+]
+_DEFAULT_NEUTRAL_WORDS = [
+    "okay", "ok", "average", "decent", "mixed", "mediocre", "fine", "alright", "but", "though",
+]
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+_NEGATIONS = {"not", "no", "never", "isn't", "wasn't", "don't", "didn't", "doesn't", "nothing"}
+
+def tokenize(review_text):
+    """Lowercase word tokens plus bigrams, with simple negation joining ("not good" -> "not_good")."""
+    words = _TOKEN_PATTERN.findall(str(review_text).lower())
+    tokens = list(words)
+    for first, second in zip(words, words[1:]):
+        tokens.append(f"{first}_{second}")
+        if first in _NEGATIONS:
+            tokens.append(f"not_{second}")
+    return tokens
+
+class LocalSentimentClassifier:
+    """Linear bag-of-words classifier over Positive/Negative/Neutral.
+
+    Scores are computed for a whole batch at once: every token of every review is
+    mapped to a vocabulary id, and per-class weights are averaged per review with
+    np.bincount, so a batch of thousands of reviews takes milliseconds. Confidence
+    is the softmax probability of the winning class; `sharpness` scales the
+    averaged weights and so controls how confident the classifier is.
+    """
+
+    def __init__(self, vocabulary, weights, bias, sharpness=3.0):
+        self.vocabulary = dict(vocabulary)
+        self.weights = np.asarray(weights, dtype=np.float64)  # shape: (vocab_size, n_labels)
+        self.bias = np.asarray(bias, dtype=np.float64)        # shape: (n_labels,)
+        self.sharpness = float(sharpness)
+
+    @classmethod
+    def from_lexicon(cls):
+        """Untrained classifier built from a small hand-written sentiment lexicon."""
+        words = _DEFAULT_POSITIVE_WORDS + _DEFAULT_NEGATIVE_WORDS + _DEFAULT_NEUTRAL_WORDS
+        vocabulary = {word: i for i, word in enumerate(words)}
+        weights = np.zeros((len(words), len(LABELS)))
+        for word in _DEFAULT_POSITIVE_WORDS:
+            weights[vocabulary[word], LABELS.index("Positive")] = 1.5
+        for word in _DEFAULT_NEGATIVE_WORDS:
+            weights[vocabulary[word], LABELS.index("Negative")] = 1.5
+        for word in _DEFAULT_NEUTRAL_WORDS:
+            weights[vocabulary[word], LABELS.index("Neutral")] = 1.0
+        # Without any cue words, lean Neutral
+        bias = np.array([0.0, 0.0, 0.5])
+        return cls(vocabulary, weights, bias)
+
+    @classmethod
+    def fit(cls, review_texts, labels, smoothing=1.0, min_count=1):
+        """Train a multinomial Naive Bayes model (a linear model in log space) on labeled reviews."""
+        labels = [str(label).strip().title() for label in labels]
+        pairs = [(text, label) for text, label in zip(review_texts, labels) if label in LABELS]
+        if not pairs:
+            raise ValueError("No reviews with a valid Positive/Negative/Neutral label to train on")
+
+        token_lists = [tokenize(text) for text, _ in pairs]
+        label_ids = np.array([LABELS.index(label) for _, label in pairs])
+
+        # Build the vocabulary from tokens seen at least min_count times
+        token_counts = {}
+        for tokens in token_lists:
+            for token in tokens:
+                token_counts[token] = token_counts.get(token, 0) + 1
+        vocabulary = {}
+        for token, count in token_counts.items():
+            if count >= min_count:
+                vocabulary[token] = len(vocabulary)
+
+        # Count tokens per class in one vectorized pass
+        token_ids, doc_ids = _flatten_token_ids(token_lists, vocabulary)
+        n_labels = len(LABELS)
+        counts = np.bincount(
+            token_ids * n_labels + label_ids[doc_ids],
+            minlength=len(vocabulary) * n_labels,
+        ).reshape(len(vocabulary), n_labels).astype(np.float64)
+
+        smoothed = counts + smoothing
+        weights = np.log(smoothed / smoothed.sum(axis=0, keepdims=True))
+        # Center each token's weights so words common to every class carry no signal
+        weights -= weights.mean(axis=1, keepdims=True)
+        class_counts = np.bincount(label_ids, minlength=n_labels) + smoothing
+        bias = np.log(class_counts / class_counts.sum())
+        return cls(vocabulary, weights, bias)
+
+    @classmethod
+    def from_csv(cls, file_path, text_column="review", label_column="true_sentiment"):
+        """Train on a labeled CSV such as test_dataset.csv."""
+        import pandas as pd
+
+        dataframe = pd.read_csv(file_path, usecols=[text_column, label_column])
+        dataframe = dataframe.dropna()
+        return cls.fit(dataframe[text_column].astype(str).tolist(), dataframe[label_column].tolist())
+
+    def save(self, file_path):
+        with open(file_path, "w") as file:
+            json.dump({
+                "labels": LABELS,
+                "vocabulary": self.vocabulary,
+                "weights": self.weights.tolist(),
+                "bias": self.bias.tolist(),
+                "sharpness": self.sharpness,
+            }, file)
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path) as file:
+            data = json.load(file)
+        return cls(data["vocabulary"], data["weights"], data["bias"], data.get("sharpness", 3.0))
+
+    def predict_proba(self, review_texts):
+        """Class probabilities for each review, shape (n_reviews, 3) in LABELS order."""
+        token_lists = [tokenize(text) for text in review_texts]
+        token_ids, doc_ids = _flatten_token_ids(token_lists, self.vocabulary)
+        return self._probabilities(token_ids, doc_ids, len(token_lists))
+
+    def _probabilities(self, token_ids, doc_ids, n_reviews):
+        scores = np.tile(self.bias, (n_reviews, 1))
+        if len(token_ids):
+            # Average rather than sum, so long reviews don't become overconfident
+            token_counts = np.maximum(np.bincount(doc_ids, minlength=n_reviews), 1)
+            for label_index in range(len(LABELS)):
+                label_sums = np.bincount(
+                    doc_ids, weights=self.weights[token_ids, label_index], minlength=n_reviews
+                )
+                scores[:, label_index] += self.sharpness * label_sums / token_counts
+
+        # Softmax, shifted for numerical stability
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def classify_batch(self, review_texts, evidence_limit=6):
+        """Result dicts (same shape as analyze_sentiment's) for a batch of reviews."""
+        review_texts = list(review_texts)
+        if not review_texts:
+            return []
+
+        token_lists = [tokenize(text) for text in review_texts]
+        token_ids, doc_ids = _flatten_token_ids(token_lists, self.vocabulary)
+        probabilities = self._probabilities(token_ids, doc_ids, len(review_texts))
+        best = probabilities.argmax(axis=1)
+        confidences = probabilities[np.arange(len(review_texts)), best]
+        evidence = self._evidence(token_ids, doc_ids, best, len(review_texts), evidence_limit)
+
+        results = []
+        for label_index, confidence, phrases in zip(best, confidences, evidence):
+            label = LABELS[label_index]
+            results.append({
+                "label": label,
+                "confidence": float(confidence),
+                "explanation": f"Local classifier: {label} with {confidence:.0%} probability.",
+                "evidence_phrases": phrases,
+                "decided_by": "local",
+            })
+        return results
+
+    def _evidence(self, token_ids, doc_ids, best, n_reviews, limit):
+        """Per review, the tokens that pushed hardest toward its chosen label."""
+        evidence = [[] for _ in range(n_reviews)]
+        if not len(token_ids):
+            return evidence
+
+        # How much more each token occurrence favors the chosen label than the average label
+        token_weights = self.weights[token_ids]
+        contributions = token_weights[np.arange(len(token_ids)), best[doc_ids]] - token_weights.mean(axis=1)
+        keep = contributions > 0
+        token_ids, doc_ids, contributions = token_ids[keep], doc_ids[keep], contributions[keep]
+
+        # Sort by review, strongest contribution first, then walk each review's slice
+        order = np.lexsort((-contributions, doc_ids))
+        token_ids, doc_ids = token_ids[order], doc_ids[order]
+        boundaries = np.searchsorted(doc_ids, np.arange(n_reviews + 1))
+        vocabulary_tokens = self._vocabulary_tokens()
+
+        for doc_id in np.flatnonzero(np.diff(boundaries)):
+            phrases = []
+            for token_id in dict.fromkeys(token_ids[boundaries[doc_id]:boundaries[doc_id + 1]].tolist()):
+                phrases.append(vocabulary_tokens[token_id].replace("_", " "))
+                if len(phrases) >= limit:
+                    break
+            evidence[doc_id] = phrases
+        return evidence
+
+    def _vocabulary_tokens(self):
+        """Token strings indexed by vocabulary id (built once, on first use)."""
+        if getattr(self, "_tokens_by_id", None) is None:
+            self._tokens_by_id = [None] * len(self.vocabulary)
+            for token, token_id in self.vocabulary.items():
+                self._tokens_by_id[token_id] = token
+        return self._tokens_by_id
+
+def _flatten_token_ids(token_lists, vocabulary):
+    """Known-token ids and the review each belongs to, as two flat int arrays."""
+    lookup = vocabulary.get
+    ids_per_review = [[token_id for token_id in map(lookup, tokens) if token_id is not None]
+                      for tokens in token_lists]
+    lengths = np.fromiter((len(ids) for ids in ids_per_review), dtype=np.int64, count=len(ids_per_review))
+    token_ids = np.fromiter(
+        (token_id for ids in ids_per_review for token_id in ids), dtype=np.int64, count=int(lengths.sum())
+    )
+    doc_ids = np.repeat(np.arange(len(ids_per_review), dtype=np.int64), lengths)
+    return token_ids, doc_ids
+
+def merge_cascade_results(local_results, llm_results, confidence_threshold):
+    """Combine the two stages into the final answer for each review.
+
+    Both dicts are keyed the same way (e.g. by position). Local answers at or above
+    the threshold stand, as do reviews without an LLM answer; the rest take the LLM
+    answer ("decided_by": "llm" unless it says otherwise). An LLM answer flagged "failed" keeps the local one
+    instead, marked "decided_by": "local_escalation_failed".
+    """
+    merged = {}
+    for key, local_result in local_results.items():
+        llm_result = llm_results.get(key)
+        if local_result["confidence"] >= confidence_threshold or llm_result is None:
+            merged[key] = local_result
+        elif llm_result.get("failed"):
+            merged[key] = dict(local_result, decided_by="local_escalation_failed")
+        else:
+            # Keeps a more specific tag, like the circuit breaker's "local_fallback"
+            merged[key] = dict({"decided_by": "llm"}, **llm_result)
+    return merged
+
+def cascade_analyze(review_texts, classifier, confidence_threshold=0.8, analysis_mode="lenient",
+                    **batch_options):
+    """Score every review locally and send only the low-confidence ones to the LLM.
+
+    Results are merged by merge_cascade_results(). Extra keyword arguments go to
+    process_batch_reviews (workers, quota, packing, caching).
+    """
+    from sentiment_llm import process_batch_reviews
+
+    review_texts = list(review_texts)
+    local_results = dict(enumerate(classifier.classify_batch(review_texts)))
+
+    escalated = [i for i, result in local_results.items() if result["confidence"] < confidence_threshold]
+    llm_results = process_batch_reviews(
+        [review_texts[i] for i in escalated], analysis_mode=analysis_mode, **batch_options
+    )
+    merged = merge_cascade_results(local_results, dict(zip(escalated, llm_results)), confidence_threshold)
+    return [merged[i] for i in range(len(review_texts))]
@@ -0,0 +1,102 @@
+# Append-only journal of finished reviews, so an interrupted batch run can resume where it stopped
+import hashlib
+import json
+import os
+import threading
+
+JOURNAL_VERSION = 1
+
+def review_hash(review_text):
+    """Short content hash that ties a journal entry to the exact review text it was made for."""
+    return hashlib.sha256(str(review_text).encode("utf-8")).hexdigest()[:16]
+
+class CheckpointJournal:
+    """One JSON line per analyzed review: {"row": ..., "hash": ..., "result": {...}}.
+
+    Lines are only ever appended and each one is flushed as soon as its review
+    finishes, so killing the process loses at most the requests still in flight.
+    A line cut off mid-write is detected (no newline, or not valid JSON) and
+    dropped when the journal is reopened. The first line records the run options;
+    resuming with different options is refused, since the answers wouldn't match.
+    """
+
+    def __init__(self, path, options=None, resume=False):
+        self.path = str(path)
+        self.options = options or {}
+        self.entries = {}  # row -> (review hash, result)
+        self.reused = 0
+        self._lock = threading.Lock()
+
+        has_header = False
+        if resume and os.path.exists(self.path):
+            has_header = self._load()
+            self._file = open(self.path, "ab")
+        else:
+            self._file = open(self.path, "wb")
+        if not has_header:
+            self._append({"journal": JOURNAL_VERSION, "options": self.options})
+
+    def _load(self):
+        """Read every complete entry and cut off a partially written last line."""
+        has_header = False
+        valid_end = 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                valid_end += len(line)
+
+                if "journal" in entry:
+                    if entry.get("options") != self.options:
+                        raise ValueError(
+                            f"Journal {self.path} was written with different options "
+                            f"({entry.get('options')}) - rerun without --resume to start over"
+                        )
+                    has_header = True
+                    continue
+                self.entries[entry["row"]] = (entry["hash"], entry["result"])
+
+        # Drop a line cut off by a crash so the next append starts on a fresh line
+        with open(self.path, "r+b") as file:
+            file.truncate(valid_end)
+        return has_header
+
+    def _append(self, entry):
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def lookup(self, row, review_text):
+        """The journaled result for this row, if it was made for the same review text."""
+        entry = self.entries.get(row)
+        if entry is None or entry[0] != review_hash(review_text):
+            return None
+        self.reused += 1
+        return entry[1]
+
+    def record(self, row, review_text, result):
+        self._append({"row": row, "hash": review_hash(review_text), "result": result})
+
+    def sync(self):
+        """Force everything written so far onto disk (survives a power cut, not just a crash)."""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,188 @@
+# Typed Parquet / Arrow IPC (Feather) output for batch results, written one row group at a time
+import pandas as pd
+
+from eval_metrics import SENTIMENT_LABELS
+
+COLUMNAR_FORMATS = ("parquet", "feather")
+COMPRESSIONS = {
+    "parquet": ("zstd", "snappy", "gzip", "brotli", "lz4", "none"),
+    "feather": ("zstd", "lz4", "none"),
+}
+# Feather stays uncompressed by default so readers can memory-map it without copying
+DEFAULT_COMPRESSION = {"parquet": "zstd", "feather": "none"}
+DEFAULT_ROW_GROUP_SIZE = 65536
+
+def _known_column_types(pa, column_suffixes=("",)):
+    """Arrow types for the columns batch_eval adds; input columns keep their inferred types.
+
+    Comparison runs add the prediction columns once per mode/model, named with a suffix.
+    """
+    prediction_types = {
+        "predicted_sentiment": pa.dictionary(pa.int8(), pa.string()),
+        "confidence": pa.float32(),
+        "explanation": pa.string(),
+        "evidence_phrases": pa.list_(pa.string()),
+        "near_duplicate_similarity": pa.float32(),
+        "correct": pa.bool_(),
+    }
+    known_types = {"review": pa.string(), "true_sentiment": pa.string(), "decided_by": pa.string()}
+    for suffix in column_suffixes:
+        known_types.update({f"{name}{suffix}": field_type for name, field_type in prediction_types.items()})
+    return known_types
+
+class ColumnarResultWriter:
+    """Writes result chunks to a Parquet or Arrow IPC (Feather v2) file with a fixed, typed schema.
+
+    predicted_sentiment is dictionary-encoded over the three labels, confidence is
+    float32 and evidence_phrases is a real list<string> column. Chunks are buffered
+    until `row_group_size` rows are ready and then written as one row group (or
+    record batch), so memory stays bounded however many rows are streamed through.
+    The schema is taken from the first chunk, with input columns that are empty
+    there stored as string; an input column whose later values don't fit its
+    type (a fraction in a whole-number column, text in a numeric one) is widened
+    if that happens before the first row group is written. `column_suffixes`
+    names the sets of prediction columns a comparison run writes. Needs pyarrow.
+    """
+
+    def __init__(self, output_path, output_format="parquet", compression=None,
+                 row_group_size=DEFAULT_ROW_GROUP_SIZE, column_suffixes=("",)):
+        try:
+            import pyarrow as pa
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError as error:
+            raise ImportError("Parquet/Feather output needs pyarrow - install it with: pip install pyarrow") from error
+
+        if output_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown columnar format '{output_format}' - expected one of {', '.join(COLUMNAR_FORMATS)}")
+        compression = compression or DEFAULT_COMPRESSION[output_format]
+        if compression not in COMPRESSIONS[output_format]:
+            raise ValueError(f"{output_format} doesn't support '{compression}' compression - "
+                             f"expected one of {', '.join(COMPRESSIONS[output_format])}")
+
+        self._pa = pa
+        self.output_path = str(output_path)
+        self.output_format = output_format
+        self.compression = None if compression == "none" else compression
+        self.row_group_size = row_group_size
+        self.column_suffixes = tuple(column_suffixes)
+        self.rows_written = 0
+        self.schema = None
+        self._writer = None
+        self._buffered = []  # Arrow tables waiting to fill a row group
+        self._buffered_rows = 0
+
+    def _to_table(self, dataframe):
+        typed = dataframe.assign(**{
+            f"predicted_sentiment{suffix}": pd.Categorical(
+                dataframe[f"predicted_sentiment{suffix}"], categories=SENTIMENT_LABELS
+            )
+            for suffix in self.column_suffixes
+        })
+        if self.schema is None:
+            self.schema = self._infer_schema(typed)
+        try:
+            return self._pa.Table.from_pandas(self._conform(typed), schema=self.schema, preserve_index=False)
+        except (self._pa.ArrowInvalid, self._pa.ArrowTypeError):
+            drifted = self._drifted_columns(typed)
+            if not drifted:
+                raise
+        # An input column changed type since the first chunk - widen it (whole numbers to float, anything to string)
+        if self._writer is not None:
+            raise ValueError(f"Column(s) {', '.join(drifted)} changed type after the first row group was written - "
+                             "leave them out with --keep-columns or use CSV output")
+        self.schema = self._pa.schema(
+            [self._pa.field(field.name, drifted[field.name]) if field.name in drifted else field
+             for field in self.schema],
+            metadata=self.schema.metadata,
+        )
+        self._buffered = [table.cast(self.schema) for table in self._buffered]
+        return self._pa.Table.from_pandas(self._conform(typed), schema=self.schema, preserve_index=False)
+
+    def _infer_schema(self, typed):
+        known_types = _known_column_types(self._pa, self.column_suffixes)
+        inferred = self._pa.Schema.from_pandas(typed, preserve_index=False)
+        fields = []
+        for field in inferred:
+            field_type = known_types.get(field.name, field.type)
+            # A column that is empty throughout the first chunk reads as null (or float64, from CSV),
+            # which says nothing about its later values - store it as string
+            if self._pa.types.is_null(field_type) or (
+                field.name not in known_types and typed[field.name].isna().all()
+            ):
+                field_type = self._pa.string()
+            fields.append(self._pa.field(field.name, field_type))
+        return self._pa.schema(fields, metadata=inferred.metadata)
+
+    def _conform(self, typed):
+        """Turn values of string-typed columns into text when a chunk read them as something else."""
+        return typed.assign(**{
+            field.name: typed[field.name].astype("string")
+            for field in self.schema
+            if self._pa.types.is_string(field.type) and field.name in typed
+            and not pd.api.types.is_object_dtype(typed[field.name])
+            and not pd.api.types.is_string_dtype(typed[field.name])
+        })
+
+    def _drifted_columns(self, typed):
+        """Input columns whose values in this chunk don't fit their type in the schema -> the type to widen to."""
+        known_types = _known_column_types(self._pa, self.column_suffixes)
+        drifted = {}
+        for field in self.schema:
+            if field.name in known_types or field.name not in typed or self._pa.types.is_string(field.type):
+                continue
+            try:
+                self._pa.array(typed[field.name], type=field.type, from_pandas=True)
+            except (self._pa.ArrowInvalid, self._pa.ArrowTypeError):
+                numeric = self._pa.types.is_integer(field.type) or self._pa.types.is_floating(field.type)
+                if numeric and pd.api.types.is_numeric_dtype(typed[field.name]):
+                    drifted[field.name] = self._pa.float64()
+                else:
+                    drifted[field.name] = self._pa.string()
+        return drifted
+
+    def _open(self):
+        if self.output_format == "parquet":
+            self._writer = self._pa.parquet.ParquetWriter(
+                self.output_path, self.schema, compression=self.compression or "none"
+            )
+        else:
+            options = self._pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = self._pa.ipc.new_file(self.output_path, self.schema, options=options)
+
+    def _write_row_group(self, table):
+        if self._writer is None:
+            self._open()
+        if self.output_format == "parquet":
+            self._writer.write_table(table, row_group_size=self.row_group_size)
+        else:
+            self._writer.write_table(table, max_chunksize=self.row_group_size)
+
+    def write(self, dataframe):
+        table = self._to_table(dataframe)  # May re-cast the buffered tables, so convert before appending
+        self._buffered.append(table)
+        self._buffered_rows += len(dataframe)
+        self.rows_written += len(dataframe)
+
+        # Write out every full row group; the remainder waits for the next chunk
+        if self._buffered_rows >= self.row_group_size:
+            pending = self._pa.concat_tables(self._buffered)
+            full_rows = len(pending) - len(pending) % self.row_group_size
+            self._write_row_group(pending.slice(0, full_rows).combine_chunks())
+            remainder = pending.slice(full_rows)
+            self._buffered = [remainder] if len(remainder) else []
+            self._buffered_rows = len(remainder)
+
+    def close(self):
+        if self._buffered:
+            self._write_row_group(self._pa.concat_tables(self._buffered).combine_chunks())
+            self._buffered = []
+            self._buffered_rows = 0
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
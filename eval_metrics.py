@@ -0,0 +1,242 @@
+# Evaluation metrics from an integer-coded confusion matrix, with bootstrap confidence intervals
+import numpy as np
+import pandas as pd
+
+SENTIMENT_LABELS = ['Positive', 'Negative', 'Neutral']
+
+DEFAULT_BOOTSTRAP_RESAMPLES = 2000
+DEFAULT_CONFIDENCE_LEVEL = 0.95
+
+def label_codes(labels):
+    """Map labels to 0/1/2 in SENTIMENT_LABELS order (-1 for anything else), after tidying them."""
+    # Tidy each distinct label once rather than every row
+    raw_codes, uniques = pd.factorize(pd.Series(labels))
+    cleaned = pd.Index(uniques).astype(str).str.strip().str.title()
+    lookup = np.append(pd.Index(SENTIMENT_LABELS).get_indexer(cleaned), -1)
+    return lookup[raw_codes].astype(np.int64)  # Missing labels (code -1) map to the trailing -1
+
+def confusion_matrix_counts(true_codes, predicted_codes):
+    """3x3 counts (rows = true label, columns = predicted) in a single bincount pass."""
+    n_labels = len(SENTIMENT_LABELS)
+    return np.bincount(
+        np.asarray(true_codes) * n_labels + np.asarray(predicted_codes), minlength=n_labels * n_labels
+    ).reshape(n_labels, n_labels)
+
+def _safe_divide(numerator, denominator):
+    """Elementwise numerator / denominator, with 0 where the denominator is 0."""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape),
+                     where=denominator > 0)
+
+def scores_from_confusion(confusion):
+    """Accuracy and per-class precision/recall/F1 for one matrix (3, 3) or a stack of them (..., 3, 3)."""
+    confusion = np.asarray(confusion, dtype=np.float64)
+    true_positives = np.diagonal(confusion, axis1=-2, axis2=-1)
+    precision = _safe_divide(true_positives, confusion.sum(axis=-2))
+    recall = _safe_divide(true_positives, confusion.sum(axis=-1))
+    f1_score = _safe_divide(2 * precision * recall, precision + recall)
+    accuracy = _safe_divide(true_positives.sum(axis=-1), confusion.sum(axis=(-2, -1)))
+    return {'accuracy': accuracy, 'precision': precision, 'recall': recall, 'f1_score': f1_score}
+
+def bootstrap_confidence_intervals(confusion, n_resamples=DEFAULT_BOOTSTRAP_RESAMPLES,
+                                   confidence_level=DEFAULT_CONFIDENCE_LEVEL, seed=0):
+    """Percentile bootstrap intervals for accuracy and per-class F1.
+
+    Every metric here depends only on the confusion-matrix cell counts, so drawing
+    n rows with replacement is the same as one multinomial draw over the 9 cells.
+    Resampling costs O(n_resamples) regardless of how many rows were evaluated.
+    """
+    confusion = np.asarray(confusion, dtype=np.int64)
+    total = int(confusion.sum())
+    if total == 0 or n_resamples <= 0:
+        return None
+
+    rng = np.random.default_rng(seed)
+    resampled = rng.multinomial(total, confusion.ravel() / total, size=n_resamples)
+    scores = scores_from_confusion(resampled.reshape(n_resamples, *confusion.shape))
+
+    tail = (1 - confidence_level) / 2 * 100
+    accuracy_bounds = np.percentile(scores['accuracy'], [tail, 100 - tail])
+    f1_bounds = np.percentile(scores['f1_score'], [tail, 100 - tail], axis=0)  # shape (2, n_labels)
+    return {
+        'confidence_level': confidence_level,
+        'resamples': n_resamples,
+        'accuracy': [float(accuracy_bounds[0]), float(accuracy_bounds[1])],
+        'f1_score': {
+            label: [float(f1_bounds[0, index]), float(f1_bounds[1, index])]
+            for index, label in enumerate(SENTIMENT_LABELS)
+        },
+    }
+
+def stratified_order(labels, seed=0):
+    """Row positions in a random order where every prefix keeps the label mix of the whole file.
+
+    Each label's rows are shuffled on their own and spread evenly (with jitter) over
+    [0, 1); sorting on that key interleaves the labels, so the first n rows hold about
+    n * share of every label and stopping anywhere still gives a stratified sample.
+    """
+    rng = np.random.default_rng(seed)
+    codes = label_codes(labels)
+    sort_keys = np.empty(len(codes))
+    for code in np.unique(codes):
+        members = np.flatnonzero(codes == code)
+        rng.shuffle(members)
+        sort_keys[members] = (np.arange(len(members)) + rng.random(len(members))) / len(members)
+    return np.argsort(sort_keys, kind='stable')
+
+def widest_interval_half_width(intervals):
+    """Half-width of the widest interval (accuracy or any per-class F1) from bootstrap_confidence_intervals()."""
+    bounds = [intervals['accuracy'], *intervals['f1_score'].values()]
+    return max((high - low) / 2 for low, high in bounds)
+
+class OnlineMetrics:
+    """Accuracy, confusion matrix and confidence statistics accumulated one chunk at a time.
+
+    Only counts and sums are kept, so the memory used doesn't grow with the input,
+    and the frames passed to update() are never modified.
+    """
+
+    def __init__(self, bootstrap_resamples=DEFAULT_BOOTSTRAP_RESAMPLES,
+                 confidence_level=DEFAULT_CONFIDENCE_LEVEL):
+        n_labels = len(SENTIMENT_LABELS)
+        self.bootstrap_resamples = bootstrap_resamples
+        self.confidence_level = confidence_level
+        self.confusion = np.zeros((n_labels, n_labels), dtype=np.int64)
+        self.has_ground_truth = False
+        self.total_rows = 0
+        self.skipped_samples = 0
+        self.predicted_counts = {}
+        self.confidence_sum = 0.0
+        self.confidence_count = 0
+        # Confidence sums/counts for correct (True) and incorrect (False) predictions
+        self.outcome_confidence_sum = {True: 0.0, False: 0.0}
+        self.outcome_confidence_count = {True: 0, False: 0}
+
+    def update(self, dataframe):
+        """Add a chunk with 'predicted_sentiment', 'confidence' and maybe 'true_sentiment' columns."""
+        self.total_rows += len(dataframe)
+        for label, count in dataframe['predicted_sentiment'].value_counts().items():
+            self.predicted_counts[label] = self.predicted_counts.get(label, 0) + int(count)
+
+        confidence = pd.to_numeric(dataframe['confidence'], errors='coerce').to_numpy(dtype=np.float64)
+        has_confidence = ~np.isnan(confidence)
+        self.confidence_sum += float(confidence[has_confidence].sum())
+        self.confidence_count += int(has_confidence.sum())
+
+        if 'true_sentiment' not in dataframe.columns:
+            return
+        self.has_ground_truth = True
+
+        # Only look at rows with valid sentiment labels
+        true_codes = label_codes(dataframe['true_sentiment'])
+        predicted_codes = label_codes(dataframe['predicted_sentiment'])
+        valid = (true_codes >= 0) & (predicted_codes >= 0)
+        self.skipped_samples += int((~valid).sum())
+
+        true_codes, predicted_codes = true_codes[valid], predicted_codes[valid]
+        self.confusion += confusion_matrix_counts(true_codes, predicted_codes)
+
+        is_correct = true_codes == predicted_codes
+        confidence, has_confidence = confidence[valid], has_confidence[valid]
+        for outcome in (True, False):
+            mask = (is_correct == outcome) & has_confidence
+            self.outcome_confidence_sum[outcome] += float(confidence[mask].sum())
+            self.outcome_confidence_count[outcome] += int(mask.sum())
+
+    def confidence_intervals(self):
+        """Bootstrap intervals for the rows seen so far (None before any labeled pair)."""
+        return bootstrap_confidence_intervals(self.confusion, self.bootstrap_resamples, self.confidence_level)
+
+    def average_confidence(self):
+        return self.confidence_sum / self.confidence_count if self.confidence_count else float('nan')
+
+    def summary(self):
+        """Metrics dict: accuracy, per-class scores, confusion matrix, confidence averages and CIs."""
+        # If there's no ground truth data, we can't measure accuracy
+        if not self.has_ground_truth:
+            return {"message": "No ground truth labels found - skipping accuracy calculation"}
+
+        total_predictions = int(self.confusion.sum())
+        if total_predictions == 0:
+            return {"error": "No valid label pairs found for evaluation"}
+
+        scores = scores_from_confusion(self.confusion)
+        support = self.confusion.sum(axis=1)
+        class_metrics = {
+            label: {
+                'precision': float(scores['precision'][index]),
+                'recall': float(scores['recall'][index]),
+                'f1_score': float(scores['f1_score'][index]),
+                'support': int(support[index])
+            }
+            for index, label in enumerate(SENTIMENT_LABELS)
+        }
+
+        confusion_matrix = {
+            true_label: {
+                predicted_label: int(self.confusion[i, j])
+                for j, predicted_label in enumerate(SENTIMENT_LABELS)
+            }
+            for i, true_label in enumerate(SENTIMENT_LABELS)
+        }
+
+        def average(outcome):
+            count = self.outcome_confidence_count[outcome]
+            return self.outcome_confidence_sum[outcome] / count if count else float('nan')
+
+        summary = {
+            'accuracy': float(scores['accuracy']),
+            'total_samples': total_predictions,
+            'correct_predictions': int(np.trace(self.confusion)),
+            'class_metrics': class_metrics,
+            'confusion_matrix': confusion_matrix,
+            'avg_confidence_correct': average(True),
+            'avg_confidence_wrong': average(False),
+            'evaluated_samples': total_predictions,
+            'skipped_samples': self.skipped_samples
+        }
+        intervals = self.confidence_intervals()
+        if intervals is not None:
+            summary['confidence_intervals'] = intervals
+        return summary
+
+class OnlineAgreement:
+    """How often two labelers (modes or models) agree on the same reviews, accumulated one chunk at a time.
+
+    Keeps a 3x3 cross-tab of their labels (rows = first labeler, columns = second),
+    from which the raw agreement rate and Cohen's kappa are computed.
+    """
+
+    def __init__(self):
+        n_labels = len(SENTIMENT_LABELS)
+        self.crosstab = np.zeros((n_labels, n_labels), dtype=np.int64)
+
+    def update(self, first_labels, second_labels):
+        first_codes = label_codes(first_labels)
+        second_codes = label_codes(second_labels)
+        valid = (first_codes >= 0) & (second_codes >= 0)
+        self.crosstab += confusion_matrix_counts(first_codes[valid], second_codes[valid])
+
+    def summary(self):
+        """Agreement rate, Cohen's kappa and the label cross-tab."""
+        total = int(self.crosstab.sum())
+        if total == 0:
+            return {"error": "No reviews labeled by both"}
+
+        observed = np.trace(self.crosstab) / total
+        # Agreement expected by chance from each labeler's own label mix
+        expected = float(self.crosstab.sum(axis=1) @ self.crosstab.sum(axis=0)) / total ** 2
+        kappa = (observed - expected) / (1 - expected) if expected < 1 else 1.0
+        return {
+            'agreement': float(observed),
+            'cohens_kappa': float(kappa),
+            'compared_samples': total,
+            'crosstab': {
+                first_label: {
+                    second_label: int(self.crosstab[i, j])
+                    for j, second_label in enumerate(SENTIMENT_LABELS)
+                }
+                for i, first_label in enumerate(SENTIMENT_LABELS)
+            },
+        }
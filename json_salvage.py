@@ -0,0 +1,140 @@
+# Tolerant parsing of model output, so a slightly broken answer doesn't cost a whole new call
+import json
+import re
+
+VALID_LABELS = {"Positive", "Negative", "Neutral"}
+
+_CODE_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+_LABEL_FIELD = re.compile(r'"label"\s*:\s*"(positive|negative|neutral)"', re.IGNORECASE)
+_CONFIDENCE_FIELD = re.compile(r'"confidence"\s*:\s*"?(\d+(?:\.\d+)?)')
+_EXPLANATION_FIELD = re.compile(r'"explanation"\s*:\s*"((?:[^"\\]|\\.)*)')
+
+# How many cut points to try when repairing a truncated answer
+MAX_REPAIR_ATTEMPTS = 25
+
+def strip_code_fences(text):
+    """Return the contents of the first ``` fenced block, or the text unchanged."""
+    match = _CODE_FENCE.search(text)
+    return match.group(1) if match else text
+
+def extract_json_value(text):
+    """Parse the first complete JSON object/array in `text`, ignoring any prefix or suffix."""
+    decoder = json.JSONDecoder()
+    for start, char in enumerate(text):
+        if char in "{[":
+            try:
+                value, _ = decoder.raw_decode(text, start)
+                return value
+            except json.JSONDecodeError:
+                return None
+    return None
+
+def repair_truncated_json(text):
+    """Close a JSON value that was cut off mid-way (unterminated strings, arrays, objects).
+
+    Tries the text as-is with its open string and brackets closed, then falls back
+    to cutting at earlier commas so a half-written field or array item is dropped.
+    """
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return None
+    text = text[start:]
+
+    closers = []
+    cut_points = []  # (index of a top-level-or-nested comma, closers needed at that point)
+    in_string = False
+    escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if not closers or closers[-1] != char:
+                break
+            closers.pop()
+            if not closers:
+                # Already complete - nothing to repair
+                return _try_loads(text[:index + 1])
+        elif char == ",":
+            cut_points.append((index, list(closers)))
+
+    candidates = []
+    tail = text[:-1] if escaped else text
+    if in_string:
+        tail += '"'
+    candidates.append(tail.rstrip().rstrip(",") + "".join(reversed(closers)))
+    for index, cut_closers in reversed(cut_points[-MAX_REPAIR_ATTEMPTS:]):
+        candidates.append(text[:index] + "".join(reversed(cut_closers)))
+
+    for candidate in candidates:
+        value = _try_loads(candidate)
+        if value is not None:
+            return value
+    return None
+
+def _try_loads(text):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+def extract_fields_by_regex(text):
+    """Last resort: pull label/confidence (and explanation if present) out of broken JSON."""
+    label_match = _LABEL_FIELD.search(text)
+    if not label_match:
+        return None
+
+    result = {"label": label_match.group(1).title()}
+    confidence_match = _CONFIDENCE_FIELD.search(text)
+    if confidence_match:
+        result["confidence"] = float(confidence_match.group(1))
+    explanation_match = _EXPLANATION_FIELD.search(text)
+    if explanation_match:
+        result["explanation"] = explanation_match.group(1).replace('\\"', '"')
+    return result
+
+def _has_valid_label(value):
+    return isinstance(value, dict) and str(value.get("label", "")).strip().title() in VALID_LABELS
+
+def salvage_result_json(text):
+    """Recover a single-review answer dict from malformed output, or None if hopeless.
+
+    The result always has a valid label - a salvage that only produced a truncated
+    or missing label is rejected, so the caller retries rather than guessing.
+    """
+    if not text:
+        return None
+    text = strip_code_fences(text)
+
+    for parse in (extract_json_value, repair_truncated_json):
+        value = parse(text)
+        if isinstance(value, list) and value:
+            value = value[0]
+        if _has_valid_label(value):
+            return value
+
+    return extract_fields_by_regex(text)
+
+def salvage_array_json(text):
+    """Recover as many items as possible from a malformed JSON array answer (packed mode)."""
+    if not text:
+        return None
+    text = strip_code_fences(text)
+
+    for parse in (extract_json_value, repair_truncated_json):
+        value = parse(text)
+        if isinstance(value, dict):
+            value = next((item for item in value.values() if isinstance(item, list)), None)
+        if isinstance(value, list):
+            return value
+    return None
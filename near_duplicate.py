@@ -0,0 +1,185 @@
+# Approximate result reuse: a persistent MinHash/LSH index of reviews that were already analyzed
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from result_cache import normalize_review_text
+
+SHINGLE_SIZE = 5  # Characters per shingle
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32  # 32 bands of 4 rows: pairs above ~0.7 similarity almost always share a bucket
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_random = np.random.default_rng(20240611)  # Fixed seed - stored signatures must stay comparable
+_HASH_A = _random.integers(1, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)[:, None]
+_HASH_B = _random.integers(0, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)[:, None]
+
+def review_shingles(review_text):
+    """Character shingles of the review with case, whitespace and punctuation ignored."""
+    text = re.sub(r"[^\w\s]", "", normalize_review_text(review_text))
+    text = re.sub(r"\s+", " ", text).strip()
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+def minhash_signature(review_text):
+    """MinHash signature (NUM_PERMUTATIONS uint32 values) of the review's shingles."""
+    shingle_hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) for shingle in review_shingles(review_text)), dtype=np.uint64
+    ) % _MERSENNE_PRIME
+    # a*x + b stays below 2**62, so one vectorized pass computes every permutation
+    permuted = (_HASH_A * shingle_hashes[None, :] + _HASH_B) % _MERSENNE_PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+def signature_similarity(signature, other_signature):
+    """Estimated Jaccard similarity: the fraction of MinHash values two signatures share."""
+    return float(np.mean(signature == other_signature))
+
+def lsh_buckets(signature, scope):
+    """One bucket id per band; reviews that land in a common bucket are match candidates."""
+    bands = signature.reshape(LSH_BANDS, LSH_ROWS)
+    buckets = []
+    for band_index, band in enumerate(bands):
+        digest = hashlib.blake2b(
+            f"{scope}\x1f{band_index}\x1f".encode("utf-8") + band.tobytes(), digest_size=8
+        ).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+class NearDuplicateIndex:
+    """SQLite-backed MinHash/LSH index mapping reviews to results for approximate reuse.
+
+    Each stored review keeps its signature and result; its LSH band buckets are
+    indexed so a lookup is one indexed query plus a signature comparison for the
+    few candidates found. A miss therefore costs about as much as an exact cache
+    lookup. `scope` separates entries whose answers aren't interchangeable
+    (different mode, model or prompt version). Entries past `max_entries` are
+    dropped oldest first.
+    """
+
+    # How many inserts between eviction sweeps - keeps the write path cheap
+    EVICTION_INTERVAL = 500
+
+    def __init__(self, path, threshold=0.9, max_entries=100000):
+        self.path = str(path)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS signatures (
+                id INTEGER PRIMARY KEY,
+                scope TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER NOT NULL, signature_id INTEGER NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_buckets_bucket ON buckets (bucket)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_buckets_signature ON buckets (signature_id)")
+        self._connection.commit()
+
+    def lookup(self, review_text, scope):
+        """Return (result, similarity) for the most similar stored review, or None below the threshold."""
+        signature = minhash_signature(review_text)
+        buckets = lsh_buckets(signature, scope)
+        placeholders = ",".join("?" * len(buckets))
+        with self._lock:
+            candidates = self._connection.execute(
+                f"SELECT id, scope, signature, result FROM signatures WHERE id IN "
+                f"(SELECT signature_id FROM buckets WHERE bucket IN ({placeholders}))",
+                buckets,
+            ).fetchall()
+
+            best_similarity, best_result = 0.0, None
+            for _, candidate_scope, candidate_signature, result in candidates:
+                if candidate_scope != scope:
+                    continue  # A bucket id collision across scopes
+                similarity = signature_similarity(signature, np.frombuffer(candidate_signature, dtype=np.uint32))
+                if similarity > best_similarity:
+                    best_similarity, best_result = similarity, result
+
+            if best_result is None or best_similarity < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return json.loads(best_result), best_similarity
+
+    def insert(self, review_text, scope, result):
+        """Index one analyzed review; later near-identical reviews in `scope` can reuse `result`."""
+        signature = minhash_signature(review_text)
+        buckets = lsh_buckets(signature, scope)
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO signatures (scope, signature, result, created_at) VALUES (?, ?, ?, ?)",
+                (scope, signature.tobytes(), json.dumps(result), time.time()),
+            )
+            self._connection.executemany(
+                "INSERT INTO buckets (bucket, signature_id) VALUES (?, ?)",
+                [(bucket, cursor.lastrowid) for bucket in buckets],
+            )
+            self._connection.commit()
+            self.inserts += 1
+            sweep_due = self.inserts % self.EVICTION_INTERVAL == 0
+
+        if sweep_due:
+            self.evict()
+
+    def evict(self):
+        """Trim the oldest entries down to max_entries."""
+        if not self.max_entries:
+            return 0
+        with self._lock:
+            count = self._connection.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+            excess = count - self.max_entries
+            if excess <= 0:
+                return 0
+            oldest = "SELECT id FROM signatures ORDER BY id ASC LIMIT ?"
+            self._connection.execute(f"DELETE FROM buckets WHERE signature_id IN ({oldest})", (excess,))
+            self._connection.execute(f"DELETE FROM signatures WHERE id IN ({oldest})", (excess,))
+            self._connection.commit()
+        return excess
+
+    def clear(self):
+        """Remove every indexed review."""
+        with self._lock:
+            self._connection.execute("DELETE FROM buckets")
+            self._connection.execute("DELETE FROM signatures")
+            self._connection.commit()
+
+    def stats(self):
+        """Counters for this process plus the current number of indexed reviews."""
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "inserts": self.inserts,
+            "threshold": self.threshold,
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,255 @@
+# Prompt templates for sentiment analysis
+#
+# Each template is a static prefix that ends right where the review text goes, so
+# building a prompt per review is a single string splice.
+
+# Mode guidelines, shared by the single-review and packed prompts
+STRICT_GUIDELINES = """STRICT MODE GUIDELINES:
+- Positive: ONLY for reviews with CLEAR, STRONG praise and minimal criticism (e.g., "excellent", "amazing", "loved it").
+- Negative: ONLY for reviews with CLEAR, STRONG criticism and minimal praise (e.g., "terrible", "awful", "hated it").
+- Neutral: This is the default. Use for mixed reviews, mild language, factual descriptions, or any ambiguity. When in doubt, CHOOSE NEUTRAL.
+"""
+
+LENIENT_GUIDELINES = """LENIENT MODE GUIDELINES:
+- Positive: Look for ANY positive indicators, including subtle praise, implied satisfaction, or an overall positive tone.
+- Negative: Look for ANY negative indicators, including subtle criticism, disappointment, or an overall negative tone.
+- Neutral: Only for reviews that are purely factual or perfectly balanced.
+"""
+
+# Worked examples (the same ones the full prompts show), reused by the compact prompts
+STRICT_EXAMPLE_REVIEW = "The lead actor did a decent job and some of the visuals were nice, but the plot was predictable and the ending felt rushed. It was an okay movie."
+LENIENT_EXAMPLE_REVIEW = "I wasn't sure what to expect, but I found myself surprisingly invested in the main character's journey. The film definitely makes you think."
+
+# Conservative mode: only strong, unambiguous sentiment counts
+STRICT_PROMPT_PREFIX = """
+You are a conservative film critic assistant. Your task is to analyze a movie review for its sentiment, requiring STRONG, UNAMBIGUOUS evidence for a positive or negative classification.
+
+Your response MUST be a valid JSON object in this exact format:
+{
+    "label": "Positive" | "Negative" | "Neutral",
+    "confidence": float,
+    "explanation": "A detailed explanation justifying the sentiment based on the strict guidelines.",
+    "evidence_phrases": ["phrase 1", "phrase 2"]
+}
+
+---
+""" + STRICT_GUIDELINES + """
+---
+EXAMPLE:
+Review: "The lead actor did a decent job and some of the visuals were nice, but the plot was predictable and the ending felt rushed. It was an okay movie."
+Your JSON Output:
+{
+    "label": "Neutral",
+    "confidence": 0.85,
+    "explanation": "The review contains both positive comments ('decent job', 'visuals were nice') and negative criticisms ('plot was predictable', 'ending felt rushed'). According to strict guidelines, this mixed sentiment defaults to Neutral.",
+    "evidence_phrases": ["decent job", "visuals were nice", "plot was predictable", "ending felt rushed"]
+}
+---
+
+Analyze the following movie review according to these strict rules.
+
+Movie Review:
+"""
+
+# Perceptive mode: picks up subtle emotional cues too
+LENIENT_PROMPT_PREFIX = """
+You are a perceptive film critic assistant. Your task is to analyze a movie review for its sentiment, detecting both explicit and SUBTLE emotional cues.
+
+Your response MUST be a valid JSON object in this exact format:
+{
+    "label": "Positive" | "Negative" | "Neutral",
+    "confidence": float,
+    "explanation": "A detailed explanation justifying the sentiment based on the lenient guidelines.",
+    "evidence_phrases": ["phrase 1", "phrase 2"]
+}
+
+---
+""" + LENIENT_GUIDELINES + """
+---
+EXAMPLE:
+Review: "I wasn't sure what to expect, but I found myself surprisingly invested in the main character's journey. The film definitely makes you think."
+Your JSON Output:
+{
+    "label": "Positive",
+    "confidence": 0.75,
+    "explanation": "The reviewer expresses being 'surprisingly invested' which indicates a positive emotional engagement that exceeded expectations. The phrase 'makes you think' is also generally used to denote a positive, thought-provoking experience. The overall tone is one of pleasant surprise.",
+    "evidence_phrases": ["surprisingly invested", "character's journey", "makes you think"]
+}
+---
+
+Analyze the following movie review according to these lenient rules.
+
+Movie Review:
+"""
+
+PROMPT_PREFIXES = {
+    "strict": STRICT_PROMPT_PREFIX,
+    "lenient": LENIENT_PROMPT_PREFIX,
+}
+
+# Output profiles trade detail for speed: output tokens dominate latency, so the
+# compact profiles drop the explanation and evidence phrases entirely
+OUTPUT_PROFILES = ("full", "label_confidence", "label_only")
+
+# The answer format each profile asks for, and the matching answer for the example review
+_PROFILE_FORMATS = {
+    "label_confidence": """{
+    "label": "Positive" | "Negative" | "Neutral",
+    "confidence": float
+}""",
+    "label_only": """{
+    "label": "Positive" | "Negative" | "Neutral"
+}""",
+}
+
+_EXAMPLE_ANSWERS = {
+    ("strict", "label_confidence"): '{"label": "Neutral", "confidence": 0.85}',
+    ("strict", "label_only"): '{"label": "Neutral"}',
+    ("lenient", "label_confidence"): '{"label": "Positive", "confidence": 0.75}',
+    ("lenient", "label_only"): '{"label": "Positive"}',
+}
+
+COMPACT_PROMPT_TEMPLATE = """
+You are a {role} film critic assistant. Your task is to classify a movie review's sentiment, {focus}.
+
+Your response MUST be a valid JSON object in this exact format, with no other fields and no explanation:
+{answer_format}
+
+---
+{guidelines}
+---
+EXAMPLE:
+Review: "{example_review}"
+Your JSON Output:
+{example_answer}
+---
+
+Classify the following movie review according to these {mode} rules.
+
+Movie Review:
+"""
+
+# How each analysis mode describes itself inside the compact and packed templates
+_MODE_DETAILS = {
+    "strict": {
+        "role": "conservative",
+        "focus": "requiring STRONG, UNAMBIGUOUS evidence for a positive or negative classification",
+        "guidelines": STRICT_GUIDELINES,
+        "example_review": STRICT_EXAMPLE_REVIEW,
+    },
+    "lenient": {
+        "role": "perceptive",
+        "focus": "detecting both explicit and SUBTLE emotional cues",
+        "guidelines": LENIENT_GUIDELINES,
+        "example_review": LENIENT_EXAMPLE_REVIEW,
+    },
+}
+
+# Every single-review prompt prefix, by output profile and then analysis mode
+PROFILE_PROMPT_PREFIXES = {"full": PROMPT_PREFIXES}
+for _profile in ("label_confidence", "label_only"):
+    PROFILE_PROMPT_PREFIXES[_profile] = {
+        mode: COMPACT_PROMPT_TEMPLATE.format(
+            role=details["role"],
+            focus=details["focus"],
+            answer_format=_PROFILE_FORMATS[_profile],
+            guidelines=details["guidelines"],
+            example_review=details["example_review"],
+            example_answer=_EXAMPLE_ANSWERS[(mode, _profile)],
+            mode=mode,
+        )
+        for mode, details in _MODE_DETAILS.items()
+    }
+
+# Packed prompts classify several reviews in one request. The review list is appended
+# as "[index] text" lines and the model answers with one JSON object per index.
+PACKED_PROMPT_TEMPLATE = """
+You are a {role} film critic assistant. Your task is to analyze SEVERAL movie reviews for their sentiment, {focus}.
+
+Each review is listed on its own line, starting with its index in square brackets, e.g. "[0] ...".
+Analyze every review independently - the other reviews must not influence the result.
+
+Your response MUST be a valid JSON array with exactly one object per review, in this exact format:
+[
+    {{
+{item_fields}
+    }}
+]
+
+---
+{guidelines}
+---
+
+Analyze the following movie reviews according to these {mode} rules.
+
+Movie Reviews:
+"""
+
+_PACKED_ITEM_FIELDS = {
+    "full": """        "index": 0,
+        "label": "Positive" | "Negative" | "Neutral",
+        "confidence": float,
+        "explanation": "A short explanation justifying the sentiment based on the {mode} guidelines.",
+        "evidence_phrases": ["phrase 1", "phrase 2"]""",
+    "label_confidence": """        "index": 0,
+        "label": "Positive" | "Negative" | "Neutral",
+        "confidence": float""",
+    "label_only": (
+        '        "index": 0,\n'
+        '        "label": "Positive" | "Negative" | "Neutral"'
+    ),
+}
+
+# Packed prompt prefixes, by output profile and then analysis mode
+PACKED_PROMPT_PREFIXES = {
+    profile: {
+        mode: PACKED_PROMPT_TEMPLATE.format(
+            role=details["role"],
+            focus=details["focus"],
+            item_fields=item_fields.format(mode=mode),
+            guidelines=details["guidelines"],
+            mode=mode,
+        )
+        for mode, details in _MODE_DETAILS.items()
+    }
+    for profile, item_fields in _PACKED_ITEM_FIELDS.items()
+}
+
+# The combined prompt asks for a strict AND a lenient verdict in one call, so scoring
+# both modes costs one request (and one copy of the review's input tokens) per review
+COMBINED_MODE = "combined"
+COMBINED_MODES = ("strict", "lenient")
+
+COMBINED_PROMPT_TEMPLATE = """
+You are a film critic assistant. Your task is to analyze a movie review for its sentiment TWICE: once under the strict guidelines and once under the lenient guidelines below. Judge each verdict only by its own guidelines.
+
+Your response MUST be a valid JSON object in this exact format:
+{{
+    "strict": {strict_format},
+    "lenient": {lenient_format}
+}}
+
+---
+{strict_guidelines}
+{lenient_guidelines}---
+
+Analyze the following movie review under both sets of rules.
+
+Movie Review:
+"""
+
+# One verdict per profile; "{mode}" is filled in by plain replace since the format is full of braces
+_VERDICT_FORMATS = dict(_PROFILE_FORMATS, full="""{
+    "label": "Positive" | "Negative" | "Neutral",
+    "confidence": float,
+    "explanation": "A short explanation justifying the sentiment based on the {mode} guidelines.",
+    "evidence_phrases": ["phrase 1", "phrase 2"]
+}""")
+
+for _profile, _prefixes in PROFILE_PROMPT_PREFIXES.items():
+    _prefixes[COMBINED_MODE] = COMBINED_PROMPT_TEMPLATE.format(
+        strict_format=_VERDICT_FORMATS[_profile].replace("{mode}", "strict").replace("\n", "\n    "),
+        lenient_format=_VERDICT_FORMATS[_profile].replace("{mode}", "lenient").replace("\n", "\n    "),
+        strict_guidelines=STRICT_GUIDELINES,
+        lenient_guidelines=LENIENT_GUIDELINES,
+    )
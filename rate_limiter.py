@@ -0,0 +1,98 @@
+# Token-bucket rate limiting so batch throughput follows the API quota
+import asyncio
+import threading
+import time
+
+def estimate_tokens(text):
+    """Rough token count for a piece of text (about 4 characters per token)."""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+class TokenBucket:
+    """A bucket that holds up to `capacity` tokens and refills at `refill_rate` tokens per second."""
+
+    def __init__(self, capacity, refill_rate):
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self.last_refill
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.last_refill = now
+
+    def try_take(self, amount, now):
+        """Take `amount` tokens if available; otherwise return how many seconds to wait."""
+        self._refill(now)
+        # A single request larger than the whole bucket still has to go through eventually
+        amount = min(float(amount), self.capacity)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+class RateLimiter:
+    """Thread-safe limiter enforcing a requests-per-minute and a tokens-per-minute quota.
+
+    Either limit can be None to leave that dimension unlimited.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+
+        # Allow short bursts of up to one second's worth of quota, then refill smoothly
+        self._request_bucket = None
+        if requests_per_minute:
+            rate = requests_per_minute / 60.0
+            self._request_bucket = TokenBucket(max(1.0, rate), rate)
+
+        self._token_bucket = None
+        if tokens_per_minute:
+            rate = tokens_per_minute / 60.0
+            self._token_bucket = TokenBucket(max(1.0, rate), rate)
+
+    def acquire(self, tokens=1):
+        """Block until one request costing `tokens` tokens is allowed by both quotas."""
+        while True:
+            wait_time = self._try_acquire(tokens)
+            if wait_time <= 0:
+                return
+            time.sleep(wait_time)
+
+    async def acquire_async(self, tokens=1):
+        """Async version of acquire() - waits on the event loop instead of blocking a thread."""
+        while True:
+            wait_time = self._try_acquire(tokens)
+            if wait_time <= 0:
+                return
+            await asyncio.sleep(wait_time)
+
+    def _try_acquire(self, tokens):
+        """Take quota for one request if both buckets have room, else return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._wait_time(tokens, now)
+            if wait_time <= 0:
+                # Both buckets have room - take from them together
+                if self._request_bucket:
+                    self._request_bucket.try_take(1, now)
+                if self._token_bucket:
+                    self._token_bucket.try_take(tokens, now)
+            return wait_time
+
+    def _wait_time(self, tokens, now):
+        """How long until both buckets can cover the request (0 if they can right now)."""
+        wait_time = 0.0
+        for bucket, amount in ((self._request_bucket, 1), (self._token_bucket, tokens)):
+            if bucket is None:
+                continue
+            bucket._refill(now)
+            needed = min(float(amount), bucket.capacity)
+            if bucket.tokens < needed:
+                wait_time = max(wait_time, (needed - bucket.tokens) / bucket.refill_rate)
+        return wait_time
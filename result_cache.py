@@ -0,0 +1,148 @@
+# Persistent on-disk cache of analysis results, so re-runs over the same reviews skip the API
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+def normalize_review_text(review_text):
+    """Normalize review text so trivial whitespace/case differences map to the same entry."""
+    return re.sub(r"\s+", " ", str(review_text)).strip().casefold()
+
+def make_cache_key(review_text, analysis_mode, model_name, prompt_version):
+    """Hash everything that affects the model's answer into one stable key."""
+    key_source = "\x1f".join([
+        str(prompt_version),
+        str(model_name),
+        str(analysis_mode),
+        normalize_review_text(review_text),
+    ])
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """SQLite-backed result cache with size and age based eviction.
+
+    Entries older than `max_age_seconds` are treated as misses and purged; when the
+    cache grows past `max_entries` the least recently used entries are dropped.
+    Hit/miss counters are kept per process and reported by stats().
+    """
+
+    # How many writes between eviction sweeps - keeps the write path cheap
+    EVICTION_INTERVAL = 500
+
+    def __init__(self, path, max_entries=100000, max_age_seconds=None):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access)")
+        self._connection.commit()
+        self.evict()
+
+    def get(self, key):
+        """Return the cached result for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT result, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and self.max_age_seconds and now - row[1] > self.max_age_seconds:
+                # Too old to trust - drop it and treat as a miss
+                self._connection.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._connection.commit()
+                self.evictions += 1
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._connection.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def set(self, key, result):
+        """Store a result, replacing any existing entry for `key`."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results (key, result, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), now, now),
+            )
+            self._connection.commit()
+            self.writes += 1
+            sweep_due = self.writes % self.EVICTION_INTERVAL == 0
+
+        if sweep_due:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then trim the least recently used ones down to max_entries."""
+        with self._lock:
+            removed = 0
+            if self.max_age_seconds:
+                cursor = self._connection.execute(
+                    "DELETE FROM results WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+                )
+                removed += cursor.rowcount
+
+            if self.max_entries:
+                count = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                excess = count - self.max_entries
+                if excess > 0:
+                    cursor = self._connection.execute(
+                        "DELETE FROM results WHERE key IN "
+                        "(SELECT key FROM results ORDER BY last_access ASC LIMIT ?)",
+                        (excess,),
+                    )
+                    removed += cursor.rowcount
+
+            self._connection.commit()
+            self.evictions += removed
+        return removed
+
+    def clear(self):
+        """Remove every cached result."""
+        with self._lock:
+            self._connection.execute("DELETE FROM results")
+            self._connection.commit()
+
+    def stats(self):
+        """Counters for this process plus the current number of stored entries."""
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,215 @@
+# Error-aware retries: classify failures, back off with jitter, share a retry budget, trip a breaker
+import json
+import random
+import re
+import threading
+import time
+
+# Error kinds, from classify_error()
+RATE_LIMIT = "rate_limit"    # 429 / quota exhausted - back off, honor retry-after
+TIMEOUT = "timeout"          # Deadline exceeded - retry
+SERVER = "server"            # 5xx / unavailable - retry, counts toward the circuit breaker
+PARSE = "parse"              # The model answered but not with valid JSON - retry quickly
+CLIENT = "client"            # Bad request / bad API key - retrying won't help
+UNKNOWN = "unknown"
+
+RETRYABLE_KINDS = {RATE_LIMIT, TIMEOUT, SERVER, PARSE, UNKNOWN}
+
+# Errors that mean the backend itself is unhealthy (as opposed to a bad answer)
+BACKEND_FAILURE_KINDS = {TIMEOUT, SERVER, UNKNOWN}
+
+_RETRY_AFTER_PATTERNS = [
+    re.compile(r"retry[ _-]?after[^0-9]{0,5}(\d+(?:\.\d+)?)", re.IGNORECASE),
+    re.compile(r"retry in (\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+]
+
+def classify_error(error):
+    """Sort an exception into one of the error kinds above.
+
+    Works from the exception type, an HTTP-style `code` attribute (as on
+    google.api_core exceptions) and, as a last resort, the message text.
+    """
+    if isinstance(error, json.JSONDecodeError):
+        return PARSE
+    if isinstance(error, TimeoutError):
+        return TIMEOUT
+
+    code = getattr(error, "code", None)
+    code = code if isinstance(code, int) else None
+    type_name = type(error).__name__
+    message = str(error).lower()
+
+    if code == 429 or type_name in ("RateLimitError", "ResourceExhausted", "TooManyRequests"):
+        return RATE_LIMIT
+    if type_name in ("DeadlineExceeded", "Timeout", "ReadTimeout", "ConnectTimeout"):
+        return TIMEOUT
+    if (code is not None and code >= 500) or type_name in ("ServiceUnavailable", "InternalServerError", "BackendError"):
+        return SERVER
+    if (code is not None and 400 <= code < 500) or type_name in ("InvalidArgument", "PermissionDenied", "Unauthenticated"):
+        return CLIENT
+
+    # No structured information - fall back to what the message says
+    if "429" in message or "quota" in message or "exhausted" in message or "rate limit" in message:
+        return RATE_LIMIT
+    if "timeout" in message or "timed out" in message or "deadline" in message:
+        return TIMEOUT
+    if "api key" in message or "permission" in message or "invalid argument" in message:
+        return CLIENT
+    if "503" in message or "500" in message or "unavailable" in message:
+        return SERVER
+    return UNKNOWN
+
+def retry_after_hint(error):
+    """Seconds the server asked us to wait before retrying, if it said so."""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+
+    message = str(error)
+    for pattern in _RETRY_AFTER_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+class RetryBudget:
+    """Shared allowance of retries so failures can't multiply the load on the API.
+
+    Every retry spends one token; every successful call earns back `refill_per_success`
+    tokens, up to `max_tokens`. With the defaults, sustained retries are capped at
+    about 10% of successful traffic, while short bursts can still use the reserve.
+    """
+
+    def __init__(self, max_tokens=20.0, refill_per_success=0.1):
+        self.max_tokens = float(max_tokens)
+        self.refill_per_success = float(refill_per_success)
+        self.tokens = float(max_tokens)
+        self._lock = threading.Lock()
+
+    def try_spend(self):
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.refill_per_success)
+
+class CircuitBreaker:
+    """Stops sending requests to a backend that keeps failing.
+
+    After `failure_threshold` consecutive backend failures the circuit opens and
+    calls fail fast for `reset_timeout` seconds. Then one trial call is let
+    through (half-open): success closes the circuit, a backend failure opens it
+    again, and any other outcome (a 429, a bad request, a cancelled call) frees
+    the trial slot for the next call.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """Whether a call may go to the backend right now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def is_open(self):
+        """True while calls should fail fast (without claiming the half-open trial)."""
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """The half-open trial ended without saying whether the backend is healthy - allow another one."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+class RetryPolicy:
+    """Decides whether and how long to wait before retrying a failed call.
+
+    Delays use decorrelated jitter (each delay is drawn between the base delay and
+    three times the previous one), so parallel workers spread out instead of
+    retrying in lockstep. Server retry-after hints set a floor on the delay.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=30.0, parse_delay=0.1,
+                 budget=None, breaker=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.parse_delay = parse_delay
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self._random = random.Random()
+
+    def record_success(self):
+        """The backend answered - reset the breaker and earn back retry budget."""
+        self.breaker.record_success()
+        self.budget.record_success()
+
+    def record_failure(self, error_kind):
+        """A call failed - only backend failures count toward the breaker, but any failure ends a trial."""
+        if error_kind in BACKEND_FAILURE_KINDS:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_trial()
+
+    def next_delay(self, error, error_kind, attempt, previous_delay=None):
+        """Seconds to wait before the next attempt, or None to give up now."""
+        if error_kind not in RETRYABLE_KINDS or attempt + 1 >= self.max_attempts:
+            return None
+        if self.breaker.is_open():
+            return None
+        if not self.budget.try_spend():
+            return None
+
+        # A malformed answer isn't a load problem, so retry it almost immediately
+        if error_kind == PARSE:
+            return self.parse_delay
+
+        previous_delay = previous_delay or self.base_delay
+        delay = min(self.max_delay, self._random.uniform(self.base_delay, previous_delay * 3))
+
+        hint = retry_after_hint(error)
+        if hint is not None:
+            # Honor the server's hint, with a little jitter so workers don't wake together
+            delay = min(self.max_delay, max(delay, hint * self._random.uniform(1.0, 1.2)))
+        return delay
@@ -1,27 +1,259 @@
 
 # Core imports for sentiment analysis using Google's Gemini AI
+import asyncio
 import os
 import json
+import threading
 import time
-import google.generativeai as genai
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 
+from backends import create_backend
+from json_salvage import VALID_LABELS, salvage_array_json, salvage_result_json
+from near_duplicate import NearDuplicateIndex
+from prompts import COMBINED_MODE, COMBINED_MODES, OUTPUT_PROFILES, PACKED_PROMPT_PREFIXES, PROFILE_PROMPT_PREFIXES
+from rate_limiter import RateLimiter, estimate_tokens
+from result_cache import ResultCache, make_cache_key, normalize_review_text
+from retry_policy import PARSE, CircuitBreaker, RetryBudget, RetryPolicy, classify_error
+
 # Load API key from environment variables
 load_dotenv()
 
 API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
+
+# Which model backend answers requests: "gemini" (default) or "mock" for offline load tests
+BACKEND_NAME = os.getenv("SENTIMENT_BACKEND", "gemini")
 
 MODEL_NAME = "gemini-1.5-flash"  # Fast model for efficient sentiment analysis
 
-def validate_and_clean_result(raw_result):
-    """Clean up AI responses to ensure we get reliable, standardized results."""
+GENERATION_CONFIG = {
+    "temperature": 0.1,  # Low temperature for consistent, less random responses
+    "response_mime_type": "application/json",  # Force JSON output
+}
+
+# Bump this whenever the prompt templates change so old cached answers aren't reused
+PROMPT_VERSION = "1"
+
+# Local result cache settings - set SENTIMENT_CACHE_DISABLED=1 to turn it off
+CACHE_PATH = os.getenv("SENTIMENT_CACHE_PATH", ".sentiment_cache.sqlite3")
+CACHE_MAX_ENTRIES = int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "200000"))
+CACHE_MAX_AGE_DAYS = float(os.getenv("SENTIMENT_CACHE_MAX_AGE_DAYS", "30"))
+CACHE_ENABLED = os.getenv("SENTIMENT_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+
+# Near-duplicate reuse: answer a review with the stored result of one at least this similar
+# (estimated Jaccard over character shingles, 0-1). Off unless a threshold is set
+NEAR_DUP_PATH = os.getenv("SENTIMENT_NEAR_DUP_PATH", ".sentiment_near_dup.sqlite3")
+NEAR_DUP_THRESHOLD = float(os.getenv("SENTIMENT_NEAR_DUP_THRESHOLD", "0"))
+NEAR_DUP_MAX_ENTRIES = int(os.getenv("SENTIMENT_NEAR_DUP_MAX_ENTRIES", "200000"))
+
+# Batch concurrency and quota settings - tune these to match your API tier
+DEFAULT_MAX_WORKERS = int(os.getenv("GEMINI_MAX_WORKERS", "8"))
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_RPM", "300"))
+DEFAULT_TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TPM", "1000000"))
+DEFAULT_ASYNC_CONCURRENCY = int(os.getenv("GEMINI_ASYNC_CONCURRENCY", "64"))
+
+# Retry behavior - the budget and breaker are shared by every request in the process
+MAX_ATTEMPTS = 3
+RETRY_BUDGET_TOKENS = float(os.getenv("SENTIMENT_RETRY_BUDGET", "20"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("SENTIMENT_CIRCUIT_FAILURES", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("SENTIMENT_CIRCUIT_RESET_SECONDS", "30"))
+
+# Approximate tokens used by the instructions + example + JSON answer around each review
+PROMPT_OVERHEAD_TOKENS = 750
+
+# The same overhead per output profile - the compact profiles have a shorter prompt
+# and, more importantly, a much shorter answer
+PROFILE_OVERHEAD_TOKENS = {
+    "full": PROMPT_OVERHEAD_TOKENS,
+    "label_confidence": 300,
+    "label_only": 280,
+}
+
+# Packed mode: many reviews share one prompt - budget is per request (prompt + answers)
+DEFAULT_PACK_TOKEN_BUDGET = int(os.getenv("SENTIMENT_PACK_TOKEN_BUDGET", "6000"))
+MAX_REVIEWS_PER_PACK = 40
+PACKED_PROMPT_OVERHEAD_TOKENS = 350
+PACKED_TOKENS_PER_REVIEW = 90  # The short JSON verdict written back for each review
+PACKED_PROFILE_TOKENS_PER_REVIEW = {
+    "full": PACKED_TOKENS_PER_REVIEW,
+    "label_confidence": 25,
+    "label_only": 18,
+}
+
+_shared_rate_limiter = None
+_shared_rate_limiter_lock = threading.Lock()
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+_near_duplicate_index = None
+_near_duplicate_threshold = NEAR_DUP_THRESHOLD
+_near_duplicate_lock = threading.Lock()
+
+_backend = None
+_backend_lock = threading.Lock()
+
+_retry_policy = None
+_retry_policy_lock = threading.Lock()
+_circuit_fallback = None
+
+# Process-wide counters describing how much API work the current run has done
+_run_stats = {}
+_run_stats_lock = threading.Lock()
+
+# Durations (seconds) of the most recent successful backend calls, for live latency percentiles
+LATENCY_WINDOW = 2000
+_call_latencies = deque(maxlen=LATENCY_WINDOW)
+
+def _record_stat(name, amount=1):
+    with _run_stats_lock:
+        _run_stats[name] = _run_stats.get(name, 0) + amount
+
+def get_run_stats():
+    """Snapshot of the API usage counters (calls made, packed calls, fallbacks, ...)."""
+    with _run_stats_lock:
+        return dict(_run_stats)
+
+def reset_run_stats():
+    """Start counting from zero, e.g. at the beginning of a batch run."""
+    with _run_stats_lock:
+        _run_stats.clear()
+        _call_latencies.clear()
+
+def _record_latency(seconds):
+    with _run_stats_lock:
+        _call_latencies.append(seconds)
+
+def get_latency_percentiles(percentiles=(50, 95)):
+    """Backend call latency percentiles in seconds over the recent calls, e.g. {50: 0.8, 95: 2.1}.
+
+    Empty until the first call has succeeded.
+    """
+    with _run_stats_lock:
+        latencies = sorted(_call_latencies)
+    if not latencies:
+        return {}
+    return {p: latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] for p in percentiles}
+
+def get_result_cache():
+    """Return the process-wide result cache, opening it on first use (None if disabled)."""
+    global _result_cache
+
+    if not CACHE_ENABLED:
+        return None
+
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(
+                CACHE_PATH,
+                max_entries=CACHE_MAX_ENTRIES,
+                max_age_seconds=CACHE_MAX_AGE_DAYS * 24 * 3600 if CACHE_MAX_AGE_DAYS else None,
+            )
+        return _result_cache
+
+def get_near_duplicate_index():
+    """Return the process-wide near-duplicate index, opening it on first use (None if disabled)."""
+    global _near_duplicate_index
+
+    with _near_duplicate_lock:
+        if _near_duplicate_threshold <= 0:
+            return None
+        if _near_duplicate_index is None:
+            _near_duplicate_index = NearDuplicateIndex(
+                NEAR_DUP_PATH, threshold=_near_duplicate_threshold, max_entries=NEAR_DUP_MAX_ENTRIES
+            )
+        return _near_duplicate_index
+
+def set_near_duplicate_threshold(threshold):
+    """Turn near-duplicate reuse on with this similarity threshold (0-1), or off with 0/None."""
+    global _near_duplicate_threshold
+
+    with _near_duplicate_lock:
+        _near_duplicate_threshold = threshold or 0
+        if _near_duplicate_index is not None:
+            _near_duplicate_index.threshold = _near_duplicate_threshold
+
+def get_backend():
+    """Return the active model backend, creating it from BACKEND_NAME on first use."""
+    global _backend
+
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(BACKEND_NAME, MODEL_NAME, GENERATION_CONFIG, api_key=API_KEY)
+        return _backend
+
+def set_backend(backend):
+    """Swap in a different backend (anything with generate()/generate_async()), e.g. a MockBackend."""
+    global _backend
+
+    with _backend_lock:
+        _backend = backend
+
+def check_output_profile(output_profile):
+    """Raise ValueError for an unknown output profile."""
+    if output_profile not in OUTPUT_PROFILES:
+        raise ValueError(f"Unknown output profile '{output_profile}' - expected one of {', '.join(OUTPUT_PROFILES)}")
+
+def _prompt_version(output_profile):
+    # Each profile has its own prompt; "full" keeps the plain version so existing entries stay valid
+    return PROMPT_VERSION if output_profile == "full" else f"{PROMPT_VERSION}:{output_profile}"
+
+def result_cache_key(review_text, analysis_mode="lenient", output_profile="full", backend=None):
+    """Cache key for a review under the backend's model (the active one by default) and the current prompts."""
+    model_name = (backend or get_backend()).model_name
+    return make_cache_key(review_text, analysis_mode, model_name, _prompt_version(output_profile))
+
+def near_duplicate_scope(analysis_mode="lenient", output_profile="full", backend=None):
+    """Which stored answers are interchangeable: same prompt version, model and mode."""
+    return "\x1f".join([_prompt_version(output_profile), (backend or get_backend()).model_name, analysis_mode])
+
+def lookup_cached_result(review_text, analysis_mode="lenient", output_profile="full", backend=None):
+    """Return the cached result for a review, or None if it isn't cached (or caching is off).
+
+    After an exact miss the near-duplicate index is consulted (when enabled); an
+    approximate hit carries the estimated similarity in "near_duplicate_similarity".
+    """
+    cache = get_result_cache()
+    if cache is not None:
+        cached_result = cache.get(result_cache_key(review_text, analysis_mode, output_profile, backend))
+        if cached_result is not None:
+            return cached_result
+
+    index = get_near_duplicate_index()
+    if index is None:
+        return None
+    match = index.lookup(review_text, near_duplicate_scope(analysis_mode, output_profile, backend))
+    if match is None:
+        return None
+    result, similarity = match
+    _record_stat("near_duplicate_hits")
+    return dict(result, near_duplicate_similarity=round(similarity, 3))
+
+def store_result(review_text, analysis_mode, output_profile, result, backend=None):
+    """Remember a fresh answer in the result cache and the near-duplicate index (whichever are on)."""
+    cache = get_result_cache()
+    if cache is not None:
+        cache.set(result_cache_key(review_text, analysis_mode, output_profile, backend), result)
+    index = get_near_duplicate_index()
+    if index is not None:
+        index.insert(review_text, near_duplicate_scope(analysis_mode, output_profile, backend), result)
+
+def validate_and_clean_result(raw_result, output_profile="full"):
+    """Clean up AI responses to ensure we get reliable, standardized results.
+
+    Compact profiles keep the same keys: "label_only" results have confidence None,
+    and neither compact profile has an explanation or evidence phrases.
+    """
     # Make sure sentiment label is valid - default to Neutral if weird response
     label = str(raw_result.get("label", "Neutral")).strip().title()
     
     if label not in {"Positive", "Negative", "Neutral"}:
         label = "Neutral"
     
+    if output_profile == "label_only":
+        return {"label": label, "confidence": None, "explanation": "", "evidence_phrases": []}
+    
     # Ensure confidence score is a valid number between 0 and 1
     try:
         confidence = float(raw_result.get("confidence", 0.5))
@@ -29,6 +261,9 @@ def validate_and_clean_result(raw_result):
     except (ValueError, TypeError):
         confidence = 0.5  # Default to neutral confidence
     
+    if output_profile == "label_confidence":
+        return {"label": label, "confidence": confidence, "explanation": "", "evidence_phrases": []}
+    
     # Get explanation text, provide fallback if missing
     explanation = str(raw_result.get("explanation", "")).strip()
     if not explanation:
@@ -54,148 +289,632 @@ def validate_and_clean_result(raw_result):
         "evidence_phrases": clean_evidence,
     }
 
-def analyze_sentiment(review_text, analysis_mode="lenient"):
+def clean_combined_result(raw_result, output_profile="full"):
+    """Validate a combined answer {"strict": {...}, "lenient": {...}} into one result per mode.
+
+    The individual verdicts go under "verdicts"; the top level mirrors the lenient
+    one, so code that expects a plain result still gets one. A missing verdict
+    counts as a broken answer and is retried like unparseable JSON.
+    """
+    verdicts = {}
+    for mode in COMBINED_MODES:
+        verdict = raw_result.get(mode) if isinstance(raw_result, dict) else None
+        if not isinstance(verdict, dict):
+            raise json.JSONDecodeError(f"Combined answer has no '{mode}' verdict", json.dumps(raw_result), 0)
+        verdicts[mode] = validate_and_clean_result(verdict, output_profile)
+    return dict(verdicts["lenient"], verdicts=verdicts)
+
+def build_prompt(review_text, analysis_mode="lenient", output_profile="full"):
+    """Build the full analysis prompt for one review in the given mode and output profile."""
+    # Choose prompt based on analysis mode - strict vs lenient (anything else is lenient)
+    prompt_prefixes = PROFILE_PROMPT_PREFIXES[output_profile]
+    prompt_prefix = prompt_prefixes.get(analysis_mode, prompt_prefixes["lenient"])
+    return prompt_prefix + review_text.strip() + "\n"
+
+def get_retry_policy():
+    """Return the process-wide retry policy (shared retry budget and circuit breaker)."""
+    global _retry_policy
+
+    with _retry_policy_lock:
+        if _retry_policy is None:
+            _retry_policy = RetryPolicy(
+                max_attempts=MAX_ATTEMPTS,
+                budget=RetryBudget(max_tokens=RETRY_BUDGET_TOKENS),
+                breaker=CircuitBreaker(
+                    failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                    reset_timeout=CIRCUIT_RESET_SECONDS,
+                ),
+            )
+        return _retry_policy
+
+def set_circuit_fallback(fallback):
+    """Route requests to `fallback(review_text, analysis_mode) -> result` while the circuit is open.
+
+    Pass None to go back to failing fast with a Neutral placeholder.
+    """
+    global _circuit_fallback
+    _circuit_fallback = fallback
+
+def circuit_open_result(review_text, analysis_mode="lenient"):
+    """Answer for a request that was never sent because the circuit breaker is open."""
+    _record_stat("circuit_open_skips")
+    if _circuit_fallback is not None:
+        try:
+            return _circuit_fallback(review_text, analysis_mode)
+        except Exception:
+            pass
+    return _failure_result("Analysis skipped: the sentiment service is temporarily unavailable")
+
+def parse_result_json(response_text):
+    """Parse a single-review answer, salvaging fenced, prefixed or truncated JSON locally.
+
+    Raises json.JSONDecodeError only when nothing usable can be recovered, so a
+    retry is only paid for answers that are truly broken.
+    """
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        salvaged = salvage_result_json(response_text)
+        if salvaged is None:
+            raise
+        _record_stat("salvaged_responses")
+        return salvaged
+
+def _plan_retry(retry_policy, error, attempt, previous_delay):
+    """Record a failed attempt; returns (error description, seconds to wait or None to stop)."""
+    error_kind = classify_error(error)
+    retry_policy.record_failure(error_kind)
+    _record_stat(f"errors_{error_kind}")
+
+    if error_kind == PARSE:
+        error_description = f"JSON parsing error: {error}"
+    else:
+        error_description = f"Analysis error ({error_kind}): {error}"
+
+    retry_delay = retry_policy.next_delay(error, error_kind, attempt, previous_delay)
+    if retry_delay is not None:
+        _record_stat("retries")
+    return error_description, retry_delay
+
+def _empty_review_result():
+    """Answer for empty or non-text input, which never reaches the model."""
+    return {
+        "label": "Neutral",
+        "confidence": 0.5,
+        "explanation": "Cannot analyze empty text",
+        "evidence_phrases": [],
+    }
+
+def _failure_result(explanation):
+    """Neutral placeholder for a review the model never answered, flagged with "failed": True."""
+    return {
+        "label": "Neutral",
+        "confidence": 0.5,
+        "explanation": explanation,
+        "evidence_phrases": [],
+        "failed": True,
+    }
+
+def is_failed_result(result):
+    """Whether a result is a placeholder for a review the model couldn't analyze."""
+    return bool(result.get("failed"))
+
+def _failed_result(attempts, last_error):
+    """Safe default once every attempt at a review has failed."""
+    return _failure_result(f"Analysis failed after {attempts} attempts: {last_error}")
+
+def _start_call(prompt_text):
+    """Count a backend call about to be made; returns its start time for _finish_call()."""
+    _record_stat("api_calls")
+    _record_stat("estimated_input_tokens", estimate_tokens(prompt_text))
+    return time.perf_counter()
+
+def _finish_call(retry_policy, call_started, response_text, analysis_mode, output_profile):
+    """Record a successful call and turn its answer into a validated result (raises if unusable)."""
+    _record_latency(time.perf_counter() - call_started)
+    retry_policy.record_success()
+
+    parsed_result = parse_result_json(response_text)
+    if analysis_mode == COMBINED_MODE:
+        return clean_combined_result(parsed_result, output_profile)
+    return validate_and_clean_result(parsed_result, output_profile)
+
+def analyze_sentiment(review_text, analysis_mode="lenient", use_cache=True, refresh_cache=False,
+                      output_profile="full", backend=None):
     """Main function to analyze sentiment of movie review text.
     
     Args:
         review_text (str): Review text to analyze
-        analysis_mode (str): "strict" for conservative analysis, "lenient" for subtle cues
+        analysis_mode (str): "strict" for conservative analysis, "lenient" for subtle cues,
+            "combined" for both verdicts from one call (see clean_combined_result)
+        use_cache (bool): Look up / store the result in the local result cache (and the near-duplicate index, if on)
+        refresh_cache (bool): Skip the cache lookup but store the fresh result
+        output_profile (str): "full", or "label_confidence" / "label_only" for shorter, faster answers
+        backend: Model backend to ask instead of the active one (e.g. to compare models)
     """
     # Handle edge case: empty or invalid input
     if not isinstance(review_text, str) or not review_text.strip():
-        return {
-            "label": "Neutral",
-            "confidence": 0.5,
-            "explanation": "Cannot analyze empty text",
-            "evidence_phrases": [],
-        }
-    
-    # Choose prompt based on analysis mode - strict vs lenient
-    if analysis_mode == "strict":
-        prompt_text = f"""
-You are a conservative film critic assistant. Your task is to analyze a movie review for its sentiment, requiring STRONG, UNAMBIGUOUS evidence for a positive or negative classification.
-
-Your response MUST be a valid JSON object in this exact format:
-{{
-    "label": "Positive" | "Negative" | "Neutral",
-    "confidence": float,
-    "explanation": "A detailed explanation justifying the sentiment based on the strict guidelines.",
-    "evidence_phrases": ["phrase 1", "phrase 2"]
-}}
-
----
-STRICT MODE GUIDELINES:
-- Positive: ONLY for reviews with CLEAR, STRONG praise and minimal criticism (e.g., "excellent", "amazing", "loved it").
-- Negative: ONLY for reviews with CLEAR, STRONG criticism and minimal praise (e.g., "terrible", "awful", "hated it").
-- Neutral: This is the default. Use for mixed reviews, mild language, factual descriptions, or any ambiguity. When in doubt, CHOOSE NEUTRAL.
-
----
-EXAMPLE:
-Review: "The lead actor did a decent job and some of the visuals were nice, but the plot was predictable and the ending felt rushed. It was an okay movie."
-Your JSON Output:
-{{
-    "label": "Neutral",
-    "confidence": 0.85,
-    "explanation": "The review contains both positive comments ('decent job', 'visuals were nice') and negative criticisms ('plot was predictable', 'ending felt rushed'). According to strict guidelines, this mixed sentiment defaults to Neutral.",
-    "evidence_phrases": ["decent job", "visuals were nice", "plot was predictable", "ending felt rushed"]
-}}
----
-
-Analyze the following movie review according to these strict rules.
-
-Movie Review:
-{review_text.strip()}
-"""
-    else:
-        prompt_text = f"""
-You are a perceptive film critic assistant. Your task is to analyze a movie review for its sentiment, detecting both explicit and SUBTLE emotional cues.
-
-Your response MUST be a valid JSON object in this exact format:
-{{
-    "label": "Positive" | "Negative" | "Neutral",
-    "confidence": float,
-    "explanation": "A detailed explanation justifying the sentiment based on the lenient guidelines.",
-    "evidence_phrases": ["phrase 1", "phrase 2"]
-}}
-
----
-LENIENT MODE GUIDELINES:
-- Positive: Look for ANY positive indicators, including subtle praise, implied satisfaction, or an overall positive tone.
-- Negative: Look for ANY negative indicators, including subtle criticism, disappointment, or an overall negative tone.
-- Neutral: Only for reviews that are purely factual or perfectly balanced.
-
----
-EXAMPLE:
-Review: "I wasn't sure what to expect, but I found myself surprisingly invested in the main character's journey. The film definitely makes you think."
-Your JSON Output:
-{{
-    "label": "Positive",
-    "confidence": 0.75,
-    "explanation": "The reviewer expresses being 'surprisingly invested' which indicates a positive emotional engagement that exceeded expectations. The phrase 'makes you think' is also generally used to denote a positive, thought-provoking experience. The overall tone is one of pleasant surprise.",
-    "evidence_phrases": ["surprisingly invested", "character's journey", "makes you think"]
-}}
----
-
-Analyze the following movie review according to these lenient rules.
-
-Movie Review:
-{review_text.strip()}
-"""
-    
-    # Set up the AI model with low temperature for consistent results
-    model = genai.GenerativeModel(
-        model_name=MODEL_NAME,
-        generation_config={
-            "temperature": 0.1,  # Low temperature for consistent, less random responses
-            "response_mime_type": "application/json",  # Force JSON output
-        },
-    )
-    
-    # Try up to 3 times in case of API hiccups
+        return _empty_review_result()
+    
+    # Reuse a previous answer for the same (or a near-identical) review, mode, model and prompt version
+    if use_cache and not refresh_cache:
+        cached_result = lookup_cached_result(review_text, analysis_mode, output_profile, backend)
+        if cached_result is not None:
+            return cached_result
+    
+    prompt_text = build_prompt(review_text, analysis_mode, output_profile)
+    backend = backend or get_backend()
+    
+    # Fail fast (or use the fallback classifier) while the backend is known to be down
+    retry_policy = get_retry_policy()
+    if not retry_policy.breaker.allow_request():
+        return circuit_open_result(review_text, analysis_mode)
+    
+    # Retry transient failures, backing off according to what went wrong
     last_error = None
-    for attempt in range(3):
+    retry_delay = None
+    attempts = 0
+    for attempt in range(retry_policy.max_attempts):
+        attempts += 1
         try:
-            response = model.generate_content(prompt_text)
-            response_text = response.text or ""
-            
-            parsed_result = json.loads(response_text)
-            
-            return validate_and_clean_result(parsed_result)
-            
-        except json.JSONDecodeError as e:
-            last_error = f"JSON parsing error: {e}"
-            time.sleep(0.5 * (attempt + 1))  # Wait longer between retries
+            call_started = _start_call(prompt_text)
+            response_text = backend.generate(prompt_text, analysis_mode)
+            result = _finish_call(retry_policy, call_started, response_text, analysis_mode, output_profile)
+            if use_cache:
+                store_result(review_text, analysis_mode, output_profile, result, backend)
+            return result
             
         except Exception as e:
-            last_error = f"Analysis error: {e}"
-            time.sleep(0.8 * (attempt + 1))
+            last_error, retry_delay = _plan_retry(retry_policy, e, attempt, retry_delay)
+            if retry_delay is None:
+                break
+            time.sleep(retry_delay)
     
     # If all retries failed, return safe default
-    return {
-        "label": "Neutral",
-        "confidence": 0.5,
-        "explanation": f"Analysis failed after 3 attempts: {last_error}",
-        "evidence_phrases": [],
-    }
+    return _failed_result(attempts, last_error)
+
+async def analyze_sentiment_async(review_text, analysis_mode="lenient", use_cache=True, refresh_cache=False,
+                                  output_profile="full", backend=None):
+    """Async version of analyze_sentiment() - same prompt, validation and fallbacks.
+
+    Awaits the backend's generate_async(), so many reviews can be in flight on one
+    event loop without tying up a thread each. Cache lookups and stores run on a
+    worker thread, so the SQLite I/O never blocks the loop.
+    """
+    # Handle edge case: empty or invalid input
+    if not isinstance(review_text, str) or not review_text.strip():
+        return _empty_review_result()
+    
+    # Reuse a previous answer for the same (or a near-identical) review, mode, model and prompt version
+    if use_cache and not refresh_cache:
+        cached_result = await asyncio.to_thread(
+            lookup_cached_result, review_text, analysis_mode, output_profile, backend
+        )
+        if cached_result is not None:
+            return cached_result
+    
+    prompt_text = build_prompt(review_text, analysis_mode, output_profile)
+    backend = backend or get_backend()
+    
+    # Fail fast (or use the fallback classifier) while the backend is known to be down
+    retry_policy = get_retry_policy()
+    if not retry_policy.breaker.allow_request():
+        return circuit_open_result(review_text, analysis_mode)
+    
+    # Retry transient failures, backing off according to what went wrong
+    last_error = None
+    retry_delay = None
+    attempts = 0
+    for attempt in range(retry_policy.max_attempts):
+        attempts += 1
+        try:
+            call_started = _start_call(prompt_text)
+            response_text = await backend.generate_async(prompt_text, analysis_mode)
+            result = _finish_call(retry_policy, call_started, response_text, analysis_mode, output_profile)
+            if use_cache:
+                await asyncio.to_thread(store_result, review_text, analysis_mode, output_profile, result, backend)
+            return result
+
+        except asyncio.CancelledError:
+            # A cancelled half-open trial says nothing about the backend - let another call try
+            retry_policy.breaker.release_trial()
+            raise
+        except Exception as e:
+            last_error, retry_delay = _plan_retry(retry_policy, e, attempt, retry_delay)
+            if retry_delay is None:
+                break
+            await asyncio.sleep(retry_delay)
+    
+    # If all retries failed, return safe default
+    return _failed_result(attempts, last_error)
+
+def get_rate_limiter(requests_per_minute=None, tokens_per_minute=None):
+    """Return the process-wide rate limiter, or a dedicated one for custom quotas.
+
+    Every batch that uses the default quota shares one limiter, so concurrent
+    batches (e.g. several Streamlit sessions) stay under the same API limit together.
+    """
+    global _shared_rate_limiter
+
+    if requests_per_minute is not None or tokens_per_minute is not None:
+        return RateLimiter(
+            requests_per_minute=requests_per_minute or DEFAULT_REQUESTS_PER_MINUTE,
+            tokens_per_minute=tokens_per_minute or DEFAULT_TOKENS_PER_MINUTE,
+        )
+
+    with _shared_rate_limiter_lock:
+        if _shared_rate_limiter is None:
+            _shared_rate_limiter = RateLimiter(
+                requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+            )
+        return _shared_rate_limiter
+
+def estimate_request_tokens(review_text, output_profile="full"):
+    """Estimate the total tokens (prompt + answer) one analysis request will cost."""
+    return PROFILE_OVERHEAD_TOKENS[output_profile] + estimate_tokens(str(review_text))
+
+def estimate_packed_tokens(reviews, output_profile="full"):
+    """Estimate the total tokens (prompt + answers) of one packed request."""
+    tokens_per_review = PACKED_PROFILE_TOKENS_PER_REVIEW[output_profile]
+    review_tokens = sum(estimate_tokens(str(review)) + tokens_per_review for review in reviews)
+    return PACKED_PROMPT_OVERHEAD_TOKENS + review_tokens
+
+def pack_reviews(reviews_list, token_budget=None, max_reviews_per_pack=None, output_profile="full"):
+    """Group review positions into packs that each fit in one request's token budget.
+
+    Returns a list of lists of positions into `reviews_list`. A review that is too
+    long to share a request ends up in a pack of its own.
+    """
+    token_budget = token_budget or DEFAULT_PACK_TOKEN_BUDGET
+    max_reviews_per_pack = max_reviews_per_pack or MAX_REVIEWS_PER_PACK
+    tokens_per_review = PACKED_PROFILE_TOKENS_PER_REVIEW[output_profile]
+
+    packs = []
+    current_pack = []
+    current_tokens = PACKED_PROMPT_OVERHEAD_TOKENS
+    for position, review in enumerate(reviews_list):
+        review_tokens = estimate_tokens(str(review)) + tokens_per_review
+        pack_is_full = (
+            current_tokens + review_tokens > token_budget
+            or len(current_pack) >= max_reviews_per_pack
+        )
+        if current_pack and pack_is_full:
+            packs.append(current_pack)
+            current_pack = []
+            current_tokens = PACKED_PROMPT_OVERHEAD_TOKENS
+
+        current_pack.append(position)
+        current_tokens += review_tokens
+
+    if current_pack:
+        packs.append(current_pack)
+    return packs
+
+def build_packed_prompt(reviews, analysis_mode="lenient", output_profile="full"):
+    """Build one prompt that asks for a verdict on each of `reviews`, keyed by position."""
+    prompt_prefixes = PACKED_PROMPT_PREFIXES[output_profile]
+    prompt_prefix = prompt_prefixes.get(analysis_mode, prompt_prefixes["lenient"])
+    # Each review goes on a single line so the "[index]" markers stay unambiguous
+    review_lines = [f"[{index}] {' '.join(str(review).split())}" for index, review in enumerate(reviews)]
+    return prompt_prefix + "\n".join(review_lines) + "\n"
+
+def parse_packed_response(response_text, review_count, output_profile="full"):
+    """Turn a packed JSON array answer into {position: cleaned result}.
+
+    Entries that are malformed, duplicated or out of range are left out, so the
+    caller can re-analyze just those reviews one at a time.
+    """
+    try:
+        parsed = json.loads(response_text)
+    except (json.JSONDecodeError, TypeError):
+        # Keep whatever complete entries a truncated or wrapped array still has
+        parsed = salvage_array_json(response_text or "")
+        if parsed is None:
+            return {}
+        _record_stat("salvaged_responses")
+
+    # Some answers wrap the array in an object - accept {"results": [...]} too
+    if isinstance(parsed, dict):
+        parsed = next((value for value in parsed.values() if isinstance(value, list)), [])
+    if not isinstance(parsed, list):
+        return {}
+
+    results = {}
+    for position, item in enumerate(parsed):
+        # A missing or cut-off label means the entry can't be trusted - re-analyze it instead
+        if not isinstance(item, dict) or str(item.get("label", "")).strip().title() not in VALID_LABELS:
+            continue
+        # Prefer the explicit index; fall back to array position if the model left it out
+        index = item.get("index", position if len(parsed) == review_count else None)
+        try:
+            index = int(index)
+        except (ValueError, TypeError):
+            continue
+        if 0 <= index < review_count and index not in results:
+            results[index] = validate_and_clean_result(item, output_profile)
+    return results
+
+def analyze_sentiment_packed(reviews, analysis_mode="lenient", use_cache=True, rate_limiter=None,
+                             output_profile="full", backend=None):
+    """Classify several reviews with a single API call, falling back per review on gaps.
+
+    Whatever the packed answer is missing (malformed array, skipped or garbled
+    entries, or a failed call) is re-analyzed with analyze_sentiment(), so every
+    review still gets a result. Returns results in the same order as `reviews`.
+    """
+    reviews = list(reviews)
+    backend = backend or get_backend()
+    packed_results = {}
+    retry_policy = get_retry_policy()
+
+    if retry_policy.breaker.allow_request():
+        try:
+            if rate_limiter is not None:
+                rate_limiter.acquire(estimate_packed_tokens(reviews, output_profile))
+            prompt_text = build_packed_prompt(reviews, analysis_mode, output_profile)
+            _record_stat("api_calls")
+            _record_stat("packed_calls")
+            _record_stat("estimated_input_tokens", estimate_tokens(prompt_text))
+            call_started = time.perf_counter()
+            response_text = backend.generate(prompt_text, analysis_mode)
+            _record_latency(time.perf_counter() - call_started)
+            retry_policy.record_success()
+            packed_results = parse_packed_response(response_text, len(reviews), output_profile)
+        except Exception as e:
+            # No retry here - the per-review fallback below has its own retries
+            retry_policy.record_failure(classify_error(e))
+            packed_results = {}
 
-def process_batch_reviews(reviews_list, analysis_mode="lenient", progress_callback=None):
-    """Handle multiple reviews at once - useful for batch processing."""
     results = []
+    for position, review in enumerate(reviews):
+        result = packed_results.get(position)
+        if result is None:
+            # Only the reviews the packed answer didn't cover pay for their own call
+            _record_stat("packed_fallbacks")
+            if rate_limiter is not None and not retry_policy.breaker.is_open():
+                rate_limiter.acquire(estimate_request_tokens(review, output_profile))
+            result = analyze_sentiment(review, analysis_mode=analysis_mode, use_cache=use_cache,
+                                       refresh_cache=True, output_profile=output_profile, backend=backend)
+        elif use_cache:
+            store_result(review, analysis_mode, output_profile, result, backend)
+        results.append(result)
+    return results
+
+def group_duplicate_reviews(reviews_list, indices=None):
+    """Group positions of reviews that are identical apart from whitespace and case.
+
+    Returns a list of position lists in first-seen order; the first position of
+    each group is the one that gets analyzed.
+    """
+    groups = {}
+    for index in range(len(reviews_list)) if indices is None else indices:
+        groups.setdefault(normalize_review_text(reviews_list[index]), []).append(index)
+    return list(groups.values())
+
+def process_batch_reviews(reviews_list, analysis_mode="lenient", progress_callback=None,
+                          max_workers=None, requests_per_minute=None, tokens_per_minute=None,
+                          use_cache=True, refresh_cache=False, packed=False, pack_token_budget=None,
+                          output_profile="full", result_callback=None, rate_limiter=None,
+                          deduplicate=True, backend=None, cancel_event=None):
+    """Handle multiple reviews at once - useful for batch processing.
+
+    Reviews are analyzed concurrently by a bounded pool of worker threads while a
+    token-bucket limiter keeps requests and tokens per minute within the quota.
+    Results come back in the same order as `reviews_list`, and `progress_callback`
+    is called with (completed, total) from the calling thread as reviews finish;
+    `result_callback`, if given, gets (index, result) for each finished review.
+    Pass `rate_limiter` to share one limiter across several calls (it overrides
+    `requests_per_minute` / `tokens_per_minute`).
+
+    With `packed=True`, reviews are grouped into multi-review requests that fit in
+    `pack_token_budget` tokens (see analyze_sentiment_packed). `output_profile`
+    picks how much each answer contains (see analyze_sentiment).
+
+    With `deduplicate=True`, reviews that only differ in whitespace or case are
+    analyzed once and the answer is copied to every copy.
+
+    `backend` sends the batch to a specific model backend instead of the active
+    one, so several models can be compared side by side in one process.
+
+    Setting `cancel_event` (a threading.Event) stops the batch from starting new
+    requests; the ones in flight still finish and are reported, and every review
+    that was never analyzed is left as None in the returned list.
+    """
+    check_output_profile(output_profile)
+    reviews_list = list(reviews_list)
     total_reviews = len(reviews_list)
-    
-    for i, review in enumerate(reviews_list):
+    results = [None] * total_reviews
+    if total_reviews == 0:
+        return results
+
+    max_workers = max(1, max_workers or DEFAULT_MAX_WORKERS)
+    rate_limiter = rate_limiter or get_rate_limiter(requests_per_minute, tokens_per_minute)
+    completed = 0
+
+    def finish(index, result):
+        nonlocal completed
+        results[index] = result
+        completed += 1
+        if result_callback:
+            result_callback(index, result)
         if progress_callback:
-            progress_callback(i + 1, total_reviews)
-        
-        result = analyze_sentiment(review, analysis_mode=analysis_mode)
-        results.append(result)
-        
-        # Small delay between requests to be nice to the API
-        if i < total_reviews - 1:
-            time.sleep(0.2)
-    
+            progress_callback(completed, total_reviews)
+
+    # Answer empty reviews up front - they don't need quota or a worker
+    review_indices = []
+    for index, review in enumerate(reviews_list):
+        if not isinstance(review, str) or not review.strip():
+            finish(index, analyze_sentiment(review, analysis_mode=analysis_mode))
+        else:
+            review_indices.append(index)
+
+    # Copies of the same review share one request
+    if deduplicate:
+        review_groups = group_duplicate_reviews(reviews_list, review_indices)
+    else:
+        review_groups = [[index] for index in review_indices]
+    _record_stat("dedup_reviews", len(review_indices))
+    _record_stat("distinct_reviews", len(review_groups))
+
+    # Cache hits don't need quota or a worker either
+    pending_indices = []
+    duplicate_indices = {}  # analyzed index -> the other indices that get its answer
+    for group in review_groups:
+        if use_cache and not refresh_cache:
+            cached_result = lookup_cached_result(reviews_list[group[0]], analysis_mode, output_profile, backend)
+            if cached_result is not None:
+                for index in group:
+                    finish(index, cached_result)
+                continue
+        pending_indices.append(group[0])
+        if len(group) > 1:
+            duplicate_indices[group[0]] = group[1:]
+            _record_stat("duplicate_reviews", len(group) - 1)
+
+    def analyze_single(indices):
+        review = reviews_list[indices[0]]
+        # While the circuit is open the request fails fast, so it needs no quota
+        if not get_retry_policy().breaker.is_open():
+            rate_limiter.acquire(estimate_request_tokens(review, output_profile))
+        # Already looked the review up above, so go straight to the API and store the answer
+        return [analyze_sentiment(review, analysis_mode=analysis_mode, use_cache=use_cache,
+                                  refresh_cache=True, output_profile=output_profile, backend=backend)]
+
+    def analyze_pack(indices):
+        return analyze_sentiment_packed([reviews_list[i] for i in indices], analysis_mode=analysis_mode,
+                                        use_cache=use_cache, rate_limiter=rate_limiter,
+                                        output_profile=output_profile, backend=backend)
+
+    # Each unit of work is a list of review indices answered by one task
+    if packed:
+        pack_positions = pack_reviews([reviews_list[i] for i in pending_indices], pack_token_budget,
+                                      output_profile=output_profile)
+        work_units = ([pending_indices[p] for p in positions] for positions in pack_positions)
+        analyze_unit = analyze_pack
+    else:
+        work_units = ([index] for index in pending_indices)
+        analyze_unit = analyze_single
+
+    # Keep only a small window of work queued so huge batches don't create 100k futures up front
+    in_flight = {}
+
+    def submit_next(executor):
+        if cancel_event is not None and cancel_event.is_set():
+            return False
+        try:
+            indices = next(work_units)
+        except StopIteration:
+            return False
+        in_flight[executor.submit(analyze_unit, indices)] = indices
+        return True
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for _ in range(max_workers * 2):
+            if not submit_next(executor):
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                indices = in_flight.pop(future)
+                try:
+                    unit_results = future.result()
+                except Exception as e:
+                    # analyze_sentiment handles API errors itself, this only catches the unexpected
+                    unit_results = [_failure_result(f"Analysis failed: {e}")] * len(indices)
+
+                for index, result in zip(indices, unit_results):
+                    finish(index, result)
+                    for duplicate_index in duplicate_indices.get(index, ()):
+                        finish(duplicate_index, result)
+
+                submit_next(executor)
+
     return results
 
+async def analyze_reviews_async(reviews, analysis_mode="lenient", max_concurrency=None,
+                                requests_per_minute=None, tokens_per_minute=None,
+                                use_cache=True, refresh_cache=False, output_profile="full"):
+    """Analyze a stream of reviews on the event loop, yielding results as they complete.
+
+    `reviews` can be a normal or an async iterable; it is consumed lazily, so at most
+    `max_concurrency` requests are in flight at once. Yields (index, result) pairs,
+    where index is the review's position in the input stream - results arrive in
+    completion order, not input order.
+    """
+    check_output_profile(output_profile)
+    max_concurrency = max(1, max_concurrency or DEFAULT_ASYNC_CONCURRENCY)
+    rate_limiter = get_rate_limiter(requests_per_minute, tokens_per_minute)
+
+    async def analyze_with_quota(index, review):
+        try:
+            # Cache hits and empty reviews don't touch the API, so they shouldn't wait for quota either
+            result = None
+            has_text = isinstance(review, str) and review.strip()
+            if use_cache and not refresh_cache and has_text:
+                result = await asyncio.to_thread(lookup_cached_result, review, analysis_mode, output_profile)
+
+            if result is None:
+                if has_text and not get_retry_policy().breaker.is_open():
+                    await rate_limiter.acquire_async(estimate_request_tokens(review, output_profile))
+                result = await analyze_sentiment_async(review, analysis_mode=analysis_mode, use_cache=use_cache,
+                                                       refresh_cache=True, output_profile=output_profile)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            result = _failure_result(f"Analysis failed: {e}")
+        return index, result
+
+    async def iterate_reviews():
+        if hasattr(reviews, "__aiter__"):
+            async for review in reviews:
+                yield review
+        else:
+            for review in reviews:
+                yield review
+
+    review_iterator = iterate_reviews()
+    end_of_stream = object()
+
+    async def next_review():
+        try:
+            return await review_iterator.__anext__()
+        except StopAsyncIteration:
+            return end_of_stream
+
+    # Wait for the next review and the running requests together, so a result is
+    # yielded as soon as it's ready even while a slow input stream has nothing new
+    pending = set()
+    reading = None
+    try:
+        index = 0
+        while True:
+            # Backpressure: only pull the next review while a slot is free
+            if reading is None and review_iterator is not None and len(pending) < max_concurrency:
+                reading = asyncio.ensure_future(next_review())
+            waiting = pending | ({reading} if reading is not None else set())
+            if not waiting:
+                break
+
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is reading:
+                    reading = None
+                    review = task.result()
+                    if review is end_of_stream:
+                        review_iterator = None
+                        continue
+                    pending.add(asyncio.create_task(analyze_with_quota(index, review)))
+                    index += 1
+                else:
+                    pending.discard(task)
+                    yield task.result()
+    finally:
+        # If the caller stops iterating early, don't leave orphaned requests running
+        for task in pending | ({reading} if reading is not None else set()):
+            task.cancel()
+
 def test_connection():
     """Quick test to make sure everything is working before processing big batches."""
     try:
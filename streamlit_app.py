@@ -3,10 +3,45 @@
 import streamlit as st
 import pandas as pd
 import json
-import time
+import hashlib
 import io
-from sentiment_llm import analyze_sentiment, process_batch_reviews
-import base64
+import os
+import threading
+import time
+from batch_jobs import BatchJobManager
+from eval_metrics import SENTIMENT_LABELS
+from sentiment_llm import (
+    analyze_sentiment,
+    get_result_cache,
+    group_duplicate_reviews,
+    lookup_cached_result,
+    process_batch_reviews,
+)
+
+# Sample reviews for the "Try Example" button - scored in both modes at startup, so clicks hit the cache
+EXAMPLE_REVIEWS = [
+    "This movie was absolutely fantastic! Amazing acting and incredible plot twists.",
+    "Terrible movie. Poor acting, boring plot, and a complete waste of time. I walked out halfway through.",
+    "The movie was okay. Not bad but not great either. Some good moments but overall pretty average.",
+    "The film has some interesting visual elements and decent performances, though the plot feels a bit rushed.",
+    "I loved the cinematography but found the dialogue somewhat predictable. Overall entertaining."
+]
+
+# Download formats for batch results: label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "JSON Lines (gzip)": ("jsonl.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+# How often the batch tab polls a running job to redraw its live results table and metrics
+JOB_POLL_SECONDS = 1.0
+
+# Upload limits for the batch tab (0 turns a limit off) and how many CSV rows are parsed at a time
+MAX_UPLOAD_MB = float(os.getenv("SENTIMENT_UPLOAD_MAX_MB", "200"))
+MAX_UPLOAD_ROWS = int(os.getenv("SENTIMENT_UPLOAD_MAX_ROWS", "50000"))
+UPLOAD_CHUNK_ROWS = 10000
+PREVIEW_ROWS = 5
 
 # Configure the web app appearance and behavior
 st.set_page_config(
@@ -325,6 +360,9 @@ st.markdown("""
     .mode-badge.strict { background-color: #1e3a8a; color: #60a5fa; border: 1px solid #3b82f6; }
     .mode-badge.lenient { background-color: #16a34a; color: #86efac; border: 1px solid #22c55e; }
 
+    /* Where a result came from and how long it took */
+    .result-source { color: #888888; font-size: 0.8rem !important; margin-bottom: 0; }
+
     /* Clean Toggle Switch Styling */
     [data-testid="stToggle"] {
         display: flex !important;
@@ -604,7 +642,37 @@ observer.observe(document.body, { childList: true, subtree: true });
 </script>
 """, unsafe_allow_html=True)
 
-def display_sentiment_result(result, analysis_mode=None):
+@st.cache_resource
+def prewarm_example_cache():
+    """Score the example reviews in both modes once per server process, in the background.
+
+    Results go to the shared on-disk result cache, so every "Try Example" click after
+    that - from any session, and after a restart - is answered without an API call.
+    """
+    if get_result_cache() is None:
+        return None
+
+    def warm():
+        for mode in ("lenient", "strict"):
+            process_batch_reviews(EXAMPLE_REVIEWS, analysis_mode=mode)
+
+    thread = threading.Thread(target=warm, name="prewarm-examples", daemon=True)
+    thread.start()
+    return thread
+
+def analyze_with_source(review_text, analysis_mode):
+    """analyze_sentiment(), plus where the answer came from ("cache", "near_duplicate" or "api") and the seconds it took."""
+    started = time.perf_counter()
+    result = lookup_cached_result(review_text, analysis_mode)
+    if result is None:
+        # Already looked it up, so go straight to the API (the answer is cached for everyone after this)
+        result = analyze_sentiment(review_text, analysis_mode=analysis_mode, refresh_cache=True)
+        source = "api"
+    else:
+        source = "near_duplicate" if 'near_duplicate_similarity' in result else "cache"
+    return result, {'source': source, 'seconds': time.perf_counter() - started}
+
+def display_sentiment_result(result, analysis_mode=None, source_info=None):
     """Show the analysis results in a nice, formatted way."""
     # Handle case where analysis failed
     if not result or 'label' not in result:
@@ -627,11 +695,25 @@ def display_sentiment_result(result, analysis_mode=None):
         badge_class = "strict" if analysis_mode == "strict" else "lenient"
         mode_badge = f'<span class="mode-badge {badge_class}">{analysis_mode.title()} Mode</span>'
 
+    # Say whether this was a cache hit and how long it took
+    source_line = ""
+    if source_info:
+        elapsed = source_info['seconds']
+        elapsed_text = f"{elapsed * 1000:.1f} ms" if elapsed < 1 else f"{elapsed:.2f} s"
+        if source_info['source'] == "cache":
+            source_text = "⚡ Cached result"
+        elif source_info['source'] == "near_duplicate":
+            source_text = f"≈ Reused from a near-identical review (similarity {result['near_duplicate_similarity']:.0%})"
+        else:
+            source_text = "🌐 Fresh analysis"
+        source_line = f'<p class="result-source">{source_text} · {elapsed_text}</p>'
+
     st.markdown(f"""
     <div class="result-container">
         <h3><span class="{css_class}">{label}</span> {mode_badge}</h3>
         <p><strong>Confidence:</strong> {confidence:.1%}</p>
         <p><strong>Analysis:</strong> {explanation}</p>
+        {source_line}
     </div>
     """, unsafe_allow_html=True)
 
@@ -695,15 +777,226 @@ def render_analysis_mode_selector(key_suffix=""):
 
     
 
-def create_download_link(df, filename="sentiment_results.csv"):
-    """Create a download link so users can save their batch results."""
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">Download Results as CSV</a>'
-    return href
+def render_batch_metrics(results_df, total_reviews):
+    """Sentiment counts and average confidence for the rows analyzed so far."""
+    sentiment_counts = results_df['predicted_sentiment'].value_counts()
+    for column, sentiment in zip(st.columns(3), SENTIMENT_LABELS):
+        with column:
+            count = sentiment_counts.get(sentiment, 0)
+            st.metric(sentiment, count, f"{count/max(total_reviews, 1)*100:.1f}%")
+
+    avg_confidence = pd.to_numeric(results_df['confidence'], errors='coerce').mean()
+    st.metric("Average Confidence", f"{avg_confidence:.1%}" if pd.notna(avg_confidence) else "-")
+
+@st.cache_resource
+def get_job_manager():
+    """One job manager per server process, shared by every session and rerun."""
+    return BatchJobManager()
+
+def upload_fingerprint(uploaded_file):
+    """SHA-256 of an upload, hashed once per upload and remembered for the session's reruns."""
+    fingerprints = st.session_state.setdefault('upload_fingerprints', {})
+    if uploaded_file.file_id not in fingerprints:
+        digest = hashlib.sha256()
+        uploaded_file.seek(0)
+        for block in iter(lambda: uploaded_file.read(1 << 20), b""):
+            digest.update(block)
+        uploaded_file.seek(0)
+        fingerprints[uploaded_file.file_id] = digest.hexdigest()
+    return fingerprints[uploaded_file.file_id]
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def read_upload_preview(file_hash, _uploaded_file):
+    """The first few rows of an upload (all columns) - only the start of the file is parsed."""
+    _uploaded_file.seek(0)
+    return pd.read_csv(_uploaded_file, nrows=PREVIEW_ROWS)
+
+# A resource rather than data: the frame is shared read-only, so big uploads aren't copied on every rerun
+@st.cache_resource(max_entries=4, show_spinner="Reading reviews...")
+def load_upload_columns(file_hash, columns, max_rows, _uploaded_file):
+    """Read just `columns` of an upload, a chunk of rows at a time.
+
+    Returns (chunks, rows read). The chunks are kept as they were read and never
+    joined into one frame of the whole file, so there is no second full-size copy.
+    Reading stops as soon as the file has more than `max_rows` rows, in which case
+    the chunks are None.
+    """
+    _uploaded_file.seek(0)
+    chunks = []
+    rows_read = 0
+    for chunk in pd.read_csv(_uploaded_file, usecols=list(columns), chunksize=UPLOAD_CHUNK_ROWS):
+        rows_read += len(chunk)
+        if max_rows and rows_read > max_rows:
+            return None, rows_read
+        chunks.append(chunk.reset_index(drop=True))
+    return chunks or [pd.DataFrame(columns=list(columns))], rows_read
+
+def upload_rows(chunks, rows):
+    """The rows at the given (ascending) positions of a chunked upload, as one frame."""
+    rows = pd.Index(rows, dtype='int64')
+    parts = []
+    start = 0
+    for chunk in chunks:
+        stop = start + len(chunk)
+        parts.append(chunk.iloc[rows[(rows >= start) & (rows < stop)] - start])
+        start = stop
+    return pd.concat(parts, ignore_index=True)
+
+def start_batch_job(chunks, total_rows, analysis_mode):
+    """Hand the uploaded reviews to a background job and remember it for this session (and URL)."""
+    # Empty or invalid reviews get a safe default and never reach the API
+    reviews = [str(review).strip() for chunk in chunks for review in chunk['review']]
+    valid_positions = [
+        i for i, review in enumerate(reviews)
+        if review and review.lower() not in ['nan', 'none', '']
+    ]
+    job = get_job_manager().submit(
+        [reviews[i] for i in valid_positions],
+        analysis_mode=analysis_mode,
+        metadata={'chunks': chunks, 'total_rows': total_rows, 'valid_positions': valid_positions},
+    )
+    st.session_state['batch_job_id'] = job.job_id
+    st.query_params['job'] = job.job_id
+    return job
+
+def batch_results_frame(job):
+    """The uploaded rows that are finished so far, with their analysis columns."""
+    total_rows = job.metadata['total_rows']
+    results = [{
+        'predicted_sentiment': 'Neutral',
+        'confidence': 0.0,
+        'explanation': 'Empty or invalid review',
+        'evidence_phrases': '',
+        'analysis_mode': job.analysis_mode
+    } for _ in range(total_rows)]
+    finished = [True] * total_rows
+    for position, analysis in zip(job.metadata['valid_positions'], job.snapshot()):
+        if analysis is None:
+            finished[position] = False
+            continue
+        results[position] = {
+            'predicted_sentiment': analysis['label'],
+            'confidence': analysis['confidence'],
+            'explanation': analysis['explanation'],
+            'evidence_phrases': ', '.join(analysis.get('evidence_phrases', [])),
+            'analysis_mode': job.analysis_mode
+        }
+
+    # Combine original data with analysis results
+    rows = [i for i in range(total_rows) if finished[i]]
+    results_df = upload_rows(job.metadata['chunks'], rows)
+    if results:  # Make sure we have results before processing
+        # Get the keys from the first result dictionary
+        for key in results[0].keys():
+            results_df[key] = [results[i][key] for i in rows]
+    return results_df
+
+def render_batch_job(job_id):
+    """Show a background batch job: live progress while it runs, results and download once it stops."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        st.warning("This batch job is no longer available - please process the file again.")
+    elif job.is_active():
+        render_running_job(job_id)
+    else:
+        render_finished_job(job_id)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_running_job(job_id):
+    """Progress and partial results of a running job - only this part of the page reruns while polling."""
+    job_manager = get_job_manager()
+    job = job_manager.get(job_id)
+    if not job.is_active():
+        st.rerun()  # Done - redraw the page with the finished view
+
+    st.info(f"Processing {job.metadata['total_rows']} reviews using **{job.analysis_mode.title()} Mode** "
+            f"analysis... it keeps running if you change settings or close this tab")
+    st.progress(job.progress)
+    st.caption(f"Analyzed {job.completed} of {job.total} reviews (job {job.job_id})")
+    if st.button("Cancel", key=f"cancel_{job.job_id}"):
+        job_manager.cancel(job.job_id)
+
+    # Finished rows show up here while the rest are still being analyzed
+    results_df = batch_results_frame(job)
+    render_batch_metrics(results_df, len(results_df))
+    st.dataframe(results_df, use_container_width=True, height=300)
+
+@st.fragment
+def render_finished_job(job_id):
+    """Results, summary and download link of a job that completed, was cancelled or failed."""
+    job_manager = get_job_manager()
+    job = job_manager.get(job_id)
+    total_rows = job.metadata['total_rows']
+    if job.status == "completed":
+        st.success(f"Successfully analyzed {total_rows} reviews using **{job.analysis_mode.title()} Mode**!")
+        duplicate_count = job.total - len(group_duplicate_reviews(job.reviews))
+        if duplicate_count:
+            st.info(f"🔁 {duplicate_count} duplicate reviews ({duplicate_count / job.total:.1%} of the batch) "
+                    f"reused another copy's answer - {duplicate_count} API calls saved")
+    else:
+        if job.status == "failed":
+            st.error(f"Batch job failed after {job.completed} of {job.total} reviews: {job.error}")
+        else:
+            st.warning(f"Batch job cancelled after {job.completed} of {job.total} reviews - "
+                       f"resuming only analyzes the rest")
+        if st.button("Resume", key=f"resume_{job.job_id}"):
+            job_manager.resume(job.job_id)
+            st.rerun()
+
+    # Show summary statistics and the results (everything finished so far if the job stopped early)
+    results_df = batch_results_frame(job)
+    render_batch_metrics(results_df, len(results_df))
+    st.dataframe(results_df, use_container_width=True, height=300)
+
+    # Provide a download for the complete results
+    if len(results_df):
+        st.markdown("**Download Complete Results:**" if job.status == "completed" else "**Download Partial Results:**")
+        render_results_download(job)
+
+@st.cache_data(max_entries=30, show_spinner="Preparing download...")
+def export_batch_results(job_id, completed, export_format):
+    """A job's results as file bytes.
+
+    `completed` is only part of the cache key: each file is built once per job,
+    format and number of finished reviews, and reruns are served from the cache.
+    """
+    results_df = batch_results_frame(get_job_manager().get(job_id))
+    buffer = io.BytesIO()
+    if export_format == "Parquet":
+        results_df.to_parquet(buffer, index=False, compression="zstd")
+    elif export_format == "JSON Lines (gzip)":
+        results_df.to_json(buffer, orient="records", lines=True, compression="gzip")
+    else:
+        results_df.to_csv(buffer, index=False, compression="gzip")
+    return buffer.getvalue()
+
+def render_results_download(job):
+    """Format picker and download button - the file is served as plain bytes, not base64 inside the page."""
+    export_format = st.radio(
+        "Download format",
+        list(EXPORT_FORMATS),
+        horizontal=True,
+        key=f"export_format_{job.job_id}",
+        label_visibility="collapsed"
+    )
+    extension, mime_type = EXPORT_FORMATS[export_format]
+    try:
+        data = export_batch_results(job.job_id, job.completed, export_format)
+    except ImportError:
+        st.info("Parquet export needs pyarrow - install it with: pip install pyarrow")
+        return
+    st.download_button(
+        f"Download {export_format}",
+        data=data,
+        file_name=f"movie_sentiment_analysis_results.{extension}",
+        mime=mime_type,
+        key=f"download_{job.job_id}"
+    )
 
 def main():
     """The main app - handles both single review analysis and batch processing."""
+    prewarm_example_cache()
+
     st.markdown("""
     <div class="main-header">
         <h1 class="main-title">🎬 Movie Review Sentiment Analyzer</h1>
@@ -739,25 +1032,18 @@ def main():
 
         # Handle the "Try Example" button - picks a random sample review
         if try_example:
-            example_reviews = [
-                "This movie was absolutely fantastic! Amazing acting and incredible plot twists.",
-                "Terrible movie. Poor acting, boring plot, and a complete waste of time. I walked out halfway through.",
-                "The movie was okay. Not bad but not great either. Some good moments but overall pretty average.",
-                "The film has some interesting visual elements and decent performances, though the plot feels a bit rushed.",
-                "I loved the cinematography but found the dialogue somewhat predictable. Overall entertaining."
-            ]
             import random
-            selected_example = random.choice(example_reviews)
+            selected_example = random.choice(EXAMPLE_REVIEWS)
             st.text_area("Example review:", value=selected_example, height=80, disabled=True)
             with st.spinner(f"Analyzing example review in {analysis_mode} mode..."):
-                result = analyze_sentiment(selected_example, analysis_mode=analysis_mode)
-                display_sentiment_result(result, analysis_mode)
+                result, source_info = analyze_with_source(selected_example, analysis_mode)
+                display_sentiment_result(result, analysis_mode, source_info)
 
         # Handle the main "Analyze Sentiment" button
         if analyze_button and review_text.strip():
             with st.spinner(f"Analyzing sentiment in {analysis_mode} mode..."):
-                result = analyze_sentiment(review_text.strip(), analysis_mode=analysis_mode)
-                display_sentiment_result(result, analysis_mode)
+                result, source_info = analyze_with_source(review_text.strip(), analysis_mode)
+                display_sentiment_result(result, analysis_mode, source_info)
         elif analyze_button and not review_text.strip():
             st.warning("Please enter a review to analyze.")
 
@@ -775,112 +1061,60 @@ def main():
         # Process the uploaded CSV file
         if uploaded_file is not None:
             try:
-                df = pd.read_csv(uploaded_file)
+                # Refuse oversized files before parsing anything
+                if MAX_UPLOAD_MB and uploaded_file.size > MAX_UPLOAD_MB * 1024 * 1024:
+                    st.error(
+                        f"This file is {uploaded_file.size / (1024 * 1024):.1f} MB - the limit is {MAX_UPLOAD_MB:g} MB. "
+                        "Split it into smaller files, or run `batch_eval.py` on it from the command line."
+                    )
+                    return
+
+                # Parsed uploads are cached by content, so reruns (like switching modes) don't read the file again
+                file_hash = upload_fingerprint(uploaded_file)
+                preview = read_upload_preview(file_hash, uploaded_file)
                 # Make sure the file has the expected format
-                if 'review' not in df.columns:
+                if 'review' not in preview.columns:
                     st.error("CSV file must contain a 'review' column with the movie reviews.")
                     st.info("Expected format: CSV with at least a 'review' column containing text to analyze.")
                     return
 
                 st.write("**Preview of uploaded data:**")
-                st.dataframe(df.head(), use_container_width=True)
+                st.dataframe(preview, use_container_width=True)
+
+                # Only the review text is loaded, plus whichever columns should be carried into the results
+                passthrough_columns = st.multiselect(
+                    "Columns to keep in the results",
+                    [column for column in preview.columns if column != 'review'],
+                    help="Other columns from your file to copy into the downloaded results. Columns left out are never loaded."
+                )
+                columns = tuple(column for column in preview.columns if column == 'review' or column in passthrough_columns)
+                chunks, rows_read = load_upload_columns(file_hash, columns, MAX_UPLOAD_ROWS, uploaded_file)
+                if chunks is None:
+                    st.error(
+                        f"This file has more than {MAX_UPLOAD_ROWS:,} reviews, the most one batch can take. "
+                        "Split it into smaller files, or run `batch_eval.py` on it from the command line."
+                    )
+                    return
 
                 col1, col2 = st.columns([2, 1])
                 with col1:
-                    st.info(f"Found {len(df)} reviews to analyze")
+                    st.info(f"Found {rows_read} reviews to analyze")
                 with col2:
                     process_batch = st.button("Process All Reviews", type="primary")
 
-                # Handle the "Process All Reviews" button
+                # The batch runs as a background job, so reruns and closed tabs don't stop it
                 if process_batch:
-                    st.info(f"Processing {len(df)} reviews using **{analysis_mode_batch.title()} Mode** analysis...")
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-
-                    # Process each review one by one with progress tracking
-                    results = []
-                    total_reviews = len(df)
-                    for i, row in df.iterrows():
-                        progress = (i + 1) / total_reviews
-                        progress_bar.progress(progress)
-                        status_text.text(f"Processing review {i + 1} of {total_reviews} ({analysis_mode_batch} mode)")
-
-                        # Handle empty or invalid reviews gracefully
-                        review = str(row['review']).strip()
-                        if not review or review.lower() in ['nan', 'none', '']:
-                            result = {
-                                'predicted_sentiment': 'Neutral',
-                                'confidence': 0.0,
-                                'explanation': 'Empty or invalid review',
-                                'evidence_phrases': '',
-                                'analysis_mode': analysis_mode_batch
-                            }
-                        # Analyze the review and handle any errors
-                        else:
-                            try:
-                                analysis = analyze_sentiment(review, analysis_mode=analysis_mode_batch)
-                                result = {
-                                    'predicted_sentiment': analysis['label'],
-                                    'confidence': analysis['confidence'],
-                                    'explanation': analysis['explanation'],
-                                    'evidence_phrases': ', '.join(analysis.get('evidence_phrases', [])),
-                                    'analysis_mode': analysis_mode_batch
-                                }
-                            except Exception as e:
-                                # If analysis fails, provide a safe default
-                                result = {
-                                    'predicted_sentiment': 'Neutral',
-                                    'confidence': 0.0,
-                                    'explanation': f'Analysis failed: {str(e)}',
-                                    'evidence_phrases': '',
-                                    'analysis_mode': analysis_mode_batch
-                                }
-
-                        results.append(result)
-                        time.sleep(0.1)  # Small delay to avoid overwhelming the API
-
-                    # Combine original data with analysis results
-                    results_df = df.copy()
-                    if results:  # Make sure we have results before processing
-                        # Get the keys from the first result dictionary
-                        for key in results[0].keys():
-                            results_df[key] = [r[key] for r in results]
-
-                    # Clean up progress indicators and show success
-                    progress_bar.empty()
-                    status_text.empty()
-
-                    st.success(f"Successfully analyzed {len(df)} reviews using **{analysis_mode_batch.title()} Mode**!")
-
-                    # Show summary statistics in a nice layout
-                    sentiment_counts = results_df['predicted_sentiment'].value_counts()
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        positive_count = sentiment_counts.get('Positive', 0)
-                        st.metric("Positive", positive_count, f"{positive_count/len(df)*100:.1f}%")
-                    with col2:
-                        negative_count = sentiment_counts.get('Negative', 0)
-                        st.metric("Negative", negative_count, f"{negative_count/len(df)*100:.1f}%")
-                    with col3:
-                        neutral_count = sentiment_counts.get('Neutral', 0)
-                        st.metric("Neutral", neutral_count, f"{neutral_count/len(df)*100:.1f}%")
-
-                    # Show overall confidence and preview of results
-                    avg_confidence = results_df['confidence'].mean()
-                    st.metric("Average Confidence", f"{avg_confidence:.1%}")
-
-                    st.write("**Results Preview:**")
-                    st.dataframe(results_df.head(10), use_container_width=True)
-
-                    # Provide download link for the complete results
-                    st.markdown("**Download Complete Results:**")
-                    csv_download = create_download_link(results_df, "movie_sentiment_analysis_results.csv")
-                    st.markdown(csv_download, unsafe_allow_html=True)
+                    start_batch_job(chunks, rows_read, analysis_mode_batch)
 
             # Handle file processing errors
             except Exception as e:
                 st.error(f"Error processing file: {str(e)}")
                 st.info("Please make sure your CSV file is properly formatted with a 'review' column.")
 
+        # Show this session's batch job - or the one in the URL, after a reload or from another tab
+        job_id = st.session_state.get('batch_job_id') or st.query_params.get('job')
+        if job_id:
+            render_batch_job(job_id)
+
 if __name__ == "__main__":
     main()
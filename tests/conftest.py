@@ -0,0 +1,5 @@
+# The modules live at the repository root rather than in a package
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+import sentiment_llm
+
+
+class EchoBackend:
+    model_name = "echo"
+
+    async def generate_async(self, prompt_text, analysis_mode="lenient"):
+        return '{"label": "Positive", "confidence": 0.8, "explanation": "ok", "evidence_phrases": ["ok"]}'
+
+
+def test_async_paths_keep_cache_io_off_the_event_loop(monkeypatch):
+    cache_threads = []
+
+    def lookup(*args, **kwargs):
+        cache_threads.append(threading.get_ident())
+        return None
+
+    def store(*args, **kwargs):
+        cache_threads.append(threading.get_ident())
+
+    monkeypatch.setattr(sentiment_llm, "lookup_cached_result", lookup)
+    monkeypatch.setattr(sentiment_llm, "store_result", store)
+    monkeypatch.setattr(sentiment_llm, "_backend", EchoBackend())
+
+    async def run():
+        loop_thread = threading.get_ident()
+        results = [result async for result in sentiment_llm.analyze_reviews_async(
+            ["a fine film", "another one"], requests_per_minute=6000, tokens_per_minute=10**7
+        )]
+        single = await sentiment_llm.analyze_sentiment_async("a third review")
+        return loop_thread, results, single
+
+    loop_thread, results, single = asyncio.run(run())
+
+    assert [result["label"] for _, result in results] == ["Positive", "Positive"]
+    assert single["label"] == "Positive"
+    # A lookup and a store for each of the three reviews
+    assert len(cache_threads) == 6
+    assert loop_thread not in cache_threads
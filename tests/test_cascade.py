@@ -0,0 +1,88 @@
+import types
+
+import pytest
+
+import batch_eval
+from batch_eval import CascadeTradeoff, analyze_review_chunk
+from cascade import LocalSentimentClassifier, merge_cascade_results
+
+
+def local(label, confidence):
+    return {"label": label, "confidence": confidence, "explanation": "", "evidence_phrases": [],
+            "decided_by": "local"}
+
+
+def llm(label, failed=False):
+    result = {"label": label, "confidence": 0.9, "explanation": "", "evidence_phrases": []}
+    if failed:
+        result.update(label="Neutral", confidence=0.5, explanation="Analysis failed after 3 attempts: 503",
+                      failed=True)
+    return result
+
+
+def test_merge_keeps_confident_local_answers_and_uses_the_llm_for_the_rest():
+    merged = merge_cascade_results(
+        {0: local("Positive", 0.95), 1: local("Negative", 0.55), 2: local("Neutral", 0.4)},
+        {1: llm("Positive"), 2: llm("Negative")},
+        confidence_threshold=0.8,
+    )
+    assert merged[0]["label"] == "Positive" and merged[0]["decided_by"] == "local"
+    assert merged[1]["label"] == "Positive" and merged[1]["decided_by"] == "llm"
+    assert merged[2]["label"] == "Negative" and merged[2]["decided_by"] == "llm"
+
+
+def test_failed_escalation_keeps_the_local_answer():
+    merged = merge_cascade_results({0: local("Negative", 0.6)}, {0: llm("Positive", failed=True)}, 0.8)
+    assert merged[0]["label"] == "Negative"
+    assert merged[0]["decided_by"] == "local_escalation_failed"
+
+
+def test_llm_answers_keep_their_own_decided_by():
+    fallback = dict(local("Positive", 0.7), decided_by="local_fallback")
+    merged = merge_cascade_results({0: local("Negative", 0.6)}, {0: fallback}, 0.8)
+    assert merged[0]["decided_by"] == "local_fallback"
+
+
+def test_tradeoff_scores_each_threshold_on_the_merged_answers():
+    local_results = {0: local("Positive", 0.95), 1: local("Negative", 0.7), 2: local("Positive", 0.5)}
+    llm_results = {1: llm("Positive"), 2: llm("Negative", failed=True)}
+    tradeoff = CascadeTradeoff([0.6, 0.8])
+    tradeoff.update(["Positive", "Positive", "Positive"], local_results, llm_results)
+
+    rows = {row["threshold"]: row for row in tradeoff.summary()}
+    # At 0.6 only the failed review is below the threshold - it keeps its correct local answer
+    assert rows[0.6]["accuracy"] == pytest.approx(2 / 3)
+    assert rows[0.6]["escalated_reviews"] == 0
+    # At 0.8 review 1 also goes to the LLM, which gets it right
+    assert rows[0.8]["accuracy"] == 1.0
+    assert rows[0.8]["escalated_reviews"] == 1
+
+
+def test_tradeoff_matches_the_pipeline_for_the_threshold_it_used(monkeypatch):
+    reviews = ["great fun loved it", "boring awful mess", "it was a film", "some good some bad", "fine"]
+    true_labels = ["Positive", "Negative", "Neutral", "Neutral", "Positive"]
+    classifier = LocalSentimentClassifier.from_lexicon()
+
+    # One escalation fails (its local answer is right), the others get the right label
+    def fake_batch(review_texts, **options):
+        return [llm(true_labels[reviews.index(text)], failed=text == "fine") for text in review_texts]
+
+    monkeypatch.setattr(batch_eval, "process_batch_reviews", fake_batch)
+    args = types.SimpleNamespace(verbose=False, mode="lenient", workers=1, no_cache=True, refresh_cache=False,
+                                 packed=False, pack_token_budget=None, profile="full", no_dedup=True,
+                                 cascade_threshold=0.95)
+    progress = types.SimpleNamespace(update=lambda count=1: None)
+    results, local_results, llm_results, failed = analyze_review_chunk(
+        reviews, args, progress, local_classifier=classifier, escalation_threshold=0.99
+    )
+    decided_by = [result["decided_by"] for result in results]
+    assert "llm" in decided_by and "local_escalation_failed" in decided_by
+
+    tradeoff = CascadeTradeoff([0.95, 0.99])
+    tradeoff.update(true_labels, local_results, llm_results)
+    used = next(row for row in tradeoff.summary() if row["threshold"] == 0.95)
+
+    pipeline_accuracy = sum(r["label"] == t for r, t in zip(results, true_labels)) / len(reviews)
+    assert used["accuracy"] == pytest.approx(pipeline_accuracy)
+    assert used["escalated_reviews"] == sum(r["decided_by"] == "llm" for r in results)
+    assert failed == 0
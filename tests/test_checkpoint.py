@@ -0,0 +1,111 @@
+import types
+
+import pytest
+
+import batch_eval
+from checkpoint import CheckpointJournal
+
+OPTIONS = {"backend": "mock", "model": "gemini-1.5-flash", "mode": "lenient", "profile": "full"}
+
+
+def answer(label):
+    return {"label": label, "confidence": 0.9, "explanation": "", "evidence_phrases": []}
+
+
+def test_resume_reuses_answers_for_the_same_rows(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    with CheckpointJournal(path, OPTIONS) as journal:
+        journal.record(0, "great film", answer("Positive"))
+        journal.record(1, "dull film", answer("Negative"))
+
+    with CheckpointJournal(path, OPTIONS, resume=True) as journal:
+        assert len(journal) == 2
+        assert journal.lookup(0, "great film")["label"] == "Positive"
+        assert journal.lookup(2, "new review") is None
+        assert journal.reused == 1
+
+
+def test_changed_review_text_is_not_reused(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    with CheckpointJournal(path, OPTIONS) as journal:
+        journal.record(0, "great film", answer("Positive"))
+
+    with CheckpointJournal(path, OPTIONS, resume=True) as journal:
+        assert journal.lookup(0, "a different review in the same row") is None
+
+
+def test_later_entries_for_a_row_win(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    with CheckpointJournal(path, OPTIONS) as journal:
+        journal.record(0, "great film", answer("Neutral"))
+        journal.record(0, "great film", answer("Positive"))
+
+    with CheckpointJournal(path, OPTIONS, resume=True) as journal:
+        assert len(journal) == 1
+        assert journal.lookup(0, "great film")["label"] == "Positive"
+
+
+def test_partial_last_line_is_dropped_and_appending_continues(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    with CheckpointJournal(path, OPTIONS) as journal:
+        journal.record(0, "great film", answer("Positive"))
+    with open(path, "ab") as file:
+        file.write(b'{"row": 1, "hash": "abc", "res')  # Killed mid-write
+
+    with CheckpointJournal(path, OPTIONS, resume=True) as journal:
+        assert len(journal) == 1
+        journal.record(1, "dull film", answer("Negative"))
+
+    with CheckpointJournal(path, OPTIONS, resume=True) as journal:
+        assert journal.lookup(1, "dull film")["label"] == "Negative"
+
+
+def test_resuming_with_different_options_is_refused(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    CheckpointJournal(path, OPTIONS).close()
+    with pytest.raises(ValueError, match="different options"):
+        CheckpointJournal(path, dict(OPTIONS, mode="strict"), resume=True)
+
+
+def test_without_resume_the_journal_starts_over(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    with CheckpointJournal(path, OPTIONS) as journal:
+        journal.record(0, "great film", answer("Positive"))
+    with CheckpointJournal(path, OPTIONS) as journal:
+        assert len(journal) == 0
+    with CheckpointJournal(path, OPTIONS, resume=True) as journal:
+        assert len(journal) == 0
+
+
+def test_batch_chunk_journals_only_real_answers_and_reuses_them(tmp_path, monkeypatch):
+    reviews = ["great film", "dull film", "odd film", "fine film"]
+    returned = {
+        "great film": answer("Positive"),
+        "dull film": answer("Negative"),
+        "odd film": dict(answer("Neutral"), explanation="Analysis failed after 3 attempts: 503", failed=True),
+        "fine film": dict(answer("Positive"), decided_by="local_fallback"),
+    }
+    sent = []
+
+    def fake_batch(review_texts, result_callback=None, **options):
+        sent.append(list(review_texts))
+        results = [returned[text] for text in review_texts]
+        for index, result in enumerate(results):
+            result_callback(index, result)
+        return results
+
+    monkeypatch.setattr(batch_eval, "process_batch_reviews", fake_batch)
+    args = types.SimpleNamespace(verbose=False, mode="lenient", workers=1, no_cache=True, refresh_cache=False,
+                                 packed=False, pack_token_budget=None, profile="full", no_dedup=True,
+                                 cascade_threshold=0.8)
+    progress = types.SimpleNamespace(update=lambda count=1: None)
+    path = tmp_path / "journal.jsonl"
+
+    with CheckpointJournal(path, OPTIONS) as journal:
+        batch_eval.analyze_review_chunk(reviews, args, progress, journal=journal)
+    with CheckpointJournal(path, OPTIONS, resume=True) as journal:
+        results = batch_eval.analyze_review_chunk(reviews, args, progress, journal=journal)[0]
+
+    # The failed and the circuit-breaker fallback answers go back to the LLM on resume
+    assert sent[1] == ["odd film", "fine film"]
+    assert [result["label"] for result in results] == ["Positive", "Negative", "Neutral", "Positive"]
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from columnar_output import ColumnarResultWriter
+
+
+def result_chunk(**input_columns):
+    rows = len(next(iter(input_columns.values())))
+    return pd.DataFrame(dict(
+        input_columns,
+        predicted_sentiment=["Positive"] * rows,
+        confidence=[0.9] * rows,
+        explanation=["Clear praise"] * rows,
+        evidence_phrases=[["great", "fun"]] * rows,
+    ))
+
+
+def write_chunks(path, chunks, **options):
+    with ColumnarResultWriter(path, **options) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    if options.get("output_format") == "feather":
+        return feather.read_table(path)
+    return pq.read_table(path)
+
+
+def test_typed_columns_and_row_groups(tmp_path):
+    chunks = [result_chunk(review=[f"review {i}", f"review {i + 1}"]) for i in range(0, 10, 2)]
+    table = write_chunks(tmp_path / "out.parquet", chunks, row_group_size=4)
+
+    assert table.num_rows == 10
+    assert pq.ParquetFile(tmp_path / "out.parquet").num_row_groups == 3
+    assert table.schema.field("confidence").type == pa.float32()
+    assert table.schema.field("evidence_phrases").type == pa.list_(pa.string())
+    assert pa.types.is_dictionary(table.schema.field("predicted_sentiment").type)
+    assert table.column("evidence_phrases").to_pylist()[0] == ["great", "fun"]
+
+
+def test_column_empty_in_the_first_chunk_is_stored_as_string(tmp_path):
+    # pandas reads a CSV column that is empty throughout a chunk as float64
+    chunks = [
+        result_chunk(review=["first"], note=[float("nan")]),
+        result_chunk(review=["second"], note=["x"]),
+    ]
+    table = write_chunks(tmp_path / "out.parquet", chunks)
+
+    assert table.schema.field("note").type == pa.string()
+    assert table.column("note").to_pylist() == [None, "x"]
+
+
+def test_whole_numbers_widen_to_float(tmp_path):
+    chunks = [
+        result_chunk(review=["first"], score=[5]),
+        result_chunk(review=["second"], score=[float("nan")]),
+        result_chunk(review=["third"], score=[3.5]),
+    ]
+    table = write_chunks(tmp_path / "out.parquet", chunks)
+
+    assert table.schema.field("score").type == pa.float64()
+    assert table.column("score").to_pylist() == [5.0, None, 3.5]
+
+
+def test_numbers_then_text_widen_to_string(tmp_path):
+    chunks = [
+        result_chunk(review=["first"], year=[1999]),
+        result_chunk(review=["second"], year=["unknown"]),
+    ]
+    table = write_chunks(tmp_path / "out.feather", chunks, output_format="feather")
+
+    assert table.schema.field("year").type == pa.string()
+    assert table.column("year").to_pylist() == ["1999", "unknown"]
+
+
+def test_type_change_after_a_row_group_is_written_is_reported(tmp_path):
+    path = tmp_path / "out.parquet"
+    with pytest.raises(ValueError, match="year"):
+        with ColumnarResultWriter(path, row_group_size=1) as writer:
+            writer.write(result_chunk(review=["first"], year=[1999]))
+            writer.write(result_chunk(review=["second"], year=["unknown"]))
+
+    # The rows written so far are still a readable file
+    assert pq.read_table(path).num_rows == 1
@@ -0,0 +1,49 @@
+import json
+import threading
+
+import sentiment_llm
+from sentiment_llm import group_duplicate_reviews, process_batch_reviews
+
+
+class CountingBackend:
+    model_name = "counting"
+
+    def __init__(self):
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt_text, analysis_mode="lenient"):
+        with self._lock:
+            self.prompts.append(prompt_text)
+        label = "Negative" if "dull" in prompt_text.rsplit("Movie Review:", 1)[-1] else "Positive"
+        return json.dumps({"label": label, "confidence": 0.9, "explanation": "ok", "evidence_phrases": []})
+
+
+def test_duplicates_are_grouped_ignoring_whitespace_and_case():
+    reviews = ["Great film", "dull film", "  great   FILM ", "Dull film", "new one"]
+    assert group_duplicate_reviews(reviews) == [[0, 2], [1, 3], [4]]
+
+
+def test_each_distinct_review_is_sent_once_and_fanned_out_in_order():
+    reviews = ["Great film", "dull film", "  great   FILM ", "Dull film", "great film"]
+    backend = CountingBackend()
+    finished = []
+    sentiment_llm.reset_run_stats()
+
+    results = process_batch_reviews(
+        reviews, use_cache=False, backend=backend, max_workers=2,
+        requests_per_minute=6000, tokens_per_minute=10**7,
+        result_callback=lambda index, result: finished.append(index),
+    )
+
+    assert len(backend.prompts) == 2
+    assert [result["label"] for result in results] == ["Positive", "Negative", "Positive", "Negative", "Positive"]
+    assert sorted(finished) == list(range(len(reviews)))
+    assert sentiment_llm.get_run_stats()["duplicate_reviews"] == 3
+
+
+def test_deduplication_can_be_turned_off():
+    backend = CountingBackend()
+    process_batch_reviews(["same review", "same review"], use_cache=False, backend=backend,
+                          requests_per_minute=6000, tokens_per_minute=10**7, deduplicate=False)
+    assert len(backend.prompts) == 2
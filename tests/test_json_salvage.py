@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from json_salvage import repair_truncated_json, salvage_array_json, salvage_result_json
+
+FULL_ANSWER = {"label": "Positive", "confidence": 0.91, "explanation": "Loved it", "evidence_phrases": ["loved it"]}
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(FULL_ANSWER),
+    "```json\n" + json.dumps(FULL_ANSWER) + "\n```",
+    "Here is the analysis: " + json.dumps(FULL_ANSWER) + " Hope that helps!",
+    "[" + json.dumps(FULL_ANSWER) + "]",
+])
+def test_wrapped_answers_are_recovered_whole(text):
+    assert salvage_result_json(text) == FULL_ANSWER
+
+
+def test_truncated_answer_keeps_the_complete_fields():
+    text = '{"label": "Negative", "confidence": 0.8, "explanation": "Dull and far too lo'
+    result = salvage_result_json(text)
+    assert result["label"] == "Negative"
+    assert result["confidence"] == 0.8
+    assert result["explanation"].startswith("Dull")
+
+
+def test_truncated_evidence_array_is_closed():
+    text = '{"label": "Positive", "confidence": 0.7, "evidence_phrases": ["great cast", "sharp wri'
+    result = salvage_result_json(text)
+    assert result["label"] == "Positive"
+    assert result["evidence_phrases"][0] == "great cast"
+
+
+def test_regex_fallback_finds_the_fields_in_broken_json():
+    text = 'Answer - "label": "neutral", "confidence": "0.55", "explanation": "Mixed feelings'
+    assert salvage_result_json(text) == {"label": "Neutral", "confidence": 0.55, "explanation": "Mixed feelings"}
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "I can't classify this review.",
+    '{"label": "Posi',
+    '{"label": "Excellent", "confidence": 0.9}',
+])
+def test_hopeless_or_labelless_answers_are_rejected(text):
+    assert salvage_result_json(text) is None
+
+
+def test_repair_leaves_complete_json_alone():
+    assert repair_truncated_json('{"a": [1, 2]} trailing') == {"a": [1, 2]}
+
+
+def test_packed_array_keeps_every_complete_item():
+    text = '[{"index": 0, "label": "Positive"}, {"index": 1, "label": "Negative"}, {"index": 2, "lab'
+    items = salvage_array_json(text)
+    assert [item["index"] for item in items[:2]] == [0, 1]
+    assert all("label" in item for item in items if item.get("index") in (0, 1))
+
+
+def test_packed_array_inside_an_object_is_found():
+    text = '```json\n{"results": [{"index": 0, "label": "Neutral"}]}\n```'
+    assert salvage_array_json(text) == [{"index": 0, "label": "Neutral"}]
+
+
+def test_analyze_sentiment_salvages_instead_of_retrying():
+    import sentiment_llm
+
+    class FencedBackend:
+        model_name = "fenced"
+        calls = 0
+
+        def generate(self, prompt_text, analysis_mode="lenient"):
+            self.calls += 1
+            return "Sure!\n```json\n" + json.dumps(FULL_ANSWER)[:-30]
+
+    backend = FencedBackend()
+    sentiment_llm.reset_run_stats()
+    result = sentiment_llm.analyze_sentiment("Loved it", use_cache=False, backend=backend)
+
+    assert result["label"] == "Positive"
+    assert backend.calls == 1
+    assert sentiment_llm.get_run_stats()["salvaged_responses"] == 1
@@ -0,0 +1,134 @@
+from types import SimpleNamespace
+
+import pytest
+
+import retry_policy
+from retry_policy import CLIENT, PARSE, RATE_LIMIT, SERVER, CircuitBreaker, RetryPolicy, classify_error
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    # Only the breaker's clock - the event loop in the async test needs the real one
+    monkeypatch.setattr(retry_policy, "time", SimpleNamespace(monotonic=fake_clock))
+    return fake_clock
+
+
+def open_breaker(policy, clock):
+    for _ in range(policy.breaker.failure_threshold):
+        policy.record_failure(SERVER)
+    assert policy.breaker.state == CircuitBreaker.OPEN
+    clock.now += policy.breaker.reset_timeout
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+def test_classify_error_sorts_common_failures():
+    assert classify_error(RateLimited("slow down")) == RATE_LIMIT
+    assert classify_error(TimeoutError()) == "timeout"
+    assert classify_error(Exception("503 Service Unavailable")) == SERVER
+    assert classify_error(Exception("API key not valid")) == CLIENT
+
+
+def test_breaker_opens_after_consecutive_backend_failures(clock):
+    policy = RetryPolicy(breaker=CircuitBreaker(failure_threshold=3, reset_timeout=10))
+    for _ in range(2):
+        policy.record_failure(SERVER)
+        assert policy.breaker.allow_request()
+    policy.record_failure(SERVER)
+    assert policy.breaker.state == CircuitBreaker.OPEN
+    assert not policy.breaker.allow_request()
+    assert policy.breaker.is_open()
+
+
+def test_rate_limits_and_bad_answers_do_not_trip_the_breaker(clock):
+    policy = RetryPolicy(breaker=CircuitBreaker(failure_threshold=2))
+    for _ in range(5):
+        policy.record_failure(RATE_LIMIT)
+        policy.record_failure(PARSE)
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_a_single_trial(clock):
+    policy = RetryPolicy(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=10))
+    open_breaker(policy, clock)
+    assert policy.breaker.allow_request()
+    assert policy.breaker.state == CircuitBreaker.HALF_OPEN
+    assert not policy.breaker.allow_request()
+
+
+def test_successful_trial_closes_the_breaker(clock):
+    policy = RetryPolicy(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=10))
+    open_breaker(policy, clock)
+    assert policy.breaker.allow_request()
+    policy.record_success()
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+    assert policy.breaker.allow_request()
+
+
+def test_failed_trial_reopens_the_breaker(clock):
+    policy = RetryPolicy(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=10))
+    open_breaker(policy, clock)
+    assert policy.breaker.allow_request()
+    policy.record_failure(SERVER)
+    assert policy.breaker.state == CircuitBreaker.OPEN
+    assert not policy.breaker.allow_request()
+    clock.now += 10
+    assert policy.breaker.allow_request()
+
+
+@pytest.mark.parametrize("error_kind", [RATE_LIMIT, CLIENT, PARSE])
+def test_trial_ending_in_a_non_backend_failure_frees_the_slot(clock, error_kind):
+    policy = RetryPolicy(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=10))
+    open_breaker(policy, clock)
+    assert policy.breaker.allow_request()
+    policy.record_failure(error_kind)
+    assert policy.breaker.state == CircuitBreaker.HALF_OPEN
+    assert policy.breaker.allow_request()
+
+
+def test_next_delay_honors_retry_after_and_gives_up_on_client_errors():
+    policy = RetryPolicy(max_attempts=3, max_delay=60)
+    error = Exception("429 quota exhausted, retry after 7 seconds")
+    assert policy.next_delay(error, RATE_LIMIT, attempt=0) >= 7
+    assert policy.next_delay(Exception("bad key"), CLIENT, attempt=0) is None
+    assert policy.next_delay(error, RATE_LIMIT, attempt=2) is None
+
+
+def test_cancelled_async_trial_frees_the_slot(clock, monkeypatch):
+    import asyncio
+
+    import sentiment_llm
+
+    class HangingBackend:
+        model_name = "hanging"
+
+        async def generate_async(self, prompt_text, analysis_mode="lenient"):
+            await asyncio.sleep(60)
+
+    policy = RetryPolicy(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=10))
+    open_breaker(policy, clock)
+    monkeypatch.setattr(sentiment_llm, "_retry_policy", policy)
+
+    async def cancel_trial():
+        task = asyncio.create_task(sentiment_llm.analyze_sentiment_async(
+            "a fine film", use_cache=False, backend=HangingBackend()
+        ))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert policy.breaker.state == CircuitBreaker.HALF_OPEN
+    assert policy.breaker.allow_request()